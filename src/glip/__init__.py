@@ -1,5 +1,11 @@
 from glip.config import *
+from glip.gl.allocator import *
+from glip.gl.batch_render import *
 from glip.gl.context import *
 from glip.gl.input import *
 from glip.gl.objects import *
+from glip.gl.render_queue import *
+from glip.gl.std140 import *
+from glip.gl.transform_feedback import *
 from glip.math import *
+from glip.scene.graph import *
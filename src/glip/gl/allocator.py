@@ -0,0 +1,234 @@
+import bisect
+from typing import List, Optional, Type
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.objects import BufferObject, VBO
+
+
+def _round_up(value, multiple):
+    return (value + multiple - 1) // multiple * multiple
+
+
+class _Page:
+    """A single large buffer, together with the free blocks within it."""
+
+    def __init__(self, buffer: BufferObject, size: int):
+        self.buffer = buffer
+        self.size = size
+        # Sorted, non-adjacent (offset, size) pairs.
+        self.free_blocks = [(0, size)]
+        self.allocations = set()
+
+    def find_space(self, size, alignment):
+        """Reserve space using the first free block which fits, returning its offset or None."""
+        for i, (block_offset, block_size) in enumerate(self.free_blocks):
+            offset = _round_up(block_offset, alignment)
+            end = offset + size
+            block_end = block_offset + block_size
+            if end > block_end:
+                continue
+            replacement = []
+            if offset > block_offset:
+                replacement.append((block_offset, offset - block_offset))
+            if end < block_end:
+                replacement.append((end, block_end - end))
+            self.free_blocks[i:i + 1] = replacement
+            return offset
+        return None
+
+    def release(self, offset, size):
+        """Return space to the free list, merging it with adjacent free blocks."""
+        i = bisect.bisect(self.free_blocks, (offset, size))
+        if i < len(self.free_blocks) and self.free_blocks[i][0] == offset + size:
+            size += self.free_blocks.pop(i)[1]
+        if i > 0:
+            prev_offset, prev_size = self.free_blocks[i - 1]
+            if prev_offset + prev_size == offset:
+                self.free_blocks[i - 1] = (prev_offset, prev_size + size)
+                return
+        self.free_blocks.insert(i, (offset, size))
+
+
+class BufferAllocation:
+    """A range of bytes within a buffer which is managed by a `BufferAllocator`.
+
+    The buffer and offset of an allocation can change when the allocator is compacted.
+    """
+
+    def __init__(self, allocator: 'BufferAllocator', page: _Page, offset: int, size: int,
+                 alignment: int):
+        self.allocator = allocator
+        self._page = page
+        self.offset = offset
+        self.size = size
+        self.alignment = alignment
+
+    def __repr__(self):
+        return f'BufferAllocation(offset={self.offset}, size={self.size})'
+
+    @property
+    def buffer(self) -> BufferObject:
+        return self._page.buffer
+
+    @property
+    def is_freed(self) -> bool:
+        return self._page is None
+
+    def write(self, data: np.ndarray, offset: int = 0):
+        """Write data to the allocation, starting `offset` bytes from its start."""
+        assert not self.is_freed
+        assert offset + data.nbytes <= self.size
+        with self.buffer.bound():
+            self.buffer.write(data, self.offset + offset)
+
+    def element_offset(self, stride: int) -> int:
+        """Get the offset of the allocation in units of `stride` bytes.
+
+        This is the first vertex for `draw_arrays` or the base vertex for `draw_elements` when
+        vertices are packed with the given stride, or the first index when indices are stored
+        in a buffer with items of `stride` bytes.
+        """
+        if self.offset % stride != 0:
+            raise ValueError(f'Allocation offset {self.offset} is not a multiple of {stride}')
+        return self.offset // stride
+
+    def free(self):
+        self.allocator.free(self)
+
+
+class BufferAllocator:
+    """Packs many small allocations into a few large buffers ("pages").
+
+    Each page keeps a list of free blocks, and allocations are placed in the first block which
+    is large enough (first-fit). Freed space is merged with neighbouring free blocks. When no
+    page has room, a new page of at least `page_size` bytes is added, so existing buffers are
+    never reallocated and their contents never move except when `compact` is called.
+
+    Use `element_offset` with the base vertex argument of `draw_elements` or the first argument
+    of `draw_arrays` to draw a mesh stored in part of a shared buffer.
+    """
+
+    def __init__(self, buffer_class: Type[BufferObject] = VBO, page_size: int = 2 ** 22,
+                 alignment: int = 16, usage=gl.GL_STATIC_DRAW):
+        self.buffer_class = buffer_class
+        self.page_size = page_size
+        self.alignment = alignment
+        self.usage = usage
+        self._pages: List[_Page] = []
+
+    @property
+    def buffers(self) -> List[BufferObject]:
+        return [page.buffer for page in self._pages]
+
+    @property
+    def capacity(self) -> int:
+        """Total size of all pages in bytes."""
+        return sum(page.size for page in self._pages)
+
+    @property
+    def used(self) -> int:
+        """Total size of all live allocations in bytes, excluding alignment padding."""
+        return sum(allocation.size for page in self._pages for allocation in page.allocations)
+
+    def _add_page(self, size) -> _Page:
+        buffer = self.buffer_class(usage=self.usage)
+        with buffer.bound():
+            buffer.allocate(size)
+        page = _Page(buffer, size)
+        self._pages.append(page)
+        return page
+
+    def allocate(self, size: int, alignment: Optional[int] = None) -> BufferAllocation:
+        """Reserve `size` bytes.
+
+        The offset of the allocation is a multiple of `alignment`, which should usually be the
+        vertex stride or index size of the data which will be stored in it.
+        """
+        if size <= 0:
+            raise ValueError('Allocation size must be positive')
+        alignment = alignment or self.alignment
+        for page in self._pages:
+            offset = page.find_space(size, alignment)
+            if offset is not None:
+                break
+        else:
+            page = self._add_page(max(self.page_size, size))
+            offset = page.find_space(size, alignment)
+        allocation = BufferAllocation(self, page, offset, size, alignment)
+        page.allocations.add(allocation)
+        return allocation
+
+    def allocate_and_write(self, data: np.ndarray, alignment: Optional[int] = None
+                           ) -> BufferAllocation:
+        """Reserve space for `data` and write it to the new allocation.
+
+        If `alignment` is not given, the offset is a multiple of the size of a row of `data`.
+        """
+        if alignment is None:
+            alignment = max(data[:1].nbytes, 1) if data.ndim > 0 else data.nbytes
+        allocation = self.allocate(data.nbytes, alignment)
+        allocation.write(data)
+        return allocation
+
+    def free(self, allocation: BufferAllocation):
+        """Return an allocation's space to its page."""
+        assert allocation.allocator is self
+        page = allocation._page
+        if page is None:
+            return
+        page.allocations.remove(allocation)
+        page.release(allocation.offset, allocation.size)
+        allocation._page = None
+
+    @staticmethod
+    def _is_packed(page):
+        """Check whether a page has no free space other than a single block at its end."""
+        if len(page.free_blocks) == 0:
+            return True
+        if len(page.free_blocks) > 1:
+            return False
+        offset, size = page.free_blocks[0]
+        return offset + size == page.size
+
+    def compact(self) -> bool:
+        """Move all live allocations into a single new page, removing gaps between them.
+
+        Allocations are updated in place, and the old buffers are destroyed. VAOs which refer to
+        the old buffers (other than those cached with `VAO.get_cached`) must be recreated.
+
+        Returns:
+            True if any pages were replaced.
+        """
+        old_pages = self._pages
+        if len(old_pages) == 0 or (len(old_pages) == 1 and self._is_packed(old_pages[0])):
+            return False
+        allocations = [allocation for page in old_pages
+                       for allocation in sorted(page.allocations, key=lambda a: a.offset)]
+        # Placing the most strictly aligned allocations first minimises padding.
+        allocations.sort(key=lambda allocation: -allocation.alignment)
+        self._pages = []
+        required = 0
+        for allocation in allocations:
+            required = _round_up(required, allocation.alignment) + allocation.size
+        if required > 0:
+            self._add_page(max(self.page_size, required))
+        for allocation in allocations:
+            old_buffer, old_offset = allocation.buffer, allocation.offset
+            page = self._pages[0]
+            offset = page.find_space(allocation.size, allocation.alignment)
+            old_buffer.copy_to(page.buffer, allocation.size, old_offset, offset)
+            allocation._page = page
+            allocation.offset = offset
+            page.allocations.add(allocation)
+        for page in old_pages:
+            page.buffer.destroy()
+        return True
+
+    def destroy(self):
+        for page in self._pages:
+            for allocation in page.allocations:
+                allocation._page = None
+            page.buffer.destroy()
+        self._pages = []
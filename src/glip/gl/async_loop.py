@@ -0,0 +1,137 @@
+"""Running a window's render loop as an asyncio task.
+
+`AsyncRenderLoop` draws and presents frames from a coroutine, sleeping on the event loop between
+frames instead of blocking in GLFW, so a single thread can render while also serving network
+requests or other I/O. Other coroutines can wait for frames with `Window.next_frame` and for GPU
+work with `wait_for_gpu`:
+
+    async def main(window):
+        loop = AsyncRenderLoop(window, draw)
+        render_task = asyncio.create_task(loop.run())
+        server = await asyncio.start_server(handle_client, port=8000)
+        async with server:
+            await render_task
+
+All GL calls must be made from the thread which runs the event loop.
+"""
+
+import asyncio
+import inspect
+from typing import Any, Callable, Optional
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.context import Window
+from glip.gl.objects import Fence, PixelFormat, PixelPackBuffer, _Framebuffer
+
+
+async def wait_for_fence(fence: Fence, poll_interval: float = 0.001):
+    """Wait for a fence to be signalled without blocking the event loop."""
+    while not fence.is_signalled():
+        await asyncio.sleep(poll_interval)
+
+
+async def wait_for_gpu(poll_interval: float = 0.001):
+    """Wait until the GPU has finished all commands issued so far, such as buffer uploads."""
+    fence = Fence()
+    try:
+        await wait_for_fence(fence, poll_interval)
+    finally:
+        fence.destroy()
+
+
+async def read_pixels_async(framebuffer: _Framebuffer, x: int, y: int, width: int, height: int,
+                            attachment=gl.GL_COLOR_ATTACHMENT0,
+                            pixel_format: Optional[PixelFormat] = None,
+                            poll_interval: float = 0.001) -> np.ndarray:
+    """Read pixels from a framebuffer, waiting for the transfer on the event loop.
+
+    The pixels are copied into a pixel pack buffer on the GPU, which is only mapped once the
+    copy has finished. The result is as for `read_pixels`.
+    """
+    if pixel_format is None:
+        pixel_format = framebuffer._get_pixel_format(attachment)
+    shape = (height, width, pixel_format.channels)
+    pbo = PixelPackBuffer(int(np.prod(shape)) * pixel_format.dtype.itemsize)
+    try:
+        with framebuffer.bound(), pbo.bound():
+            framebuffer.read_pixels(x, y, width, height, attachment, pixel_format, offset=0)
+        await wait_for_gpu(poll_interval)
+        with pbo.bound(), pbo.mapped() as data:
+            return data.view(pixel_format.dtype).reshape(shape).copy()
+    finally:
+        pbo.destroy()
+
+
+class AsyncRenderLoop:
+    """Draws frames for a window from an asyncio task.
+
+    In continuous mode a frame is drawn every `1 / max_fps` seconds. Otherwise frames are only
+    drawn after `request_redraw` is called, and window events are polled every
+    `idle_poll_interval` seconds in between. Blocking GLFW waits are never used, since they would
+    stall the event loop.
+    """
+
+    def __init__(self, window: Window, draw: Callable[[Window], Any], max_fps: float = 60.0,
+                 continuous: bool = True, idle_poll_interval: float = 0.01):
+        """
+        Args:
+            window: The window to present frames in.
+            draw: Called as `draw(window)` with the window active to draw each frame. It may be
+                a coroutine function, in which case it is awaited before the frame is presented.
+            max_fps: Maximum frame rate.
+            continuous: If False, only draw frames which have been requested.
+            idle_poll_interval: Time between polls for window events when no frames are drawn.
+        """
+        self.window = window
+        self.draw = draw
+        self.frame_interval = 1 / max_fps
+        self.continuous = continuous
+        self.idle_poll_interval = idle_poll_interval
+        self._redraw: Optional[asyncio.Event] = None
+        self._redraw_requested = True
+        self._stopping = False
+
+    def request_redraw(self):
+        """Draw a frame as soon as possible, even when not in continuous mode."""
+        self._redraw_requested = True
+        if self._redraw is not None:
+            self._redraw.set()
+
+    def stop(self):
+        """Make `run` return after the current frame."""
+        self._stopping = True
+        if self._redraw is not None:
+            self._redraw.set()
+
+    async def _wait_for_redraw(self):
+        try:
+            await asyncio.wait_for(self._redraw.wait(), self.idle_poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._redraw.clear()
+
+    async def run(self):
+        """Draw frames until the window should close or `stop` is called."""
+        loop = asyncio.get_running_loop()
+        self._redraw = asyncio.Event()
+        self._stopping = False
+        next_frame_time = loop.time()
+        while not (self._stopping or self.window.should_close):
+            if not (self.continuous or self._redraw_requested):
+                self.window.poll_events()
+                await self._wait_for_redraw()
+                continue
+            self._redraw_requested = False
+            self.window.activate()
+            result = self.draw(self.window)
+            if inspect.isawaitable(result):
+                await result
+                # Other tasks may have activated another window.
+                self.window.activate()
+            self.window.tick()
+            # Sleep until the next frame is due, even if it is due now, so that other tasks run.
+            next_frame_time = max(next_frame_time + self.frame_interval, loop.time())
+            await asyncio.sleep(next_frame_time - loop.time())
+        self._redraw = None
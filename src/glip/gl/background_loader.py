@@ -0,0 +1,214 @@
+"""Uploading buffers and textures on a worker thread, without stalling the render loop.
+
+`BackgroundLoader` creates a hidden window which shares objects with the main window, and makes
+its context current on a worker thread. Loads submitted to it run on that thread, and each is
+followed by a fence. The main thread calls `poll` once per frame, which publishes the results of
+loads whose fences have signalled by setting their futures:
+
+    loader = BackgroundLoader(window)
+    texture_future = loader.load_texture(image)
+    mesh_future = loader.submit(upload_mesh, 'level2.ply')
+    while not window.should_close:
+        loader.poll()
+        if mesh_future.done():
+            draw_level(mesh_future.result(), texture_future.result())
+        window.tick()
+    loader.close()
+
+Only objects which are shared between contexts (buffers, textures, shaders and programs) can be
+loaded. VAOs and framebuffers must be created by the main thread.
+"""
+
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.commands import Command
+from glip.gl.context import Window
+from glip.gl.objects import (BufferObject, Fence, Texture2D, get_array_internal_format,
+                             get_pixel_format)
+
+
+class _CompletedLoad(NamedTuple):
+    future: Future
+    fence: Optional[Fence]
+    result: Any
+    error: Optional[BaseException]
+
+
+class BackgroundLoader:
+    """Loads GL objects on a worker thread with a context shared with a window."""
+
+    def __init__(self, window: Window):
+        """
+        Args:
+            window: The window whose objects are shared with the loader. The loader's hidden
+                window is created on the calling thread, since some platforms only allow windows
+                to be created on the main thread.
+        """
+        previous = Window.get_active()
+        self._window = Window(1, 1, object_context=window.object_context, hidden=True)
+        if previous is not None:
+            previous.activate()
+        else:
+            self._window.deactivate()
+        self._commands: queue.Queue = queue.Queue()
+        # Loads which have run, in order, waiting for their fences to be signalled.
+        self._completed: List[_CompletedLoad] = []
+        self._completed_lock = threading.Lock()
+        self._n_outstanding = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='BackgroundLoader', daemon=True)
+        self._thread.start()
+
+    def submit(self, function: Callable[..., Any], *args, **kwargs) -> Future:
+        """Call `function(*args, **kwargs)` on the loader thread to create objects.
+
+        Returns:
+            A future for the function's result, which is set by `poll` once the GPU has finished
+            the function's commands.
+        """
+        if self._closed:
+            raise RuntimeError('The loader has been closed')
+        future = Future()
+        with self._completed_lock:
+            self._n_outstanding += 1
+        self._commands.put(Command(function, args, kwargs, future))
+        return future
+
+    def load_buffer(self, buffer_class: Callable[..., BufferObject], data: np.ndarray,
+                    **kwargs) -> Future:
+        """Create a buffer object (e.g. a `VBO` or `EBO`) holding a copy of `data`."""
+        return self.submit(buffer_class, data, **kwargs)
+
+    def load_texture(self, image: np.ndarray, internal_format=None,
+                     mipmaps: bool = True) -> Future:
+        """Create a `Texture2D` from a (height, width) or (height, width, channels) image.
+
+        Args:
+            image: Pixels of uint8, float32 or uint32 values. The first row is the bottom row.
+            internal_format: Internal format of the texture. Defaults to one which matches the
+                image's data type and channels.
+            mipmaps: If True, generate a full chain of mipmaps and filter between them. Integer
+                textures never have mipmaps.
+        """
+        return self.submit(self._create_texture, image, internal_format, mipmaps)
+
+    @staticmethod
+    def _create_texture(image: np.ndarray, internal_format, mipmaps: bool) -> Texture2D:
+        image = np.asarray(image)
+        if image.ndim == 2:
+            image = image[..., None]
+        if internal_format is None:
+            internal_format = get_array_internal_format(image)
+        # Integer textures cannot be filtered.
+        is_integer = get_pixel_format(internal_format).is_integer
+        mipmaps = mipmaps and not is_integer
+        height, width = image.shape[:2]
+        levels = int(math.log2(max(width, height))) + 1 if mipmaps else 1
+        texture = Texture2D()
+        with texture.bound():
+            texture.allocate(width, height, internal_format, levels)
+            texture.write(image)
+            if is_integer:
+                min_filter = mag_filter = gl.GL_NEAREST
+            else:
+                min_filter = gl.GL_LINEAR_MIPMAP_LINEAR if mipmaps else gl.GL_LINEAR
+                mag_filter = gl.GL_LINEAR
+            if mipmaps:
+                texture.generate_mipmaps()
+            texture.set_parameter(gl.GL_TEXTURE_MIN_FILTER, min_filter)
+            texture.set_parameter(gl.GL_TEXTURE_MAG_FILTER, mag_filter)
+        return texture
+
+    def _run(self):
+        self._window.activate()
+        try:
+            while True:
+                command = self._commands.get()
+                if command is None:
+                    break
+                # Objects may have been destroyed by the main thread since the last load.
+                self._window.forget_destroyed_objects()
+                if not command.future.set_running_or_notify_cancel():
+                    completed = _CompletedLoad(command.future, None, None, None)
+                    with self._completed_lock:
+                        self._completed.append(completed)
+                    continue
+                try:
+                    result = command.function(*command.args, **command.kwargs)
+                except BaseException as error:
+                    completed = _CompletedLoad(command.future, None, None, error)
+                else:
+                    # The fence also flushes the commands, so that they reach the GPU.
+                    completed = _CompletedLoad(command.future, Fence(), result, None)
+                with self._completed_lock:
+                    self._completed.append(completed)
+        finally:
+            self._window.deactivate()
+
+    def poll(self) -> int:
+        """Publish the results of loads which the GPU has finished.
+
+        This must be called on a thread where a window sharing the loader's objects is active,
+        usually once per frame. Futures' callbacks run during this call.
+
+        Returns:
+            The number of loads which were published.
+        """
+        with self._completed_lock:
+            completed = list(self._completed)
+        n_published = 0
+        # Fences from the same context are signalled in order.
+        for load in completed:
+            if load.fence is not None:
+                if not load.fence.is_signalled():
+                    break
+                load.fence.destroy()
+            n_published += 1
+        with self._completed_lock:
+            published, self._completed = (self._completed[:n_published],
+                                          self._completed[n_published:])
+            self._n_outstanding -= n_published
+        for load in published:
+            if load.future.cancelled():
+                continue
+            if load.error is not None:
+                load.future.set_exception(load.error)
+            else:
+                load.future.set_result(load.result)
+        return n_published
+
+    def flush(self, timeout: Optional[float] = None, poll_interval: float = 0.001) -> bool:
+        """Block until every submitted load has been published.
+
+        Returns:
+            False if `timeout` seconds passed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.poll()
+            if self._n_outstanding == 0:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+
+    def close(self):
+        """Publish the submitted loads, then stop the loader thread and destroy its window.
+
+        As with `poll`, this must be called with a window sharing the loader's objects active.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._commands.put(None)
+        self._thread.join()
+        self.flush()
+        self._window.destroy()
@@ -0,0 +1,230 @@
+import math
+from typing import Callable, Iterator, NamedTuple, Optional
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.context import Window
+from glip.gl.objects import Framebuffer, PixelPackBuffer, Texture2D, get_pixel_format
+
+
+class RenderedBatch(NamedTuple):
+    """Images for a contiguous range of views."""
+    # Index of the first view in this batch.
+    start: int
+    # Colour images of shape (n, height, width, channels).
+    colour: np.ndarray
+    # Depth images of shape (n, height, width, 1), or None if depth is not read back.
+    depth: Optional[np.ndarray]
+
+
+class BatchRenderResult(NamedTuple):
+    colour: np.ndarray
+    depth: Optional[np.ndarray]
+
+
+class _PendingReadback(NamedTuple):
+    pbo: PixelPackBuffer
+    fence: object
+    start: int
+    count: int
+
+
+class BatchRenderer:
+    """Renders many views of a scene offscreen and reads them back into arrays.
+
+    Views are drawn into tiles of a single large framebuffer, so that a whole batch of views is
+    cleared and read back at once. Readback goes through a ring of pixel pack buffers: the pixels
+    for one batch are copied asynchronously on the GPU while the next batch is being drawn, and
+    only mapped once the GPU has finished with them.
+
+    Images are returned with their first row at the top, as is usual for image files.
+    """
+
+    def __init__(self, width: int, height: int, batch_size: int = 16,
+                 colour_format=gl.GL_RGBA8, depth: bool = True, n_buffers: int = 2):
+        """
+        Args:
+            width: Width of each view in pixels.
+            height: Height of each view in pixels.
+            batch_size: Maximum number of views to draw before reading back. This is reduced if
+                the tiles would not fit into the largest supported texture.
+            colour_format: Internal format of the colour target.
+            depth: If True, depth values (in [0, 1]) are read back as well as colours.
+            n_buffers: Number of batches which can be waiting for readback at once.
+        """
+        self.width = width
+        self.height = height
+        max_size = int(gl.glGetIntegerv(gl.GL_MAX_TEXTURE_SIZE))
+        if width > max_size or height > max_size:
+            raise ValueError(f'Views must be at most {max_size} pixels wide and high')
+        self.tiles_x = max(min(batch_size, max_size // width), 1)
+        self.tiles_y = min(math.ceil(batch_size / self.tiles_x), max_size // height)
+        self.batch_size = min(batch_size, self.tiles_x * self.tiles_y)
+        self.colour_format = get_pixel_format(colour_format)
+        self.depth_format = get_pixel_format(gl.GL_DEPTH_COMPONENT32F) if depth else None
+
+        atlas_width = self.tiles_x * width
+        atlas_height = self.tiles_y * height
+        self.colour_texture = Texture2D()
+        with self.colour_texture.bound():
+            self.colour_texture.allocate(atlas_width, atlas_height, colour_format)
+        self.depth_texture = Texture2D()
+        with self.depth_texture.bound():
+            self.depth_texture.allocate(atlas_width, atlas_height, gl.GL_DEPTH_COMPONENT32F)
+        self.framebuffer = Framebuffer()
+        with self.framebuffer.bound():
+            self.framebuffer.attach_texture(gl.GL_COLOR_ATTACHMENT0, self.colour_texture)
+            self.framebuffer.attach_texture(gl.GL_DEPTH_ATTACHMENT, self.depth_texture)
+            self.framebuffer.check_status()
+
+        self._colour_bytes = atlas_width * atlas_height * self._pixel_size(self.colour_format)
+        depth_bytes = 0
+        if self.depth_format is not None:
+            depth_bytes = atlas_width * atlas_height * self._pixel_size(self.depth_format)
+        self._pbos = [PixelPackBuffer(self._colour_bytes + depth_bytes) for _ in range(n_buffers)]
+        self.clear_colour = (0.0, 0.0, 0.0, 0.0)
+
+    @staticmethod
+    def _pixel_size(pixel_format):
+        return pixel_format.channels * pixel_format.dtype.itemsize
+
+    def _tile_origin(self, tile):
+        return (tile % self.tiles_x) * self.width, (tile // self.tiles_x) * self.height
+
+    def _draw_batch(self, view_projections, start, count, draw):
+        window = Window.get_active()
+        # Restore the caller's state afterwards.
+        viewport = gl.glGetIntegerv(gl.GL_VIEWPORT)
+        scissor_box = gl.glGetIntegerv(gl.GL_SCISSOR_BOX)
+        scissor_test = gl.glIsEnabled(gl.GL_SCISSOR_TEST)
+        clear_colour = gl.glGetFloatv(gl.GL_COLOR_CLEAR_VALUE)
+        clear_depth = gl.glGetFloatv(gl.GL_DEPTH_CLEAR_VALUE)
+        try:
+            gl.glDisable(gl.GL_SCISSOR_TEST)
+            window.set_viewport(0, 0, self.tiles_x * self.width, self.tiles_y * self.height)
+            gl.glClearColor(*self.clear_colour)
+            gl.glClearDepth(1.0)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+            # The viewport does not limit clears, or points and lines which overlap its edges,
+            # so the scissor box keeps each view inside its tile.
+            gl.glEnable(gl.GL_SCISSOR_TEST)
+            for tile in range(count):
+                x, y = self._tile_origin(tile)
+                window.set_viewport(x, y, self.width, self.height)
+                gl.glScissor(x, y, self.width, self.height)
+                draw(view_projections[start + tile], start + tile)
+        finally:
+            window.set_viewport(*viewport)
+            gl.glScissor(*scissor_box)
+            if not scissor_test:
+                gl.glDisable(gl.GL_SCISSOR_TEST)
+            gl.glClearColor(*clear_colour)
+            gl.glClearDepth(float(clear_depth))
+
+    def _start_readback(self, pbo, count):
+        # Only read the rows of tiles which were drawn to.
+        rows = math.ceil(count / self.tiles_x) * self.height
+        atlas_width = self.tiles_x * self.width
+        with pbo.bound():
+            self.framebuffer.read_pixels(0, 0, atlas_width, rows, gl.GL_COLOR_ATTACHMENT0,
+                                         self.colour_format, offset=0)
+            if self.depth_format is not None:
+                self.framebuffer.read_pixels(0, 0, atlas_width, rows, gl.GL_DEPTH_ATTACHMENT,
+                                             self.depth_format, offset=self._colour_bytes)
+        return gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def _split_tiles(self, data, pixel_format, count):
+        """Split the rows of tiles in `data` into separate images, flipped to be top-down."""
+        rows = math.ceil(count / self.tiles_x)
+        atlas = data.view(pixel_format.dtype).reshape(rows, self.height, self.tiles_x,
+                                                      self.width, pixel_format.channels)
+        tiles = atlas.transpose(0, 2, 1, 3, 4).reshape(-1, self.height, self.width,
+                                                       pixel_format.channels)
+        return tiles[:count, ::-1]
+
+    def _copy_tiles(self, pbo, offset, pixel_format, pending, out):
+        rows = math.ceil(pending.count / self.tiles_x) * self.height
+        size = rows * self.tiles_x * self.width * self._pixel_size(pixel_format)
+        with pbo.mapped(offset, size) as data:
+            images = self._split_tiles(data, pixel_format, pending.count)
+            if out is None:
+                return images.copy()
+            out[pending.start:pending.start + pending.count] = images
+            return out[pending.start:pending.start + pending.count]
+
+    def _finish_readback(self, pending: _PendingReadback, colour_out, depth_out) -> RenderedBatch:
+        gl.glClientWaitSync(pending.fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, gl.GL_TIMEOUT_IGNORED)
+        gl.glDeleteSync(pending.fence)
+        with pending.pbo.bound():
+            colour = self._copy_tiles(pending.pbo, 0, self.colour_format, pending, colour_out)
+            depth = None
+            if self.depth_format is not None:
+                depth = self._copy_tiles(pending.pbo, self._colour_bytes, self.depth_format,
+                                         pending, depth_out)
+        return RenderedBatch(pending.start, colour, depth)
+
+    def iter_batches(self, view_projections: np.ndarray,
+                     draw: Callable[[np.ndarray, int], None],
+                     colour_out: Optional[np.ndarray] = None,
+                     depth_out: Optional[np.ndarray] = None) -> Iterator[RenderedBatch]:
+        """Render views and yield the images one batch at a time.
+
+        Batches are yielded in order, slightly behind the batches being drawn. This keeps memory
+        bounded when images are consumed as they arrive (e.g. written to disk).
+
+        Args:
+            view_projections: Array of shape (N, 4, 4). Each matrix is passed to `draw`.
+            draw: Called as `draw(view_projection, index)` with the framebuffer bound and the
+                viewport and scissor box set to the view's tile. It should set any uniforms and
+                issue draw calls, and may clear the view. Depth testing must be enabled for
+                depth images to be meaningful.
+            colour_out: Optional array of shape (N, height, width, channels) to write colour
+                images into. Yielded images are then views into this array.
+            depth_out: As for `colour_out`, but for depth images.
+        """
+        view_projections = np.asarray(view_projections)
+        n_views = len(view_projections)
+        pending = []
+        try:
+            for batch_index, start in enumerate(range(0, n_views, self.batch_size)):
+                count = min(self.batch_size, n_views - start)
+                pbo = self._pbos[batch_index % len(self._pbos)]
+                # The buffer must be free before it can be reused.
+                if len(pending) == len(self._pbos):
+                    yield self._finish_readback(pending.pop(0), colour_out, depth_out)
+                with self.framebuffer.bound():
+                    self._draw_batch(view_projections, start, count, draw)
+                    fence = self._start_readback(pbo, count)
+                pending.append(_PendingReadback(pbo, fence, start, count))
+            while pending:
+                yield self._finish_readback(pending.pop(0), colour_out, depth_out)
+        finally:
+            # Iteration may have been stopped early.
+            for readback in pending:
+                gl.glDeleteSync(readback.fence)
+
+    def render(self, view_projections: np.ndarray, draw: Callable[[np.ndarray, int], None]
+               ) -> BatchRenderResult:
+        """Render all views and return their images.
+
+        Returns:
+            Colour images of shape (N, height, width, channels) and, if enabled, depth images of
+            shape (N, height, width, 1).
+        """
+        n_views = len(view_projections)
+        colour = np.empty((n_views, self.height, self.width, self.colour_format.channels),
+                          dtype=self.colour_format.dtype)
+        depth = None
+        if self.depth_format is not None:
+            depth = np.empty((n_views, self.height, self.width, 1), dtype=np.float32)
+        for _ in self.iter_batches(view_projections, draw, colour, depth):
+            pass
+        return BatchRenderResult(colour, depth)
+
+    def destroy(self):
+        for pbo in self._pbos:
+            pbo.destroy()
+        self.framebuffer.destroy()
+        self.colour_texture.destroy()
+        self.depth_texture.destroy()
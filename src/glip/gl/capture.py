@@ -0,0 +1,211 @@
+"""Recording the frames shown in a window to a raw video stream.
+
+Frames are copied into a ring of pixel pack buffers as part of `Window.tick`, and only mapped
+once the GPU has finished the copy, a few frames later. Mapped pixels are handed to a background
+thread which writes them to a file or pipe, so neither the readback nor slow writes stall the
+render loop. For example, to encode with FFmpeg:
+
+    encoder = subprocess.Popen(['ffmpeg', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                                '-s', f'{width}x{height}', '-r', '60', '-i', '-', 'out.mp4'],
+                               stdin=subprocess.PIPE)
+    with ScreenCapture(window, encoder.stdin):
+        while not window.should_close:
+            draw()
+            window.tick()
+    encoder.stdin.close()
+    encoder.wait()
+"""
+
+import collections
+import enum
+import os
+import queue
+import threading
+from typing import BinaryIO, Deque, NamedTuple, Optional, Union
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.context import Window
+from glip.gl.objects import Framebuffer, PixelFormat, PixelPackBuffer, get_pixel_format
+
+
+class OverflowPolicy(enum.Enum):
+    """What to do with a new frame when the writer has too many frames queued."""
+    # Skip the frame, so that the window's frame rate is unaffected.
+    DROP = 'drop'
+    # Wait for the writer to catch up, so that every frame is recorded.
+    BLOCK = 'block'
+
+
+class CaptureStats(NamedTuple):
+    captured: int
+    written: int
+    dropped: int
+
+
+class _PendingFrame(NamedTuple):
+    pbo: PixelPackBuffer
+    fence: object
+
+
+class ScreenCapture:
+    """Streams the frames shown in a window as raw pixels.
+
+    Each frame is written as `height` rows of `width` pixels of `pixel_format`, top row first,
+    with no header. The capture size is the window's framebuffer size when capture starts.
+    """
+
+    def __init__(self, window: Window, output: Union[str, os.PathLike, BinaryIO],
+                 pixel_format: Optional[PixelFormat] = None, n_buffers: int = 3,
+                 max_queued: int = 8, policy: OverflowPolicy = OverflowPolicy.DROP,
+                 start: bool = True):
+        """
+        Args:
+            window: The window to capture.
+            output: A path to write to, or a binary file-like object such as an encoder's
+                stdin. File-like objects are flushed but not closed when capture stops.
+            pixel_format: Format of the written pixels. Defaults to 8-bit RGBA.
+            n_buffers: Number of pixel pack buffers in the ring. Frames are mapped this many
+                frames after they are captured, by which time the GPU has normally finished.
+            max_queued: Number of frames which can be waiting for the writer.
+            policy: What to do when `max_queued` frames are waiting.
+            start: If True, start capturing immediately.
+        """
+        self.window = window
+        self.pixel_format = pixel_format or get_pixel_format(gl.GL_RGBA8)
+        self.n_buffers = n_buffers
+        self.policy = policy
+        if isinstance(output, (str, os.PathLike)):
+            self._file = open(output, 'wb')
+            self._owns_file = True
+        else:
+            self._file = output
+            self._owns_file = False
+        self._queue = queue.Queue(max_queued)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_error: Optional[BaseException] = None
+        self._pbos = []
+        self._free_pbos = []
+        self._pending: Deque[_PendingFrame] = collections.deque()
+        self.width = self.height = 0
+        self._captured = self._written = self._dropped = 0
+        self._lock = threading.Lock()
+        if start:
+            self.start()
+
+    @property
+    def stats(self) -> CaptureStats:
+        with self._lock:
+            return CaptureStats(self._captured, self._written, self._dropped)
+
+    @property
+    def is_running(self) -> bool:
+        return self._writer is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        assert not self.is_running
+        assert self.window.is_active()
+        self.width, self.height = self.window.framebuffer_size
+        frame_size = (self.width * self.height * self.pixel_format.channels
+                      * self.pixel_format.dtype.itemsize)
+        self._pbos = [PixelPackBuffer(frame_size) for _ in range(self.n_buffers)]
+        self._free_pbos = list(self._pbos)
+        self._writer = threading.Thread(target=self._write_frames, name='ScreenCapture',
+                                        daemon=True)
+        self._writer.start()
+        self.window.add_before_swap_hook(self._on_frame)
+
+    def stop(self):
+        """Write out all captured frames and stop capturing.
+
+        Raises:
+            OSError: If writing to the output failed.
+        """
+        if not self.is_running:
+            return
+        self.window.remove_before_swap_hook(self._on_frame)
+        prev_active = Window.get_active()
+        self.window.activate()
+        try:
+            while self._pending:
+                self._finish_frame()
+            for pbo in self._pbos:
+                pbo.destroy()
+        finally:
+            if prev_active is not None and prev_active is not self.window:
+                prev_active.activate()
+        self._pbos = []
+        self._free_pbos = []
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        if self._owns_file:
+            self._file.close()
+        if self._writer_error is not None:
+            raise self._writer_error
+
+    def _write_frames(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._writer_error is not None:
+                continue
+            try:
+                # Rows are read bottom-up, but video frames start at the top.
+                self._file.write(frame.reshape(self.height, -1)[::-1].tobytes())
+                with self._lock:
+                    self._written += 1
+            except (OSError, ValueError) as error:
+                # Keep draining the queue so that the render thread never blocks on it.
+                self._writer_error = error
+        if self._writer_error is None:
+            try:
+                self._file.flush()
+            except (OSError, ValueError) as error:
+                self._writer_error = error
+
+    def _on_frame(self, window: Window):
+        # Map frames whose copies have finished, and make room in the ring for this frame.
+        while self._pending and (not self._free_pbos or self._is_signalled(self._pending[0])):
+            self._finish_frame()
+        if self._writer_error is not None or self._is_writer_full():
+            with self._lock:
+                self._dropped += 1
+            return
+        pbo = self._free_pbos.pop()
+        with Framebuffer.get_default().bound(), pbo.bound():
+            Framebuffer.get_default().read_pixels(0, 0, self.width, self.height,
+                                                  pixel_format=self.pixel_format, offset=0)
+        fence = gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self._pending.append(_PendingFrame(pbo, fence))
+        with self._lock:
+            self._captured += 1
+
+    def _is_writer_full(self):
+        if self.policy is not OverflowPolicy.DROP:
+            return False
+        # Frames waiting in the ring will also need room in the queue.
+        return self._queue.qsize() + len(self._pending) >= self._queue.maxsize
+
+    @staticmethod
+    def _is_signalled(pending: _PendingFrame) -> bool:
+        status = gl.glClientWaitSync(pending.fence, 0, 0)
+        return status in (gl.GL_ALREADY_SIGNALED, gl.GL_CONDITION_SATISFIED)
+
+    def _finish_frame(self):
+        pending = self._pending.popleft()
+        gl.glClientWaitSync(pending.fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, gl.GL_TIMEOUT_IGNORED)
+        gl.glDeleteSync(pending.fence)
+        with pending.pbo.bound(), pending.pbo.mapped() as data:
+            # Copy the rows as they are, leaving the flip to the writer thread.
+            frame = np.copy(data)
+        self._free_pbos.append(pending.pbo)
+        self._queue.put(frame)
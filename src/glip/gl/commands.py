@@ -0,0 +1,12 @@
+"""Function calls which are queued for another thread to run."""
+
+from concurrent.futures import Future
+from typing import Any, Callable, NamedTuple
+
+
+class Command(NamedTuple):
+    """A queued function call, and the future which receives its result."""
+    function: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    future: Future
@@ -1,11 +1,16 @@
+import asyncio
+import threading
 import weakref
-from typing import Optional, Callable
+from typing import Callable, List, Optional, Tuple
 
 import OpenGL.GL as gl
 import glfw
 
 from glip.gl.input import Keyboard, Mouse
 
+# The OpenGL version of the contexts which windows create.
+CONTEXT_VERSION = (3, 3)
+
 _glfw_is_initialised = False
 def initialise_glfw():
     global _glfw_is_initialised
@@ -14,15 +19,25 @@ def initialise_glfw():
     if not glfw.init():
         raise RuntimeError('Failed to initialise GLFW.')
     glfw.window_hint(glfw.CLIENT_API, glfw.OPENGL_API)
-    glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
-    glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
+    glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, CONTEXT_VERSION[0])
+    glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, CONTEXT_VERSION[1])
     glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, True)
     _glfw_is_initialised = True
 
 
+def _set_future_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class _ActiveWindows(threading.local):
+    """The window whose context is current, which OpenGL tracks separately for each thread."""
+    window: Optional['Window'] = None
+
+
 class Window:
-    _active: Optional['Window'] = None
+    _active = _ActiveWindows()
     _default_classes = {}
 
     def __init__(
@@ -47,6 +62,14 @@ class Window:
             object_context.attach(self)
         self.object_context = object_context
         self._bound = {}
+        self._indexed_bound = {}
+        self._active_texture_unit = 0
+        self._caches = {}
+        # The thread which this window's context is current on, if any.
+        self._thread: Optional[threading.Thread] = None
+        # Objects destroyed by other threads while this window was active.
+        self._objects_to_forget = []
+        self._forget_lock = threading.Lock()
         self.activate()
         self._defaults = {}
         for kind, default_class in self._default_classes.items():
@@ -56,6 +79,11 @@ class Window:
         self.mouse = Mouse()
         # Callbacks
         self.on_resize: Optional[Callable[[int, int], None]] = None
+        self._before_swap_hooks: List[Callable[['Window'], None]] = []
+        # The number of frames presented so far, and futures waiting for the next frame.
+        self.frame_index = 0
+        self._frame_waiters: List[asyncio.Future] = []
+        self._frame_waiters_lock = threading.Lock()
         glfw.set_framebuffer_size_callback(self._glfw_window, self._framebuffer_size_callback)
         glfw.set_key_callback(self._glfw_window, self._key_callback)
         glfw.set_mouse_button_callback(self._glfw_window, self._mouse_button_callback)
@@ -100,27 +128,125 @@ class Window:
         if kind in self._bound:
             del self._bound[kind]
 
+    def set_indexed_bound(self, kind, index: int, binding):
+        """Record what is bound to an indexed binding point, such as a uniform buffer binding.
+
+        `binding` is a tuple whose first element is the bound object.
+        """
+        assert binding[0].kind == kind
+        self._indexed_bound[(kind, index)] = binding
+
+    def get_indexed_bound(self, kind, index: int):
+        return self._indexed_bound.get((kind, index), None)
+
+    def get_cache(self, key, factory: Optional[Callable[[], object]] = None):
+        """Get a per-window cache object, creating it with `factory` if it does not exist yet.
+
+        Cache objects must provide `evict(gl_object)`, which is called when a GL object is
+        destroyed, and `destroy()`, which is called when the window is destroyed.
+        """
+        if key not in self._caches:
+            if factory is None:
+                return None
+            self._caches[key] = factory()
+        return self._caches[key]
+
+    def forget_object(self, gl_object):
+        """Remove all references to a GL object which is being destroyed.
+
+        If this window is active on another thread, the references are removed by that thread
+        when it next calls `forget_destroyed_objects`.
+        """
+        with self._forget_lock:
+            if self._thread is not None and self._thread is not threading.current_thread():
+                self._objects_to_forget.append(gl_object)
+                return
+            self._forget_object(gl_object)
+
+    def forget_destroyed_objects(self):
+        """Remove references to objects which were destroyed by other threads."""
+        assert self.is_active()
+        with self._forget_lock:
+            objects, self._objects_to_forget = self._objects_to_forget, []
+        for gl_object in objects:
+            self._forget_object(gl_object)
+
+    def _forget_object(self, gl_object):
+        kind = getattr(gl_object, 'kind', None)
+        if kind is not None and gl_object is self._bound.get(kind, None):
+            self.clear_bound(kind)
+        self.clear_indexed_bound(gl_object)
+        for cache in self._caches.values():
+            cache.evict(gl_object)
+
+    def unset_indexed_bound(self, kind, index: int):
+        self._indexed_bound.pop((kind, index), None)
+
+    def clear_indexed_bound(self, gl_object):
+        """Forget all indexed binding points which refer to `gl_object`."""
+        for key, binding in list(self._indexed_bound.items()):
+            if binding[0] is gl_object:
+                del self._indexed_bound[key]
+
+    @property
+    def active_texture_unit(self) -> int:
+        return self._active_texture_unit
+
+    def set_active_texture_unit(self, unit: int) -> bool:
+        """Select the texture unit affected by texture binds, skipping redundant changes."""
+        assert self.is_active()
+        if unit == self._active_texture_unit:
+            return False
+        gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+        self._active_texture_unit = unit
+        return True
+
     @classmethod
     def get_active(cls) -> Optional['Window']:
-        return cls._active
+        """Get the window whose context is current on the calling thread."""
+        return cls._active.window
 
     def is_active(self):
         return self is Window.get_active()
 
     def activate(self):
+        """Make this window's context current on the calling thread.
+
+        A context can only be current on one thread at a time, so it must be released with
+        `deactivate` before it is activated on another thread.
+        """
+        thread = threading.current_thread()
+        if self._thread is not None and self._thread is not thread and self._thread.is_alive():
+            raise RuntimeError(f'Window is already active on thread {self._thread.name!r}')
+        previous = Window._active.window
+        if previous is not None and previous is not self:
+            previous._thread = None
         glfw.make_context_current(self._glfw_window)
-        Window._active = self
+        Window._active.window = self
+        with self._forget_lock:
+            self._thread = thread
+        self.forget_destroyed_objects()
+
+    def deactivate(self):
+        """Release this window's context from the calling thread."""
+        assert self.is_active()
+        glfw.make_context_current(None)
+        Window._active.window = None
+        self._thread = None
 
     def destroy(self):
-        old_active = Window._active
+        old_active = Window._active.window
         self.activate()
+        for cache in self._caches.values():
+            cache.destroy()
         for default in self._defaults.values():
             default.destroy()
         self.object_context.detach(self)
         glfw.destroy_window(self._glfw_window)
         del self._glfw_window
+        self._thread = None
         if old_active is None or old_active is self:
-            Window._active = None
+            Window._active.window = None
         else:
             old_active.activate()
 
@@ -148,11 +274,53 @@ class Window:
     def should_close(self, should_close: bool):
         glfw.set_window_should_close(self._glfw_window, should_close)
 
+    @property
+    def framebuffer_size(self) -> Tuple[int, int]:
+        """The size of the window's framebuffer in pixels."""
+        return glfw.get_framebuffer_size(self._glfw_window)
+
+    def add_before_swap_hook(self, hook: Callable[['Window'], None]):
+        """Register a function to be called by `tick` just before the buffers are swapped.
+
+        Hooks see the finished frame in the back buffer, e.g. to capture it.
+        """
+        self._before_swap_hooks.append(hook)
+
+    def remove_before_swap_hook(self, hook: Callable[['Window'], None]):
+        self._before_swap_hooks.remove(hook)
+
+    def poll_events(self):
+        """Process pending window events without presenting a frame."""
+        glfw.poll_events()
+
     def tick(self):
+        for hook in list(self._before_swap_hooks):
+            hook(self)
         glfw.swap_buffers(self._glfw_window)
         glfw.poll_events()
         self.keyboard.update()
         self.mouse.update()
+        self.frame_index += 1
+        with self._frame_waiters_lock:
+            waiters, self._frame_waiters = self._frame_waiters, []
+        for waiter in waiters:
+            # The waiter's event loop may be running on another thread, so it sets the result.
+            try:
+                waiter.get_loop().call_soon_threadsafe(_set_future_result, waiter,
+                                                       self.frame_index)
+            except RuntimeError:
+                # The event loop has been closed.
+                pass
+
+    async def next_frame(self) -> int:
+        """Wait until the next call to `tick` has presented a frame, and return its index.
+
+        `tick` may be called from a thread other than the one running the event loop.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        with self._frame_waiters_lock:
+            self._frame_waiters.append(waiter)
+        return await waiter
 
 
 class ObjectContext:
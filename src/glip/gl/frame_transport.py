@@ -0,0 +1,325 @@
+"""Publishing rendered frames to other processes through shared memory.
+
+A `FramePublisher` owns a ring of frame slots in a single shared memory block. Pixels are read
+from the framebuffer straight into the next slot, and a `FrameReader` in another process attaches
+to the block by name and returns NumPy views of the slots, so frames are never copied or pickled
+on their way to the consumer.
+
+Each slot has a small header with the frame index, timestamp, size and pixel format. The
+publisher never waits for readers, so a slot may be overwritten while a reader is still using
+it. Headers carry a sequence number which is odd while the slot is being written, and readers
+can check `Frame.is_valid()` after using (or copying) a frame to detect that it was overwritten.
+"""
+
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.objects import Framebuffer, PixelFormat, get_pixel_format
+
+MAGIC = b'GLIPFRMS'
+VERSION = 1
+# Slot headers and pixel data start on cache line boundaries.
+_ALIGNMENT = 64
+
+_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('n_slots', '<u4'),
+    ('slot_size', '<u8'),
+    # Index of the most recently published frame, or -1 if no frames have been published.
+    ('latest', '<i8'),
+    ('publisher_pid', '<i8'),
+])
+
+_SLOT_HEADER_DTYPE = np.dtype([
+    ('sequence', '<u8'),
+    ('frame_index', '<i8'),
+    ('timestamp', '<f8'),
+    ('nbytes', '<u8'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('channels', '<u4'),
+    ('gl_format', '<u4'),
+    ('gl_type', '<u4'),
+    ('dtype', 'S8'),
+])
+
+
+def _round_up(value, multiple):
+    return (value + multiple - 1) // multiple * multiple
+
+
+_HEADER_SIZE = _round_up(_HEADER_DTYPE.itemsize, _ALIGNMENT)
+_SLOT_HEADER_SIZE = _round_up(_SLOT_HEADER_DTYPE.itemsize, _ALIGNMENT)
+
+
+class _FrameRing:
+    """Views of the headers and slots in a shared memory block."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, n_slots: int, slot_size: int):
+        self.shm = shm
+        self.header = np.ndarray((), dtype=_HEADER_DTYPE, buffer=shm.buf)
+        stride = _SLOT_HEADER_SIZE + slot_size
+        self.slot_headers = [
+            np.ndarray((), dtype=_SLOT_HEADER_DTYPE, buffer=shm.buf,
+                       offset=_HEADER_SIZE + i * stride)
+            for i in range(n_slots)
+        ]
+        self.slot_data = [
+            np.ndarray(slot_size, dtype=np.uint8, buffer=shm.buf,
+                       offset=_HEADER_SIZE + i * stride + _SLOT_HEADER_SIZE)
+            for i in range(n_slots)
+        ]
+
+    @property
+    def n_slots(self) -> int:
+        return len(self.slot_headers)
+
+    def close(self):
+        self.header = None
+        self.slot_headers = []
+        self.slot_data = []
+        try:
+            self.shm.close()
+        except BufferError:
+            # Frames which are still referenced keep the block mapped until they are garbage
+            # collected.
+            pass
+
+
+class Frame:
+    """A published frame, viewed in place in shared memory."""
+
+    def __init__(self, index: int, timestamp: float, data: np.ndarray, pixel_format: PixelFormat,
+                 slot_header: np.ndarray, sequence: int):
+        self.index = index
+        self.timestamp = timestamp
+        # Pixels as a (height, width, channels) array whose first row is the bottom row, as
+        # returned by `glReadPixels`.
+        self.data = data
+        self.pixel_format = pixel_format
+        self._slot_header = slot_header
+        self._sequence = sequence
+
+    @property
+    def image(self) -> np.ndarray:
+        """A view of the pixels with the first row at the top."""
+        return self.data[::-1]
+
+    def is_valid(self) -> bool:
+        """Check that the slot has not been overwritten since the frame was read."""
+        return int(self._slot_header['sequence']) == self._sequence
+
+    def copy(self) -> np.ndarray:
+        """Copy the pixels out of shared memory.
+
+        Raises:
+            RuntimeError: If the frame was overwritten during the copy.
+        """
+        data = self.data.copy()
+        if not self.is_valid():
+            raise RuntimeError(f'Frame {self.index} was overwritten while it was being read')
+        return data
+
+
+class FramePublisher:
+    """A ring of shared memory slots which rendered frames are read into.
+
+    Frames may be of any size and format which fit into `max_width` by `max_height` pixels of
+    `pixel_format`. Frames are written to slots in turn, so readers have until `n_slots - 1` more
+    frames are published to use each frame.
+    """
+
+    def __init__(self, max_width: int, max_height: int,
+                 pixel_format: Optional[PixelFormat] = None, n_slots: int = 3,
+                 name: Optional[str] = None):
+        if pixel_format is None:
+            pixel_format = get_pixel_format(gl.GL_RGBA8)
+        slot_size = _round_up(max_width * max_height * pixel_format.channels
+                              * pixel_format.dtype.itemsize, _ALIGNMENT)
+        size = _HEADER_SIZE + n_slots * (_SLOT_HEADER_SIZE + slot_size)
+        shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self._ring = _FrameRing(shm, n_slots, slot_size)
+        header = self._ring.header
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['n_slots'] = n_slots
+        header['slot_size'] = slot_size
+        header['latest'] = -1
+        header['publisher_pid'] = os.getpid()
+        self.slot_size = slot_size
+        self.next_index = 0
+
+    @property
+    def name(self) -> str:
+        """The name which readers attach to."""
+        return self._ring.shm.name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _begin_frame(self, shape, pixel_format: PixelFormat, timestamp):
+        """Mark the next slot as being written and return a view to write pixels into."""
+        height, width, channels = shape
+        nbytes = height * width * channels * pixel_format.dtype.itemsize
+        if nbytes > self.slot_size:
+            raise ValueError(f'Frame of {nbytes} bytes does not fit in a slot of '
+                             f'{self.slot_size} bytes')
+        slot = self.next_index % self._ring.n_slots
+        slot_header = self._ring.slot_headers[slot]
+        slot_header['sequence'] += 1
+        slot_header['frame_index'] = self.next_index
+        slot_header['timestamp'] = time.time() if timestamp is None else timestamp
+        slot_header['nbytes'] = nbytes
+        slot_header['width'] = width
+        slot_header['height'] = height
+        slot_header['channels'] = channels
+        slot_header['gl_format'] = pixel_format.format
+        slot_header['gl_type'] = pixel_format.gl_type
+        slot_header['dtype'] = pixel_format.dtype.str.encode('ascii')
+        return self._ring.slot_data[slot][:nbytes].view(pixel_format.dtype).reshape(shape)
+
+    def _end_frame(self) -> int:
+        index = self.next_index
+        self._ring.slot_headers[index % self._ring.n_slots]['sequence'] += 1
+        self._ring.header['latest'] = index
+        self.next_index += 1
+        return index
+
+    def publish(self, x: int = 0, y: int = 0, width: Optional[int] = None,
+                height: Optional[int] = None, attachment=gl.GL_COLOR_ATTACHMENT0,
+                pixel_format: Optional[PixelFormat] = None,
+                timestamp: Optional[float] = None) -> int:
+        """Read a region of the bound framebuffer into the next slot.
+
+        This waits for rendering to finish. The region defaults to the whole viewport.
+
+        Returns:
+            The index of the published frame.
+        """
+        framebuffer = Framebuffer.get_bound()
+        if width is None or height is None:
+            _, _, viewport_width, viewport_height = gl.glGetIntegerv(gl.GL_VIEWPORT)
+            width = int(viewport_width) if width is None else width
+            height = int(viewport_height) if height is None else height
+        if pixel_format is None:
+            pixel_format = framebuffer._get_pixel_format(attachment)
+        out = self._begin_frame((height, width, pixel_format.channels), pixel_format, timestamp)
+        framebuffer.read_pixels(x, y, width, height, attachment, pixel_format, out=out)
+        return self._end_frame()
+
+    def publish_array(self, data: np.ndarray, pixel_format: Optional[PixelFormat] = None,
+                      timestamp: Optional[float] = None) -> int:
+        """Copy an image which has already been read back into the next slot.
+
+        `data` must have shape (height, width, channels). If `pixel_format` is not given, the
+        frame is described by its channel count and data type alone.
+        """
+        data = np.asarray(data)
+        if pixel_format is None:
+            pixel_format = PixelFormat(0, 0, data.shape[-1], data.dtype)
+        out = self._begin_frame(data.shape, pixel_format, timestamp)
+        out[...] = data
+        return self._end_frame()
+
+    def close(self):
+        """Free the shared memory. Readers which are still attached keep their mapping."""
+        shm = self._ring.shm
+        self._ring.close()
+        shm.unlink()
+
+
+class FrameReader:
+    """Attaches to a `FramePublisher` by name and returns frames without copying them."""
+
+    def __init__(self, name: str):
+        shm = shared_memory.SharedMemory(name)
+        header = np.ndarray((), dtype=_HEADER_DTYPE, buffer=shm.buf)
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            del header
+            shm.close()
+            raise ValueError(f'Shared memory block {name!r} is not a frame ring')
+        n_slots = int(header['n_slots'])
+        slot_size = int(header['slot_size'])
+        publisher_pid = int(header['publisher_pid'])
+        del header
+        if publisher_pid != os.getpid():
+            # Attaching registers the block with this process's resource tracker, which would
+            # unlink it when this process exits, but the block belongs to the publisher.
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        self._ring = _FrameRing(shm, n_slots, slot_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def latest_index(self) -> int:
+        """The index of the most recently published frame, or -1 if there are none."""
+        return int(self._ring.header['latest'])
+
+    def read(self, index: int) -> Frame:
+        """Get a published frame by index.
+
+        Raises:
+            KeyError: If the frame has not been published yet or has been overwritten.
+        """
+        if index < 0 or index > self.latest_index:
+            raise KeyError(f'Frame {index} has not been published')
+        slot_header = self._ring.slot_headers[index % self._ring.n_slots]
+        sequence = int(slot_header['sequence'])
+        header = slot_header.copy()[()]
+        if sequence % 2 == 1 or int(header['frame_index']) != index:
+            raise KeyError(f'Frame {index} has been overwritten')
+        dtype = np.dtype(header['dtype'].decode('ascii'))
+        pixel_format = PixelFormat(int(header['gl_format']), int(header['gl_type']),
+                                   int(header['channels']), dtype)
+        shape = (int(header['height']), int(header['width']), pixel_format.channels)
+        data = self._ring.slot_data[index % self._ring.n_slots][:int(header['nbytes'])]
+        data = data.view(dtype).reshape(shape)
+        data.flags.writeable = False
+        frame = Frame(index, float(header['timestamp']), data, pixel_format, slot_header,
+                      sequence)
+        if not frame.is_valid():
+            raise KeyError(f'Frame {index} has been overwritten')
+        return frame
+
+    def latest(self) -> Optional[Frame]:
+        """Get the most recently published frame, or None if there are none yet."""
+        while True:
+            index = self.latest_index
+            if index < 0:
+                return None
+            try:
+                return self.read(index)
+            except KeyError:
+                # The publisher lapped the ring between reading the index and the slot.
+                continue
+
+    def wait(self, index: int, timeout: Optional[float] = None,
+             poll_interval: float = 0.001) -> Frame:
+        """Wait until a frame has been published and get it.
+
+        Raises:
+            TimeoutError: If the frame is not published within `timeout` seconds.
+            KeyError: If the frame has already been overwritten.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.latest_index < index:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f'Timed out waiting for frame {index}')
+            time.sleep(poll_interval)
+        return self.read(index)
+
+    def close(self):
+        self._ring.close()
@@ -0,0 +1,213 @@
+"""Image processing on the GPU with chains of full-screen fragment shader passes.
+
+Each pass draws a triangle covering its target texture, so its fragment shader runs once per
+output pixel. Fragment shaders receive the output of the previous pass (or the input image) as:
+
+    in vec2 uv;                 // Texture coordinates of the output pixel, in [0, 1].
+    uniform sampler2D image;    // The input image (use usampler2D for unsigned integer inputs).
+    uniform vec2 texel_size;    // 1 / (width, height), if declared.
+
+For example, a horizontal box blur followed by a conversion to greyscale:
+
+    blur = ImagePass('''
+        #version 330 core
+        in vec2 uv;
+        uniform sampler2D image;
+        uniform vec2 texel_size;
+        out vec4 colour;
+        void main() {
+            colour = (texture(image, uv - vec2(texel_size.x, 0.0)) + texture(image, uv)
+                      + texture(image, uv + vec2(texel_size.x, 0.0))) / 3.0;
+        }
+    ''')
+    grey = ImagePass(grey_source, internal_format=gl.GL_R32F)
+    pipeline = PassPipeline([blur, grey])
+    result = pipeline.run(image)
+
+Intermediate results stay on the GPU in textures which are reused between runs. The first row
+of an image array is at `uv.y == 0`, and results are read back in the same orientation. Blending
+should be disabled while a pipeline runs.
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.context import Window
+from glip.gl.objects import (VAO, Framebuffer, PrimitiveType, ShaderProgram, Texture2D,
+                             VertexShader, get_array_internal_format, get_pixel_format)
+
+_VERTEX_SHADER_SOURCE = r"""
+#version 330 core
+out vec2 uv;
+
+void main() {
+    // Vertices (0, 0), (2, 0) and (0, 2) in texture coordinates cover the whole viewport.
+    uv = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+    gl_Position = vec4(uv * 2.0 - 1.0, 0.0, 1.0);
+}
+"""
+
+class _FullScreenTriangle:
+    """A per-window cache of the VAO and vertex shader used for full-screen passes.
+
+    The triangle's vertices are generated from `gl_VertexID`, so the VAO has no attributes.
+    """
+
+    def __init__(self):
+        self.vao = VAO()
+        self.vertex_shader = VertexShader()
+        self.vertex_shader.compile(_VERTEX_SHADER_SOURCE)
+
+    def evict(self, gl_object):
+        pass
+
+    def destroy(self):
+        self.vao.destroy()
+        self.vertex_shader.destroy()
+
+
+def _get_full_screen_triangle() -> _FullScreenTriangle:
+    return Window.get_active().get_cache(_FullScreenTriangle, _FullScreenTriangle)
+
+
+def draw_full_screen_triangle():
+    """Draw a triangle which covers the viewport, with `uv` texture coordinates from 0 to 1."""
+    vao = _get_full_screen_triangle().vao
+    with vao.bound():
+        vao.draw_arrays(PrimitiveType.TRIANGLES, 0, 3)
+
+
+class ImagePass:
+    """A fragment shader which is run over every pixel of an image."""
+
+    def __init__(self, fragment_shader: str, uniforms: Optional[Dict[str, object]] = None,
+                 textures: Optional[Dict[str, Texture2D]] = None,
+                 internal_format=None):
+        """
+        Args:
+            fragment_shader: GLSL source of the fragment shader.
+            uniforms: Values of extra uniforms, which can be changed between runs.
+            textures: Extra textures to bind, keyed by sampler uniform name.
+            internal_format: Internal format of the output texture. Defaults to the pipeline's
+                format.
+        """
+        triangle = _get_full_screen_triangle()
+        self.program = ShaderProgram(vertex_shader=triangle.vertex_shader,
+                                     fragment_shader=fragment_shader)
+        self.uniforms = dict(uniforms or {})
+        self.textures = dict(textures or {})
+        self.internal_format = internal_format
+
+    def draw(self, source: Texture2D):
+        """Run the pass with `source` as its input, into the bound framebuffer."""
+        with self.program.bound():
+            textures = [source] + list(self.textures.values())
+            for unit, texture in enumerate(textures):
+                texture.bind_to_unit(unit)
+            if self.program.has_uniform('image'):
+                self.program.set_uniform('image', 0)
+            for unit, name in enumerate(self.textures, start=1):
+                self.program.set_uniform(name, unit)
+            if self.program.has_uniform('texel_size'):
+                self.program.set_uniform('texel_size', [1 / source.width, 1 / source.height])
+            for name, value in self.uniforms.items():
+                self.program.set_uniform(name, value)
+            draw_full_screen_triangle()
+
+    def destroy(self):
+        self.program.destroy()
+
+
+class PassPipeline:
+    """Runs a chain of image passes, ping-ponging between intermediate textures."""
+
+    def __init__(self, passes: List[ImagePass], internal_format=gl.GL_RGBA32F):
+        """
+        Args:
+            passes: The passes to run, in order.
+            internal_format: Internal format of the output of passes which do not choose their
+                own. This must be colour-renderable.
+        """
+        if len(passes) == 0:
+            raise ValueError('A pipeline needs at least one pass')
+        self.passes = list(passes)
+        self.internal_format = internal_format
+        self.framebuffer = Framebuffer()
+        self._input: Optional[Texture2D] = None
+        # Pairs of textures which passes render into, keyed by size and internal format.
+        self._targets: Dict[Tuple[int, int, int], List[Texture2D]] = {}
+
+    @staticmethod
+    def _allocate_texture(width, height, internal_format) -> Texture2D:
+        texture = Texture2D()
+        with texture.bound():
+            texture.allocate(width, height, internal_format)
+            # Integer textures cannot be filtered.
+            texture_filter = (gl.GL_NEAREST if get_pixel_format(internal_format).is_integer
+                              else gl.GL_LINEAR)
+            texture.set_parameter(gl.GL_TEXTURE_MIN_FILTER, texture_filter)
+            texture.set_parameter(gl.GL_TEXTURE_MAG_FILTER, texture_filter)
+            texture.set_parameter(gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+            texture.set_parameter(gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        return texture
+
+    def _upload(self, image: np.ndarray) -> Texture2D:
+        """Write an image into the input texture, reallocating it if necessary."""
+        if image.ndim == 2:
+            image = image[..., None]
+        height, width = image.shape[:2]
+        internal_format = get_array_internal_format(image)
+        texture = self._input
+        if (texture is None or texture.width != width or texture.height != height
+                or texture.internal_format != internal_format):
+            if texture is not None:
+                texture.destroy()
+            texture = self._input = self._allocate_texture(width, height, internal_format)
+        with texture.bound():
+            texture.write(image)
+        return texture
+
+    def _get_target(self, width, height, internal_format, source: Texture2D) -> Texture2D:
+        key = (width, height, internal_format)
+        if key not in self._targets:
+            self._targets[key] = [self._allocate_texture(width, height, internal_format)
+                                  for _ in range(2)]
+        targets = self._targets[key]
+        return targets[1] if targets[0] is source else targets[0]
+
+    def run(self, image: Union[np.ndarray, Texture2D], read_back: bool = True
+            ) -> Union[np.ndarray, Texture2D]:
+        """Run the passes on an image.
+
+        Args:
+            image: A (height, width) or (height, width, channels) array of uint8, float32 or
+                uint32 values, or a texture.
+            read_back: If True, return the result as an array of shape (height, width,
+                channels). Otherwise, return the output texture, which is owned by the pipeline
+                and is overwritten by the next run.
+        """
+        source = self._upload(np.asarray(image)) if isinstance(image, np.ndarray) else image
+        width, height = source.width, source.height
+        window = Window.get_active()
+        window.set_viewport(0, 0, width, height)
+        with self.framebuffer.bound():
+            for image_pass in self.passes:
+                internal_format = image_pass.internal_format or self.internal_format
+                target = self._get_target(width, height, internal_format, source)
+                self.framebuffer.attach_texture(gl.GL_COLOR_ATTACHMENT0, target)
+                image_pass.draw(source)
+                source = target
+            if read_back:
+                return self.framebuffer.read_pixels(0, 0, width, height)
+        return source
+
+    def destroy(self):
+        self.framebuffer.destroy()
+        if self._input is not None:
+            self._input.destroy()
+        for targets in self._targets.values():
+            for texture in targets:
+                texture.destroy()
+        self._targets = {}
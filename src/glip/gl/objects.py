@@ -5,13 +5,14 @@ import traceback
 import warnings
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
-from typing import Optional, Dict, List, Union
+from typing import Optional, Dict, List, NamedTuple, Sequence, Union
 
 import OpenGL.GL as gl
 import numpy as np
 
 from glip.config import cfg
 from glip.gl.context import Window
+from glip.gl.std140 import _GL_TYPES, Std140Layout, UniformBlock
 
 
 def np_to_gl_type(dtype):
@@ -36,6 +37,37 @@ def np_to_gl_type(dtype):
     raise TypeError(f'Unsupported base data type: {dtype}')
 
 
+def _packed_gl_type(dtype):
+    if dtype == np.int32:
+        return gl.GL_INT_2_10_10_10_REV
+    if dtype == np.uint32:
+        return gl.GL_UNSIGNED_INT_2_10_10_10_REV
+    raise TypeError(f'Unsupported data type for packed attributes: {dtype}')
+
+
+def narrow_indices(indices: np.ndarray) -> np.ndarray:
+    """Convert indices to the smallest unsigned integer type which can hold them.
+
+    The largest value of each type is avoided, since it is commonly used as the primitive restart
+    index.
+    """
+    indices = np.asarray(indices)
+    if not np.issubdtype(indices.dtype, np.integer):
+        raise ValueError(f'Indices must be integers, not {indices.dtype}')
+    if indices.size == 0:
+        return indices.astype(np.uint8, copy=False)
+    min_index = int(indices.min())
+    if min_index < 0:
+        raise ValueError(f'Index {min_index} is negative')
+    max_index = int(indices.max())
+    for dtype in [np.uint8, np.uint16, np.uint32]:
+        if max_index < np.iinfo(dtype).max:
+            return indices.astype(dtype, copy=False)
+    if max_index == np.iinfo(np.uint32).max:
+        raise ValueError(f'Index {max_index} is reserved for primitive restart')
+    raise ValueError(f'Index {max_index} is too large')
+
+
 class PrimitiveType(enum.Enum):
     POINTS = gl.GL_POINTS
     LINES = gl.GL_LINES
@@ -162,8 +194,7 @@ class _BindableGLObject(_GLObject):
         else:
             windows = [self._window]
         for window in windows:
-            if self is window.get_bound(self.kind):
-                window.clear_bound(self.kind)
+            window.forget_object(self)
 
 
 class BufferObject(_BindableGLObject):
@@ -173,13 +204,77 @@ class BufferObject(_BindableGLObject):
     def _target(cls) -> str:
         pass
 
-    def __init__(self):
+    def __init__(self, usage=gl.GL_DYNAMIC_DRAW):
         super().__init__(gl.glGenBuffers(1), shareable=True)
+        self.usage = usage
+        # Size of the buffer's data store in bytes.
+        self.size = 0
 
     @classmethod
     def _do_bind(cls, handle):
         gl.glBindBuffer(cls._target, handle)
 
+    def allocate(self, size: int):
+        """Allocate an uninitialised data store of `size` bytes."""
+        assert self.is_bound()
+        gl.glBufferData(self._target, size, None, self.usage)
+        self.size = size
+
+    def allocate_and_write(self, data: np.ndarray):
+        assert self.is_bound()
+        gl.glBufferData(self._target, data.nbytes, data.data, self.usage)
+        self.size = data.nbytes
+
+    def write(self, data: np.ndarray, offset: int = 0):
+        """Overwrite part of the buffer's data store, starting at byte `offset`."""
+        assert self.is_bound()
+        assert offset + data.nbytes <= self.size
+        data = np.ascontiguousarray(data)
+        gl.glBufferSubData(self._target, offset, data.nbytes, data)
+
+    @contextmanager
+    def mapped(self, offset: int = 0, size: Optional[int] = None, access=gl.GL_MAP_READ_BIT):
+        """Map part of the buffer into host memory, yielding it as a uint8 array.
+
+        The array must not be used after the context exits, since the buffer is then unmapped.
+        """
+        assert self.is_bound()
+        if size is None:
+            size = self.size - offset
+        assert offset + size <= self.size
+        address = gl.glMapBufferRange(self._target, offset, size, access)
+        if not address:
+            raise RuntimeError('Failed to map buffer')
+        try:
+            yield np.ctypeslib.as_array((C.c_ubyte * size).from_address(address))
+        finally:
+            gl.glUnmapBuffer(self._target)
+
+    def read(self, size: Optional[int] = None, offset: int = 0) -> np.ndarray:
+        """Read bytes back from the buffer's data store."""
+        if size is None:
+            size = self.size - offset
+        assert offset + size <= self.size
+        data = np.empty(size, dtype=np.uint8)
+        # As with copy_to, the copy read target is used so that no tracked bindings are changed.
+        gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, self.handle)
+        gl.glGetBufferSubData(gl.GL_COPY_READ_BUFFER, offset, size, data)
+        return data
+
+    def copy_to(self, other: 'BufferObject', size: int, src_offset: int = 0,
+                dst_offset: int = 0):
+        """Copy bytes between buffers on the GPU.
+
+        The source and destination ranges must not overlap if `other` is this buffer.
+        """
+        assert src_offset + size <= self.size
+        assert dst_offset + size <= other.size
+        # The copy targets are not used for anything else, so their bindings aren't tracked.
+        gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, self.handle)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, other.handle)
+        gl.glCopyBufferSubData(gl.GL_COPY_READ_BUFFER, gl.GL_COPY_WRITE_BUFFER,
+                               src_offset, dst_offset, size)
+
     def _do_destroy(self):
         if gl.glDeleteBuffers is not None:
             gl.glDeleteBuffers(1, [self.handle])
@@ -190,32 +285,57 @@ class VBO(BufferObject):
     _target = gl.GL_ARRAY_BUFFER
 
     def __init__(self, data: Optional[np.ndarray] = None, usage=gl.GL_DYNAMIC_DRAW):
-        super().__init__()
-        self.usage = usage
+        super().__init__(usage)
         if data is not None:
             with self.bound():
                 self.allocate_and_write(data)
 
-    def allocate_and_write(self, data: np.ndarray):
+    def gl_vertex_attrib_pointer(self, index, size, dtype, normalised: bool, stride: int, offset: int,
+                                 packed: bool = False):
+        """Specify the location and format of a floating point vertex attribute.
+
+        If `packed` is True, each int32 or uint32 element holds four components in the
+        GL_INT_2_10_10_10_REV or GL_UNSIGNED_INT_2_10_10_10_REV format respectively.
+        """
         assert self.is_bound()
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, data.nbytes, data.data, self.usage)
+        gl_type = _packed_gl_type(dtype) if packed else np_to_gl_type(dtype)
+        gl.glVertexAttribPointer(index, size, gl_type, normalised, stride, C.c_void_p(offset))
 
-    def gl_vertex_attrib_pointer(self, index, size, dtype, normalised: bool, stride: int, offset: int):
+    def gl_vertex_attrib_i_pointer(self, index, size, dtype, stride: int, offset: int):
+        """Specify the location and format of a pure integer vertex attribute (e.g. `ivec3`)."""
         assert self.is_bound()
-        gl.glVertexAttribPointer(index, size, np_to_gl_type(dtype), normalised, stride, C.c_void_p(offset))
+        gl.glVertexAttribIPointer(index, size, np_to_gl_type(dtype), stride, C.c_void_p(offset))
 
 
 class EBO(BufferObject):
     kind = object()
     _target = gl.GL_ELEMENT_ARRAY_BUFFER
 
-    def __init__(self, data: np.ndarray, usage=gl.GL_DYNAMIC_DRAW):
-        super().__init__()
-        self.usage = usage
-        self._length = len(data)
-        self._gl_type = np_to_gl_type(data.dtype.base)
-        with self.bound():
-            self.allocate_and_write(data)
+    def __init__(self, data: Optional[np.ndarray] = None, usage=gl.GL_DYNAMIC_DRAW, dtype=np.uint32,
+                 narrow: bool = False):
+        """Create an element buffer object.
+
+        If `data` is None, the buffer is left empty and `dtype` gives the type of the indices which
+        will be written to it later. If `narrow` is True, `data` is stored using the smallest index
+        type which can hold it (see `narrow_indices`).
+        """
+        super().__init__(usage)
+        if data is not None and narrow:
+            data = narrow_indices(data)
+        self._set_index_type(np.dtype(dtype if data is None else data.dtype.base), 0)
+        if data is not None:
+            with self.bound():
+                self.allocate_and_write(data)
+
+    def _set_index_type(self, dtype, length):
+        self._length = length
+        self._gl_type = np_to_gl_type(dtype)
+        self._itemsize = dtype.itemsize
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype({gl.GL_UNSIGNED_BYTE: np.uint8, gl.GL_UNSIGNED_SHORT: np.uint16,
+                         gl.GL_UNSIGNED_INT: np.uint32}[self._gl_type])
 
     def bind(self) -> bool:
         changed = super().bind()
@@ -224,26 +344,177 @@ class EBO(BufferObject):
             vao._ebo = self
         return changed
 
+    def allocate(self, size: int):
+        super().allocate(size)
+        self._length = size // self._itemsize
+
     def allocate_and_write(self, data: np.ndarray):
-        assert self.is_bound()
-        gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, data.nbytes, data.data, self.usage)
+        super().allocate_and_write(data)
+        self._set_index_type(data.dtype.base, len(data))
 
-    def draw_elements(self, mode: PrimitiveType = PrimitiveType.TRIANGLES):
+    def draw_elements(self, mode: PrimitiveType = PrimitiveType.TRIANGLES,
+                      count: Optional[int] = None, offset: int = 0, base_vertex: int = 0):
+        """Draw using `count` indices starting at index `offset` (all indices by default).
+
+        `base_vertex` is added to each index before fetching vertices.
+        """
         assert self.is_bound()
-        gl.glDrawElements(mode.value, self._length, self._gl_type, None)
+        if count is None:
+            count = self._length - offset
+        indices = C.c_void_p(offset * self._itemsize)
+        if base_vertex == 0:
+            gl.glDrawElements(mode.value, count, self._gl_type, indices)
+        else:
+            gl.glDrawElementsBaseVertex(mode.value, count, self._gl_type, indices, base_vertex)
+
+
+class PixelPackBuffer(BufferObject):
+    """A buffer which pixel data can be read into asynchronously with `Framebuffer.read_pixels`."""
+    kind = object()
+    _target = gl.GL_PIXEL_PACK_BUFFER
+
+    def __init__(self, size: int = 0, usage=gl.GL_STREAM_READ):
+        super().__init__(usage)
+        if size > 0:
+            with self.bound():
+                self.allocate(size)
 
 
-class UBO(BufferObject):
+class PixelUnpackBuffer(BufferObject):
+    """A buffer which texture data can be uploaded from asynchronously with `Texture2D.write`."""
+    kind = object()
+    _target = gl.GL_PIXEL_UNPACK_BUFFER
+
+    def __init__(self, size: int = 0, usage=gl.GL_STREAM_DRAW):
+        super().__init__(usage)
+        if size > 0:
+            with self.bound():
+                self.allocate(size)
+
+
+class _IndexedBufferObject(BufferObject):
+    """A buffer object whose target has indexed binding points."""
+
+    def bind_base(self, index: int) -> bool:
+        """Bind the whole buffer to an indexed binding point.
+
+        Returns False if the buffer was already bound there.
+        """
+        window = Window.get_active()
+        binding = (self, 0, None)
+        if window.get_indexed_bound(self.kind, index) == binding:
+            return False
+        gl.glBindBufferBase(self._target, index, self.handle)
+        window.set_indexed_bound(self.kind, index, binding)
+        # Indexed binding also binds the buffer to the generic binding point.
+        self._set_bound()
+        return True
+
+    def bind_range(self, index: int, offset: int, size: int) -> bool:
+        """Bind part of the buffer to an indexed binding point.
+
+        `offset` must be a multiple of the target's offset alignment (for example,
+        GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT). Returns False if the range was already bound there.
+        """
+        window = Window.get_active()
+        binding = (self, offset, size)
+        if window.get_indexed_bound(self.kind, index) == binding:
+            return False
+        gl.glBindBufferRange(self._target, index, self.handle, offset, size)
+        window.set_indexed_bound(self.kind, index, binding)
+        self._set_bound()
+        return True
+
+    @classmethod
+    def get_indexed_bound(cls, index: int):
+        binding = Window.get_active().get_indexed_bound(cls.kind, index)
+        if binding is None:
+            return None
+        return binding[0]
+
+
+class UBO(_IndexedBufferObject):
     kind = object()
     _target = gl.GL_UNIFORM_BUFFER
 
+    def __init__(self, data: Optional[Union[np.ndarray, UniformBlock, int]] = None,
+                 usage=gl.GL_DYNAMIC_DRAW):
+        """Create a uniform buffer object.
+
+        `data` may be an array or `UniformBlock` to upload, or a size in bytes to allocate.
+        """
+        super().__init__(usage)
+        if isinstance(data, int):
+            with self.bound():
+                self.allocate(data)
+        elif data is not None:
+            with self.bound():
+                self.allocate_and_write(data)
+
+    @staticmethod
+    def get_offset_alignment() -> int:
+        """Get the required alignment for offsets passed to `bind_range`."""
+        return int(gl.glGetIntegerv(gl.GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT))
+
+    def allocate_and_write(self, data: Union[np.ndarray, UniformBlock]):
+        if isinstance(data, UniformBlock):
+            data = data.data
+        super().allocate_and_write(data)
+
+    def write(self, data: Union[np.ndarray, UniformBlock], offset: int = 0):
+        if isinstance(data, UniformBlock):
+            data = data.data
+        super().write(data, offset)
+
 
 class VertexAttrib:
-    def __init__(self, index: int, size: int, dtype):
+    def __init__(self, index: int, size: int, dtype, normalised: bool = False,
+                 integer: bool = False, packed: bool = False):
+        """Describe the format of a vertex attribute.
+
+        Args:
+            index: The attribute location.
+            size: The number of components.
+            dtype: The component data type, or for packed attributes the data type of each
+                packed element (int32 or uint32).
+            normalised: If True, integer components are mapped to [-1, 1] (signed) or [0, 1]
+                (unsigned) when read by the shader.
+            integer: If True, integer components are read as integers (e.g. by an `ivec3`
+                shader input) rather than being converted to floating point.
+            packed: If True, each element packs four components in the 2_10_10_10_REV format.
+        """
         assert 0 <= index < gl.glGetIntegerv(gl.GL_MAX_VERTEX_ATTRIBS)
+        assert not (integer and (normalised or packed))
+        assert not packed or size == 4
         self.index = index
         self.size = size
         self.dtype = dtype
+        self.normalised = normalised
+        self.integer = integer
+        self.packed = packed
+
+
+class VertexAttribBinding(NamedTuple):
+    """The configuration of a single vertex attribute array within a VAO."""
+    index: int
+    vbo: VBO
+    size: int
+    dtype: np.dtype
+    normalised: bool
+    stride: int
+    offset: int
+    divisor: int
+    integer: bool = False
+    packed: bool = False
+
+    @classmethod
+    def create(cls, vertex_attrib: VertexAttrib, vbo: VBO, stride: int, offset: int = 0,
+               divisor: int = 0, normalised: Optional[bool] = None) -> 'VertexAttribBinding':
+        if normalised is None:
+            normalised = vertex_attrib.normalised
+        return cls(vertex_attrib.index, vbo, vertex_attrib.size, np.dtype(vertex_attrib.dtype),
+                   normalised, stride, offset, divisor, vertex_attrib.integer,
+                   vertex_attrib.packed)
 
 
 class _VAO(_BindableGLObject):
@@ -252,6 +523,7 @@ class _VAO(_BindableGLObject):
     def __init__(self, handle):
         super().__init__(handle, shareable=False)
         self._ebo = None
+        self._attrib_bindings: Dict[int, VertexAttribBinding] = {}
 
     def bind(self) -> bool:
         changed = super().bind()
@@ -270,18 +542,62 @@ class _VAO(_BindableGLObject):
     def ebo(self):
         return self._ebo
 
-    def draw_elements(self, mode: PrimitiveType = PrimitiveType.TRIANGLES):
+    def draw_elements(self, mode: PrimitiveType = PrimitiveType.TRIANGLES,
+                      count: Optional[int] = None, offset: int = 0, base_vertex: int = 0):
         assert self.is_bound()
         assert self.ebo is not None
-        self.ebo.draw_elements(mode)
+        self.ebo.draw_elements(mode, count, offset, base_vertex)
+
+    def draw_arrays(self, mode: PrimitiveType, first: int, count: int):
+        assert self.is_bound()
+        gl.glDrawArrays(mode.value, first, count)
+
+    @property
+    def attrib_bindings(self) -> Dict[int, VertexAttribBinding]:
+        """The configuration of each connected vertex attribute array, keyed by attribute index."""
+        return dict(self._attrib_bindings)
+
+    def get_layout_key(self):
+        """Get a hashable description of this VAO's attribute configuration and EBO."""
+        return tuple(sorted(self._attrib_bindings.values(), key=lambda b: b.index)), self.ebo
+
+    def diff(self, other: '_VAO') -> List[str]:
+        """Describe the differences between the state of this VAO and another."""
+        differences = []
+        if self.ebo is not other.ebo:
+            differences.append(f'ebo: {self.ebo!r} != {other.ebo!r}')
+        for index in sorted(set(self._attrib_bindings) | set(other._attrib_bindings)):
+            a = self._attrib_bindings.get(index)
+            b = other._attrib_bindings.get(index)
+            if a != b:
+                differences.append(f'attrib {index}: {a} != {b}')
+        return differences
 
     def connect_vertex_attrib_array(self, vertex_attrib: VertexAttrib, vbo: VBO, stride: int,
-                                    offset: int = 0):
+                                    offset: int = 0, divisor: int = 0,
+                                    normalised: Optional[bool] = None):
+        """Read a vertex attribute from `vbo`.
+
+        `normalised` overrides the normalisation setting of `vertex_attrib` if given.
+        """
         assert self.is_bound()
         assert vbo.is_bound()
-        self.gl_enable_vertex_attrib_array(vertex_attrib.index)
-        vbo.gl_vertex_attrib_pointer(vertex_attrib.index, vertex_attrib.size, vertex_attrib.dtype,
-                                     False, stride, offset)
+        binding = VertexAttribBinding.create(vertex_attrib, vbo, stride, offset, divisor,
+                                             normalised)
+        self._apply_attrib_binding(binding)
+
+    def _apply_attrib_binding(self, binding: VertexAttribBinding):
+        self.gl_enable_vertex_attrib_array(binding.index)
+        if binding.integer:
+            binding.vbo.gl_vertex_attrib_i_pointer(binding.index, binding.size, binding.dtype,
+                                                   binding.stride, binding.offset)
+        else:
+            binding.vbo.gl_vertex_attrib_pointer(binding.index, binding.size, binding.dtype,
+                                                 binding.normalised, binding.stride,
+                                                 binding.offset, binding.packed)
+        if binding.divisor != 0 or binding.index in self._attrib_bindings:
+            gl.glVertexAttribDivisor(binding.index, binding.divisor)
+        self._attrib_bindings[binding.index] = binding
 
     def gl_enable_vertex_attrib_array(self, index):
         assert self.is_bound()
@@ -311,12 +627,161 @@ class VAO(_VAO):
     def get_default(cls):
         return Window.get_default(cls.kind)
 
+    @classmethod
+    def get_cached(cls, attrib_bindings: Sequence[VertexAttribBinding],
+                   ebo: Optional[EBO] = None) -> 'VAO':
+        """Get a VAO with the given configuration from the active window's VAO cache.
+
+        The VAO is created and configured if an identical configuration has not been requested
+        before. Cached VAOs are owned by the cache, and must not be destroyed or reconfigured.
+        """
+        return Window.get_active().get_cache(VAOCache, VAOCache).get(attrib_bindings, ebo)
+
     def _do_destroy(self):
         if gl.glDeleteVertexArrays is not None:
             gl.glDeleteVertexArrays(1, [self.handle])
 
 
+class VAOCache:
+    """A per-window cache of VAOs, keyed by their attribute configuration and EBO."""
+
+    def __init__(self):
+        self._vaos: Dict[tuple, VAO] = {}
+        # VAOs which refer to destroyed buffers, waiting to be destroyed.
+        self._stale: List[VAO] = []
+
+    def __len__(self):
+        return len(self._vaos)
+
+    def get(self, attrib_bindings: Sequence[VertexAttribBinding],
+            ebo: Optional[EBO] = None) -> VAO:
+        self._destroy_stale()
+        key = (tuple(sorted(attrib_bindings, key=lambda b: b.index)), ebo)
+        vao = self._vaos.get(key)
+        if vao is None:
+            vao = VAO(ebo)
+            with vao.bound():
+                for binding in key[0]:
+                    with binding.vbo.bound():
+                        vao._apply_attrib_binding(binding)
+            self._vaos[key] = vao
+        return vao
+
+    def evict(self, gl_object):
+        """Remove cached VAOs which refer to `gl_object`."""
+        for key, vao in list(self._vaos.items()):
+            attrib_bindings, ebo = key
+            if ebo is gl_object or vao is gl_object \
+                    or any(binding.vbo is gl_object for binding in attrib_bindings):
+                del self._vaos[key]
+                if vao is not gl_object:
+                    self._stale.append(vao)
+
+    def _destroy_stale(self):
+        stale, self._stale = self._stale, []
+        for vao in stale:
+            vao.destroy()
+
+    def destroy(self):
+        self._destroy_stale()
+        vaos, self._vaos = list(self._vaos.values()), {}
+        for vao in vaos:
+            vao.destroy()
+
+
+class PixelFormat(NamedTuple):
+    """How pixels of a texture or renderbuffer internal format are transferred to host memory."""
+    format: int
+    gl_type: int
+    channels: int
+    dtype: np.dtype
+
+    @property
+    def is_integer(self) -> bool:
+        """True for formats which are read by integer samplers, such as `usampler2D`."""
+        return self.format in (gl.GL_RED_INTEGER, gl.GL_RGBA_INTEGER)
+
+
+_PIXEL_FORMATS = {
+    gl.GL_R8: PixelFormat(gl.GL_RED, gl.GL_UNSIGNED_BYTE, 1, np.dtype(np.uint8)),
+    gl.GL_RG8: PixelFormat(gl.GL_RG, gl.GL_UNSIGNED_BYTE, 2, np.dtype(np.uint8)),
+    gl.GL_RGB8: PixelFormat(gl.GL_RGB, gl.GL_UNSIGNED_BYTE, 3, np.dtype(np.uint8)),
+    gl.GL_RGBA8: PixelFormat(gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, 4, np.dtype(np.uint8)),
+    gl.GL_R16F: PixelFormat(gl.GL_RED, gl.GL_FLOAT, 1, np.dtype(np.float32)),
+    gl.GL_RG16F: PixelFormat(gl.GL_RG, gl.GL_FLOAT, 2, np.dtype(np.float32)),
+    gl.GL_RGB16F: PixelFormat(gl.GL_RGB, gl.GL_FLOAT, 3, np.dtype(np.float32)),
+    gl.GL_RGBA16F: PixelFormat(gl.GL_RGBA, gl.GL_FLOAT, 4, np.dtype(np.float32)),
+    gl.GL_R32F: PixelFormat(gl.GL_RED, gl.GL_FLOAT, 1, np.dtype(np.float32)),
+    gl.GL_RG32F: PixelFormat(gl.GL_RG, gl.GL_FLOAT, 2, np.dtype(np.float32)),
+    gl.GL_RGB32F: PixelFormat(gl.GL_RGB, gl.GL_FLOAT, 3, np.dtype(np.float32)),
+    gl.GL_RGBA32F: PixelFormat(gl.GL_RGBA, gl.GL_FLOAT, 4, np.dtype(np.float32)),
+    gl.GL_R32UI: PixelFormat(gl.GL_RED_INTEGER, gl.GL_UNSIGNED_INT, 1, np.dtype(np.uint32)),
+    gl.GL_R32I: PixelFormat(gl.GL_RED_INTEGER, gl.GL_INT, 1, np.dtype(np.int32)),
+    gl.GL_RGBA8UI: PixelFormat(gl.GL_RGBA_INTEGER, gl.GL_UNSIGNED_BYTE, 4, np.dtype(np.uint8)),
+    gl.GL_RGBA32UI: PixelFormat(gl.GL_RGBA_INTEGER, gl.GL_UNSIGNED_INT, 4, np.dtype(np.uint32)),
+    gl.GL_DEPTH_COMPONENT24: PixelFormat(gl.GL_DEPTH_COMPONENT, gl.GL_FLOAT, 1,
+                                         np.dtype(np.float32)),
+    gl.GL_DEPTH_COMPONENT32F: PixelFormat(gl.GL_DEPTH_COMPONENT, gl.GL_FLOAT, 1,
+                                          np.dtype(np.float32)),
+    gl.GL_DEPTH24_STENCIL8: PixelFormat(gl.GL_DEPTH_STENCIL, gl.GL_UNSIGNED_INT_24_8, 1,
+                                        np.dtype(np.uint32)),
+}
+
+_CHANNEL_FORMATS = {1: gl.GL_RED, 2: gl.GL_RG, 3: gl.GL_RGB, 4: gl.GL_RGBA}
+
+
+def get_pixel_format(internal_format) -> PixelFormat:
+    if internal_format not in _PIXEL_FORMATS:
+        raise ValueError(f'Unsupported internal format: {internal_format}')
+    return _PIXEL_FORMATS[internal_format]
+
+
+# Internal formats for uploading arrays, keyed by data type and number of channels.
+_ARRAY_INTERNAL_FORMATS = {
+    (np.dtype(np.uint8), 1): gl.GL_R8,
+    (np.dtype(np.uint8), 2): gl.GL_RG8,
+    (np.dtype(np.uint8), 3): gl.GL_RGB8,
+    (np.dtype(np.uint8), 4): gl.GL_RGBA8,
+    (np.dtype(np.float32), 1): gl.GL_R32F,
+    (np.dtype(np.float32), 2): gl.GL_RG32F,
+    (np.dtype(np.float32), 3): gl.GL_RGB32F,
+    (np.dtype(np.float32), 4): gl.GL_RGBA32F,
+    (np.dtype(np.uint32), 1): gl.GL_R32UI,
+    (np.dtype(np.uint32), 4): gl.GL_RGBA32UI,
+}
+
+
+def get_array_internal_format(image: np.ndarray):
+    """Get the internal format for a texture which holds a (height, width, channels) array."""
+    key = (image.dtype, image.shape[-1])
+    if key not in _ARRAY_INTERNAL_FORMATS:
+        raise ValueError(f'Unsupported image data type and channels: {key}')
+    return _ARRAY_INTERNAL_FORMATS[key]
+
+
+class TextureFilter(enum.Enum):
+    NEAREST = gl.GL_NEAREST
+    LINEAR = gl.GL_LINEAR
+    NEAREST_MIPMAP_NEAREST = gl.GL_NEAREST_MIPMAP_NEAREST
+    LINEAR_MIPMAP_NEAREST = gl.GL_LINEAR_MIPMAP_NEAREST
+    NEAREST_MIPMAP_LINEAR = gl.GL_NEAREST_MIPMAP_LINEAR
+    LINEAR_MIPMAP_LINEAR = gl.GL_LINEAR_MIPMAP_LINEAR
+
+
+class TextureWrap(enum.Enum):
+    REPEAT = gl.GL_REPEAT
+    MIRRORED_REPEAT = gl.GL_MIRRORED_REPEAT
+    CLAMP_TO_EDGE = gl.GL_CLAMP_TO_EDGE
+    CLAMP_TO_BORDER = gl.GL_CLAMP_TO_BORDER
+
+
 class TextureObject(_BindableGLObject):
+    """A texture object.
+
+    Bind tracking is done separately for each texture unit, and operations such as `bind` and
+    `is_bound` refer to the window's active texture unit.
+    """
+
     @property
     @classmethod
     @abstractmethod
@@ -326,6 +791,34 @@ class TextureObject(_BindableGLObject):
     def __init__(self):
         super().__init__(gl.glGenTextures(1), shareable=True)
 
+    @classmethod
+    def get_bound(cls, unit: Optional[int] = None):
+        window = Window.get_active()
+        if unit is None:
+            unit = window.active_texture_unit
+        binding = window.get_indexed_bound(cls.kind, unit)
+        if binding is None:
+            return None
+        return binding[0]
+
+    def _set_bound(self):
+        window = Window.get_active()
+        window.set_indexed_bound(self.kind, window.active_texture_unit, (self,))
+
+    @classmethod
+    def unbind(cls):
+        cls._do_bind(0)
+        window = Window.get_active()
+        window.unset_indexed_bound(cls.kind, window.active_texture_unit)
+
+    def bind_to_unit(self, unit: int) -> bool:
+        """Make `unit` the active texture unit and bind this texture to it.
+
+        Returns False if the texture was already bound to that unit.
+        """
+        Window.get_active().set_active_texture_unit(unit)
+        return self.bind()
+
     @classmethod
     def _do_bind(cls, handle):
         gl.glBindTexture(cls._target, handle)
@@ -339,6 +832,365 @@ class Texture2D(TextureObject):
     kind = object()
     _target = gl.GL_TEXTURE_2D
 
+    def __init__(self):
+        super().__init__()
+        self.width = 0
+        self.height = 0
+        self.internal_format = None
+
+    @property
+    def pixel_format(self) -> PixelFormat:
+        return get_pixel_format(self.internal_format)
+
+    def set_parameter(self, pname, value):
+        assert self.is_bound()
+        if isinstance(value, float):
+            gl.glTexParameterf(self._target, pname, value)
+        else:
+            gl.glTexParameteri(self._target, pname, value)
+
+    def allocate(self, width: int, height: int, internal_format=gl.GL_RGBA8, levels: int = 1):
+        """Allocate uninitialised storage for `levels` mipmap levels."""
+        assert self.is_bound()
+        pixel_format = get_pixel_format(internal_format)
+        for level in range(levels):
+            gl.glTexImage2D(self._target, level, internal_format, max(width >> level, 1),
+                            max(height >> level, 1), 0, pixel_format.format,
+                            pixel_format.gl_type, None)
+        # Limit the mipmap levels so that the texture is complete.
+        self.set_parameter(gl.GL_TEXTURE_MAX_LEVEL, levels - 1)
+        self.width = width
+        self.height = height
+        self.internal_format = internal_format
+
+    def write(self, data: Optional[np.ndarray], x: int = 0, y: int = 0, level: int = 0,
+              size: Optional[Sequence[int]] = None, offset: int = 0):
+        """Write a (height, width, channels) array of pixels into the texture.
+
+        The first row of `data` is the bottom row of the written region. If `data` is None, the
+        pixels are read from the bound `PixelUnpackBuffer` at byte `offset`, and `size` gives the
+        (width, height, channels) of the region and the data type must match the pixel format.
+        """
+        assert self.is_bound()
+        if data is None:
+            width, height, channels = size
+            dtype = self.pixel_format.dtype
+            pixels = C.c_void_p(offset)
+        else:
+            data = np.ascontiguousarray(data)
+            if data.ndim == 2:
+                data = data[..., None]
+            height, width, channels = data.shape
+            dtype = data.dtype
+            pixels = data
+        if self.pixel_format.is_integer:
+            pixel_format = {1: gl.GL_RED_INTEGER, 2: gl.GL_RG_INTEGER, 3: gl.GL_RGB_INTEGER,
+                            4: gl.GL_RGBA_INTEGER}[channels]
+        else:
+            pixel_format = _CHANNEL_FORMATS[channels]
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage2D(self._target, level, x, y, width, height, pixel_format,
+                           np_to_gl_type(dtype), pixels)
+
+    def generate_mipmaps(self):
+        assert self.is_bound()
+        gl.glGenerateMipmap(self._target)
+
+
+class Sampler(_GLObject):
+    """A sampler object, which holds texture filtering and wrapping state separately from textures.
+
+    A sampler bound to a texture unit overrides the sampling parameters of textures bound to that
+    unit.
+    """
+    kind = object()
+
+    def __init__(
+        self,
+        min_filter: TextureFilter = TextureFilter.LINEAR,
+        mag_filter: TextureFilter = TextureFilter.LINEAR,
+        wrap: TextureWrap = TextureWrap.REPEAT,
+    ):
+        super().__init__(gl.glGenSamplers(1), shareable=True)
+        self.set_parameter(gl.GL_TEXTURE_MIN_FILTER, min_filter.value)
+        self.set_parameter(gl.GL_TEXTURE_MAG_FILTER, mag_filter.value)
+        for pname in [gl.GL_TEXTURE_WRAP_S, gl.GL_TEXTURE_WRAP_T, gl.GL_TEXTURE_WRAP_R]:
+            self.set_parameter(pname, wrap.value)
+
+    def set_parameter(self, pname, value):
+        if isinstance(value, float):
+            gl.glSamplerParameterf(self.handle, pname, value)
+        else:
+            gl.glSamplerParameteri(self.handle, pname, value)
+
+    @classmethod
+    def get_bound(cls, unit: int) -> Optional['Sampler']:
+        binding = Window.get_active().get_indexed_bound(cls.kind, unit)
+        if binding is None:
+            return None
+        return binding[0]
+
+    def bind(self, unit: int) -> bool:
+        """Bind this sampler to a texture unit. Returns False if it was already bound there."""
+        if self.get_bound(unit) is self:
+            return False
+        gl.glBindSampler(unit, self.handle)
+        Window.get_active().set_indexed_bound(self.kind, unit, (self,))
+        return True
+
+    @classmethod
+    def unbind(cls, unit: int):
+        gl.glBindSampler(unit, 0)
+        Window.get_active().unset_indexed_bound(cls.kind, unit)
+
+    def destroy(self):
+        super().destroy()
+        for window in self._window.object_context._windows:
+            window.forget_object(self)
+
+    def _do_destroy(self):
+        if gl.glDeleteSamplers is not None:
+            gl.glDeleteSamplers(1, [self.handle])
+
+
+def bind_texture_units(
+    textures: Union[Sequence[Optional[TextureObject]], Dict[int, Optional[TextureObject]]],
+    samplers: Union[Sequence[Optional[Sampler]], Dict[int, Optional[Sampler]], None] = None,
+) -> int:
+    """Bind textures (and optionally samplers) to texture units in one call.
+
+    `textures` maps texture units to textures, either as a sequence (where texture `i` is bound to
+    unit `i`) or as a dictionary. Units which already hold the right texture are skipped, as are
+    units mapped to None.
+
+    Returns:
+        The number of textures and samplers which were actually bound.
+    """
+    if not isinstance(textures, dict):
+        textures = dict(enumerate(textures))
+    n_binds = 0
+    for unit, texture in textures.items():
+        if texture is not None and texture.get_bound(unit) is not texture:
+            n_binds += texture.bind_to_unit(unit)
+    if samplers is not None:
+        if not isinstance(samplers, dict):
+            samplers = dict(enumerate(samplers))
+        for unit, sampler in samplers.items():
+            if sampler is not None:
+                n_binds += sampler.bind(unit)
+    return n_binds
+
+
+class Renderbuffer(_BindableGLObject):
+    kind = object()
+
+    def __init__(self, width: int = 0, height: int = 0, internal_format=gl.GL_DEPTH_COMPONENT24,
+                 samples: int = 0):
+        super().__init__(gl.glGenRenderbuffers(1), shareable=True)
+        self.width = 0
+        self.height = 0
+        self.internal_format = None
+        if width > 0 and height > 0:
+            with self.bound():
+                self.allocate(width, height, internal_format, samples)
+
+    @property
+    def pixel_format(self) -> PixelFormat:
+        return get_pixel_format(self.internal_format)
+
+    def allocate(self, width: int, height: int, internal_format=gl.GL_DEPTH_COMPONENT24,
+                 samples: int = 0):
+        assert self.is_bound()
+        if samples > 0:
+            gl.glRenderbufferStorageMultisample(gl.GL_RENDERBUFFER, samples, internal_format,
+                                                width, height)
+        else:
+            gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, internal_format, width, height)
+        self.width = width
+        self.height = height
+        self.internal_format = internal_format
+
+    @classmethod
+    def _do_bind(cls, handle):
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, handle)
+
+    def _do_destroy(self):
+        if gl.glDeleteRenderbuffers is not None:
+            gl.glDeleteRenderbuffers(1, [self.handle])
+
+
+class _Framebuffer(_BindableGLObject):
+    kind = object()
+
+    def __init__(self, handle):
+        super().__init__(handle, shareable=False)
+        self._attachments: Dict[int, Union[TextureObject, Renderbuffer]] = {}
+
+    @property
+    def attachments(self) -> Dict[int, Union[TextureObject, Renderbuffer]]:
+        return dict(self._attachments)
+
+    def read_pixels(self, x: int, y: int, width: int, height: int,
+                    attachment=gl.GL_COLOR_ATTACHMENT0, pixel_format: Optional[PixelFormat] = None,
+                    out: Optional[np.ndarray] = None, offset: Optional[int] = None):
+        """Read a region of pixels from an attachment.
+
+        If `offset` is given, the pixels are written into the bound `PixelPackBuffer` at that
+        byte offset without waiting for rendering to finish, and None is returned. Otherwise,
+        they are returned as a (height, width, channels) array whose first row is the bottom row
+        of the region.
+        """
+        assert self.is_bound()
+        if pixel_format is None:
+            pixel_format = self._get_pixel_format(attachment)
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        if attachment not in (gl.GL_DEPTH_ATTACHMENT, gl.GL_STENCIL_ATTACHMENT,
+                              gl.GL_DEPTH_STENCIL_ATTACHMENT):
+            gl.glReadBuffer(self._get_read_buffer(attachment))
+        if offset is not None:
+            assert PixelPackBuffer.get_bound() is not None
+            gl.glReadPixels(x, y, width, height, pixel_format.format, pixel_format.gl_type,
+                            C.c_void_p(offset))
+            return None
+        assert PixelPackBuffer.get_bound() is None
+        shape = (height, width, pixel_format.channels)
+        if out is None:
+            out = np.empty(shape, dtype=pixel_format.dtype)
+        assert out.shape == shape and out.dtype == pixel_format.dtype and out.flags.c_contiguous
+        gl.glReadPixels(x, y, width, height, pixel_format.format, pixel_format.gl_type, out)
+        return out
+
+    def _get_pixel_format(self, attachment) -> PixelFormat:
+        return self._attachments[attachment].pixel_format
+
+    def _get_read_buffer(self, attachment):
+        return attachment
+
+    @classmethod
+    def _do_bind(cls, handle):
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, handle)
+
+
+class DefaultFramebuffer(_Framebuffer):
+    """The window's own framebuffer.
+
+    Colour is read from the back buffer, which holds the frame most recently drawn and not yet
+    swapped, and is assumed to be 8 bits per channel.
+    """
+
+    def __init__(self):
+        super().__init__(0)
+
+    def _get_pixel_format(self, attachment) -> PixelFormat:
+        if attachment == gl.GL_DEPTH_ATTACHMENT:
+            return get_pixel_format(gl.GL_DEPTH_COMPONENT24)
+        return get_pixel_format(gl.GL_RGBA8)
+
+    def _get_read_buffer(self, attachment):
+        return gl.GL_BACK if attachment == gl.GL_COLOR_ATTACHMENT0 else attachment
+
+    def _do_destroy(self):
+        pass
+
+
+class Framebuffer(_Framebuffer):
+    """A framebuffer object for rendering into textures and renderbuffers."""
+
+    def __init__(self):
+        super().__init__(gl.glGenFramebuffers(1))
+
+    @classmethod
+    def get_default(cls):
+        return Window.get_default(cls.kind)
+
+    def attach_texture(self, attachment, texture: Texture2D, level: int = 0):
+        assert self.is_bound()
+        gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, attachment, texture._target, texture.handle,
+                                  level)
+        self._attachments[attachment] = texture
+
+    def attach_renderbuffer(self, attachment, renderbuffer: Renderbuffer):
+        assert self.is_bound()
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, attachment, gl.GL_RENDERBUFFER,
+                                     renderbuffer.handle)
+        self._attachments[attachment] = renderbuffer
+
+    def set_draw_buffers(self, attachments: Sequence[int]):
+        """Select which colour attachments fragment shader outputs 0, 1, ... are written to."""
+        assert self.is_bound()
+        gl.glDrawBuffers(len(attachments), list(attachments))
+
+    def check_status(self):
+        """Raise a RuntimeError if the framebuffer is not complete."""
+        assert self.is_bound()
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f'Framebuffer is incomplete (status 0x{int(status):x})')
+
+    def _do_destroy(self):
+        if gl.glDeleteFramebuffers is not None:
+            gl.glDeleteFramebuffers(1, [self.handle])
+
+
+class Query(_GLObject):
+    """An asynchronous query, such as the number of primitives written by transform feedback."""
+
+    def __init__(self, target=gl.GL_TRANSFORM_FEEDBACK_PRIMITIVES_WRITTEN):
+        super().__init__(int(gl.glGenQueries(1)[0]), shareable=False)
+        self.target = target
+
+    def begin(self):
+        gl.glBeginQuery(self.target, self.handle)
+
+    def end(self):
+        gl.glEndQuery(self.target)
+
+    @contextmanager
+    def active(self):
+        self.begin()
+        try:
+            yield self
+        finally:
+            self.end()
+
+    def is_result_available(self) -> bool:
+        return bool(gl.glGetQueryObjectuiv(self.handle, gl.GL_QUERY_RESULT_AVAILABLE))
+
+    def get_result(self) -> int:
+        """Get the result of the query, waiting for it to become available."""
+        return int(gl.glGetQueryObjectuiv(self.handle, gl.GL_QUERY_RESULT))
+
+    def _do_destroy(self):
+        if gl.glDeleteQueries is not None:
+            gl.glDeleteQueries(1, [self.handle])
+
+
+class Fence(_GLObject):
+    """A fence sync object, which is signalled once the GPU has finished all earlier commands."""
+
+    def __init__(self):
+        super().__init__(gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0), shareable=True)
+        # Make sure the fence reaches the GPU, so that polling it without flushing terminates.
+        gl.glFlush()
+
+    def is_signalled(self) -> bool:
+        status = gl.glClientWaitSync(self.handle, 0, 0)
+        return status in (gl.GL_ALREADY_SIGNALED, gl.GL_CONDITION_SATISFIED)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the fence is signalled or `timeout` seconds pass.
+
+        Returns:
+            True if the fence was signalled.
+        """
+        timeout_ns = gl.GL_TIMEOUT_IGNORED if timeout is None else int(timeout * 1e9)
+        status = gl.glClientWaitSync(self.handle, 0, timeout_ns)
+        return status in (gl.GL_ALREADY_SIGNALED, gl.GL_CONDITION_SATISFIED)
+
+    def _do_destroy(self):
+        if gl.glDeleteSync is not None:
+            gl.glDeleteSync(self.handle)
+
 
 class ShaderObject(_GLObject):
     @property
@@ -383,6 +1235,36 @@ class FragmentShader(ShaderObject):
     _shader_type = gl.GL_FRAGMENT_SHADER
 
 
+def _transposed_matrix_setter(gl_func):
+    # Matrices are passed in row-major order, so they must be transposed by OpenGL.
+    def setter(location, count, value):
+        gl_func(location, count, gl.GL_TRUE, value)
+    return setter
+
+
+def _make_uniform_setters():
+    setters = {}
+    for gl_name, suffix, dtype in [('FLOAT', 'f', np.float32), ('INT', 'i', np.int32),
+                                   ('UNSIGNED_INT', 'ui', np.uint32), ('BOOL', 'i', np.int32)]:
+        setters[getattr(gl, f'GL_{gl_name}')] = (getattr(gl, f'glUniform1{suffix}v'), dtype, 1)
+        for n in range(2, 5):
+            setters[getattr(gl, f'GL_{gl_name}_VEC{n}')] = (getattr(gl, f'glUniform{n}{suffix}v'),
+                                                            dtype, n)
+    for cols in range(2, 5):
+        for rows in range(2, 5):
+            suffix = f'{cols}' if rows == cols else f'{cols}x{rows}'
+            setter = _transposed_matrix_setter(getattr(gl, f'glUniformMatrix{suffix}fv'))
+            setters[getattr(gl, f'GL_FLOAT_MAT{suffix}')] = (setter, np.float32, rows * cols)
+    # Samplers are set to the index of a texture unit.
+    for name in dir(gl):
+        if name.startswith(('GL_SAMPLER_', 'GL_INT_SAMPLER_', 'GL_UNSIGNED_INT_SAMPLER_')):
+            setters[getattr(gl, name)] = (gl.glUniform1iv, np.int32, 1)
+    return setters
+
+
+_UNIFORM_SETTERS = _make_uniform_setters()
+
+
 class ShaderProgram(_BindableGLObject):
     kind = object()
 
@@ -391,9 +1273,17 @@ class ShaderProgram(_BindableGLObject):
         *,
         vertex_shader: Optional[Union[str, VertexShader]] = None,
         fragment_shader: Optional[Union[str, FragmentShader]] = None,
-        vertex_attribs: Dict[str, VertexAttrib] = None
+        vertex_attribs: Dict[str, VertexAttrib] = None,
+        uniform_block_bindings: Dict[str, int] = None,
+        feedback_varyings: Optional[Sequence[str]] = None,
+        interleaved_feedback: bool = True,
     ):
         super().__init__(gl.glCreateProgram(), shareable=True)
+        self._uniforms = None
+        self.feedback_varyings: List[str] = []
+        self.interleaved_feedback = True
+        if feedback_varyings is not None:
+            self.set_feedback_varyings(feedback_varyings, interleaved_feedback)
         if vertex_attribs is None:
             vertex_attribs = {}
         # TODO: It would be nice to have a way of detecting missing attribute names.
@@ -421,6 +1311,9 @@ class ShaderProgram(_BindableGLObject):
             vertex_shader.destroy()
         if destroy_fragment_shader:
             fragment_shader.destroy()
+        if uniform_block_bindings is not None:
+            for name, binding in uniform_block_bindings.items():
+                self.uniform_block_binding(name, binding)
 
     def gl_attach_shader(self, shader: ShaderObject):
         gl.glAttachShader(self.handle, shader.handle)
@@ -440,6 +1333,57 @@ class ShaderProgram(_BindableGLObject):
     def bind_attrib_location(self, vertex_attrib: VertexAttrib, name: str):
         gl.glBindAttribLocation(self.handle, vertex_attrib.index, name)
 
+    def set_feedback_varyings(self, varyings: Sequence[str], interleaved: bool = True):
+        """Choose the shader outputs which are captured by transform feedback.
+
+        This only takes effect when the program is next linked. Interleaved varyings are written
+        to a single buffer, whereas separate varyings are each written to their own buffer.
+        """
+        mode = gl.GL_INTERLEAVED_ATTRIBS if interleaved else gl.GL_SEPARATE_ATTRIBS
+        names = (C.c_char_p * len(varyings))(*[varying.encode() for varying in varyings])
+        gl.glTransformFeedbackVaryings(self.handle, len(varyings),
+                                       C.cast(names, C.POINTER(C.POINTER(C.c_char))), mode)
+        self.feedback_varyings = list(varyings)
+        self.interleaved_feedback = interleaved
+
+    def get_feedback_dtypes(self) -> List[np.dtype]:
+        """Get the record type of each transform feedback buffer as a structured data type.
+
+        Vectors are captured as arrays of components, matrices as arrays of columns, and arrays
+        of size N as an extra leading dimension of size N.
+        """
+        fields = []
+        name_buffer = (C.c_char * 256)()
+        length = C.c_int()
+        size = C.c_int()
+        gl_type = C.c_uint()
+        for index in range(self.gl_get_program_iv(gl.GL_TRANSFORM_FEEDBACK_VARYINGS)):
+            gl.glGetTransformFeedbackVarying(self.handle, index, len(name_buffer), length, size,
+                                             gl_type, name_buffer)
+            dtype, rows, cols = _GL_TYPES[gl_type.value]
+            shape = (cols, rows) if cols > 1 else (rows,) if rows > 1 else ()
+            if size.value > 1:
+                shape = (size.value,) + shape
+            name = name_buffer.value.decode()
+            fields.append((name[:-len('[0]')] if name.endswith('[0]') else name, dtype, shape))
+        if self.interleaved_feedback:
+            return [np.dtype(fields)]
+        return [np.dtype([field]) for field in fields]
+
+    def get_uniform_block_index(self, name: str) -> int:
+        index = gl.glGetUniformBlockIndex(self.handle, name)
+        if index == gl.GL_INVALID_INDEX:
+            raise ValueError(f'No active uniform block named {name!r}')
+        return index
+
+    def uniform_block_binding(self, name: str, binding: int):
+        """Connect a uniform block to an indexed uniform buffer binding point."""
+        gl.glUniformBlockBinding(self.handle, self.get_uniform_block_index(name), binding)
+
+    def get_uniform_block_layout(self, name: str) -> Std140Layout:
+        """Query the memory layout of a uniform block."""
+        return Std140Layout.from_program(self, name)
+
     def link(self, shaders, check_errors=True):
         # Attach the shaders to this program.
         for shader in shaders:
@@ -454,6 +1398,41 @@ class ShaderProgram(_BindableGLObject):
         # Detach shaders so that it's possible to free shader source and unlinked object code.
         for shader in shaders:
             self.gl_detach_shader(shader)
+        self._uniforms = None
+
+    def _get_uniforms(self):
+        """Get the location, type, and array size of each active uniform, keyed by name."""
+        if self._uniforms is None:
+            self._uniforms = {}
+            for index in range(self.gl_get_program_iv(gl.GL_ACTIVE_UNIFORMS)):
+                name, size, gl_type = gl.glGetActiveUniform(self.handle, index)
+                name = name.decode() if isinstance(name, bytes) else name
+                location = gl.glGetUniformLocation(self.handle, name)
+                if location < 0:
+                    # Uniforms in uniform blocks do not have locations.
+                    continue
+                self._uniforms[name] = (location, int(gl_type), size)
+                if name.endswith('[0]'):
+                    self._uniforms[name[:-len('[0]')]] = (location, int(gl_type), size)
+        return self._uniforms
+
+    def has_uniform(self, name: str) -> bool:
+        return name in self._get_uniforms()
+
+    def set_uniform(self, name: str, value):
+        """Set the value of an active uniform variable.
+
+        The program must be bound. Matrices are expected in row-major order, as produced by
+        `glip.math.mat4`, and sampler uniforms are set to texture unit indices.
+        """
+        assert self.is_bound()
+        uniforms = self._get_uniforms()
+        if name not in uniforms:
+            raise ValueError(f'No active uniform named {name!r}')
+        location, gl_type, _ = uniforms[name]
+        setter, dtype, n_components = _UNIFORM_SETTERS[gl_type]
+        value = np.ascontiguousarray(value, dtype=dtype)
+        setter(location, value.size // n_components, value)
 
     def use(self):
         self.bind()
@@ -476,3 +1455,4 @@ sys.excepthook = excepthook
 
 
 Window.set_bound_default_class(VAO.kind, DefaultVAO)
+Window.set_bound_default_class(Framebuffer.kind, DefaultFramebuffer)
@@ -0,0 +1,223 @@
+"""Compact vertex attribute formats.
+
+Floating point attributes are quantised into smaller formats which the GPU converts back to
+floating point when they are read. Data which does not naturally lie in [-1, 1] or [0, 1] (such as
+positions) is remapped with a per-mesh, per-component scale and offset, so the shader must
+reconstruct the original values with `value = attrib * scale + offset`.
+
+The GPU converts a signed normalised b bit integer c to floating point with a rule which depends
+on the context's OpenGL version:
+
+    OpenGL 4.2 and later: f = max(c / (2^(b-1) - 1), -1)
+    Older versions:       f = (2c + 1) / (2^b - 1)
+
+Signed values are packed for the rule of `gl_version`, which defaults to the version of the
+contexts created by `Window`. The rule before 4.2 cannot represent 0.0, and values read back with
+an error of up to 1 / (2^b - 1), which is half of a step. The 4.2 rule has an error of up to
+0.5 / (2^(b-1) - 1), which is also about half of a step.
+"""
+
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from glip.gl.context import CONTEXT_VERSION
+from glip.gl.objects import VertexAttrib
+
+
+class PackedArray(NamedTuple):
+    """Vertex data in a compact format, along with how to read it back."""
+    data: np.ndarray
+    # Number of components per vertex.
+    size: int
+    normalised: bool
+    packed: bool
+    # Per-component scale and offset for reconstructing the original values.
+    scale: np.ndarray
+    offset: np.ndarray
+    # The OpenGL version whose rule converts signed normalised values to floating point.
+    gl_version: Tuple[int, int] = CONTEXT_VERSION
+
+    @property
+    def stride(self) -> int:
+        """Size of the data for a single vertex in bytes."""
+        return self.data[:1].nbytes
+
+    def vertex_attrib(self, index: int) -> VertexAttrib:
+        return VertexAttrib(index, self.size, self.data.dtype, normalised=self.normalised,
+                            packed=self.packed)
+
+    def unpack(self) -> np.ndarray:
+        """Reconstruct the values which were packed, as float32."""
+        if self.packed:
+            values = unpack_int_2_10_10_10(self.data, self.normalised, self.gl_version)
+        elif self.normalised:
+            values = _normalised_to_float(self.data, self.gl_version)
+        else:
+            values = self.data.astype(np.float32)
+        return values * self.scale + self.offset
+
+
+def _max_normalised_value(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.kind not in 'iu':
+        raise TypeError(f'Normalised data must have an integer type, not {dtype}')
+    return np.iinfo(dtype).max
+
+
+def _snorm_to_float(components, bits, gl_version):
+    """Convert signed normalised integers with `bits` bits to float32, as the GPU would."""
+    components = np.asarray(components, dtype=np.float64)
+    if tuple(gl_version) >= (4, 2):
+        values = np.maximum(components / ((1 << (bits - 1)) - 1), -1)
+    else:
+        values = (2 * components + 1) / ((1 << bits) - 1)
+    return values.astype(np.float32)
+
+
+def _float_to_snorm(values, bits, gl_version):
+    """Convert values in [-1, 1] to the nearest signed normalised integers with `bits` bits."""
+    values = np.asarray(values, dtype=np.float64)
+    max_value = (1 << (bits - 1)) - 1
+    if tuple(gl_version) >= (4, 2):
+        components = np.clip(np.rint(values * max_value), -max_value, max_value)
+    else:
+        components = np.clip(np.rint((values * ((1 << bits) - 1) - 1) / 2), -max_value - 1,
+                             max_value)
+    return components.astype(np.int64)
+
+
+def _normalised_to_float(data, gl_version=CONTEXT_VERSION):
+    max_value = _max_normalised_value(data.dtype)
+    if data.dtype.kind == 'i':
+        return _snorm_to_float(data, data.dtype.itemsize * 8, gl_version)
+    return data.astype(np.float32) / max_value
+
+
+def _float_to_normalised(values, dtype, gl_version=CONTEXT_VERSION):
+    """Convert values in [-1, 1] (signed types) or [0, 1] (unsigned types) to integers."""
+    dtype = np.dtype(dtype)
+    max_value = _max_normalised_value(dtype)
+    if dtype.kind == 'i':
+        return _float_to_snorm(values, dtype.itemsize * 8, gl_version).astype(dtype)
+    return np.clip(np.rint(values * max_value), 0, max_value).astype(dtype)
+
+
+def _identity_transform(size):
+    return np.ones(size, dtype=np.float32), np.zeros(size, dtype=np.float32)
+
+
+def quantise(values: np.ndarray, dtype=np.int16, scale: Optional[np.ndarray] = None,
+             offset: Optional[np.ndarray] = None,
+             gl_version: Tuple[int, int] = CONTEXT_VERSION) -> PackedArray:
+    """Quantise float values of shape (N, size) into normalised integers.
+
+    If `scale` and `offset` are not given, they are chosen from the bounding box of `values` so
+    that the full range of `dtype` is used. Signed types are encoded for the conversion rule of
+    `gl_version` (see the module docstring), and read back with an error of up to half a step
+    before scaling.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    signed = np.dtype(dtype).kind == 'i'
+    if scale is None or offset is None:
+        lower = values.min(axis=0)
+        upper = values.max(axis=0)
+        if signed:
+            offset = (lower + upper) / 2
+            scale = (upper - lower) / 2
+        else:
+            offset = lower
+            scale = upper - lower
+        # Avoid dividing by zero for components which are constant.
+        scale = np.where(scale > 0, scale, 1)
+    scale = np.asarray(scale, dtype=np.float32)
+    offset = np.asarray(offset, dtype=np.float32)
+    data = _float_to_normalised((values - offset) / scale, dtype, gl_version)
+    return PackedArray(data, values.shape[-1], True, False, scale, offset, gl_version)
+
+
+def pack_half(values: np.ndarray) -> PackedArray:
+    """Convert values to half precision floats."""
+    values = np.asarray(values)
+    return PackedArray(values.astype(np.float16), values.shape[-1], False, False,
+                       *_identity_transform(values.shape[-1]))
+
+
+def pack_int_2_10_10_10(values: np.ndarray, normalised: bool = True,
+                        gl_version: Tuple[int, int] = CONTEXT_VERSION) -> np.ndarray:
+    """Pack (N, 3) or (N, 4) values into int32 elements with the GL_INT_2_10_10_10_REV layout.
+
+    x, y and z occupy 10 bits each and w occupies the top 2 bits. If `normalised` is True, the
+    values must lie in [-1, 1] and are encoded for the conversion rule of `gl_version` (see the
+    module docstring). They read back with an error of up to 1/1023 for x, y and z, and up to 1/3
+    for w; before OpenGL 4.2, 0.0 reads back as +-1/1023 (or +-1/3 for w). Otherwise they are
+    rounded to integers in [-512, 511] (or [-2, 1] for w). A missing w component is packed as
+    zero.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if values.shape[-1] == 3:
+        values = np.concatenate([values, np.zeros(values.shape[:-1] + (1,), np.float32)], axis=-1)
+    bits = np.asarray([10, 10, 10, 2], dtype=np.int64)
+    if normalised:
+        components = _float_to_snorm(values, bits, gl_version)
+    else:
+        components = np.rint(values).astype(np.int64)
+        components = np.clip(components, -(1 << (bits - 1)), (1 << (bits - 1)) - 1)
+    masks = np.asarray([0x3ff, 0x3ff, 0x3ff, 0x3], dtype=np.int64)
+    shifts = np.asarray([0, 10, 20, 30], dtype=np.int64)
+    packed = ((components & masks) << shifts).sum(axis=-1)
+    return packed.astype(np.uint32).view(np.int32)
+
+
+def unpack_int_2_10_10_10(data: np.ndarray, normalised: bool = True,
+                          gl_version: Tuple[int, int] = CONTEXT_VERSION) -> np.ndarray:
+    """Unpack int32 elements with the GL_INT_2_10_10_10_REV layout into (N, 4) float32 values.
+
+    Normalised values are converted with the rule of `gl_version`, as the GPU would.
+    """
+    data = np.asarray(data).astype(np.uint32).astype(np.int64)
+    shifts = np.asarray([0, 10, 20, 30], dtype=np.int64)
+    bits = np.asarray([10, 10, 10, 2], dtype=np.int64)
+    components = (data[..., None] >> shifts) & ((1 << bits) - 1)
+    # Sign extend.
+    components = np.where(components >= 1 << (bits - 1), components - (1 << bits), components)
+    if normalised:
+        return _snorm_to_float(components, bits, gl_version)
+    return components.astype(np.float32)
+
+
+def pack_positions(positions: np.ndarray, dtype=np.int16) -> PackedArray:
+    """Quantise positions relative to their bounding box."""
+    return quantise(positions, dtype)
+
+
+def pack_normals(normals: np.ndarray,
+                 gl_version: Tuple[int, int] = CONTEXT_VERSION) -> PackedArray:
+    """Pack unit vectors into 4 bytes each using the GL_INT_2_10_10_10_REV format.
+
+    Components are encoded for the conversion rule of `gl_version` and read back with an error of
+    up to 1/1023, so shaders should normalise the result. The attribute must have 4 components,
+    but shaders should only use the normal's xyz: the stored w is zero, which reads back as 1/3
+    before OpenGL 4.2.
+    """
+    normals = np.asarray(normals, dtype=np.float32)
+    return PackedArray(pack_int_2_10_10_10(normals, gl_version=gl_version), 4, True, True,
+                       *_identity_transform(4), gl_version)
+
+
+def pack_uvs(uvs: np.ndarray, dtype=np.uint16) -> PackedArray:
+    """Quantise texture coordinates.
+
+    Coordinates in [0, 1] are stored directly, while coordinates outside of that range (e.g.
+    for repeating textures) are remapped using their bounding box.
+    """
+    uvs = np.asarray(uvs, dtype=np.float32)
+    if uvs.min() >= 0 and uvs.max() <= 1:
+        return quantise(uvs, dtype, *_identity_transform(uvs.shape[-1]))
+    return quantise(uvs, dtype)
+
+
+def pack_colours(colours: np.ndarray, dtype=np.uint8) -> PackedArray:
+    """Quantise colours with components in [0, 1]."""
+    colours = np.asarray(colours, dtype=np.float32)
+    return quantise(colours, dtype, *_identity_transform(colours.shape[-1]))
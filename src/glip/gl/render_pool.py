@@ -0,0 +1,352 @@
+import collections
+import multiprocessing
+import multiprocessing.connection
+import queue
+import traceback
+from multiprocessing import shared_memory
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from glip.gl.context import Window
+
+# Signature of the function which renders a job inside a worker process. It is called as
+# `render(state, scene, view_projections, colour_out, depth_out)`, where `state` was returned by
+# the worker initialiser, and must fill `colour_out` (and `depth_out`, if depth is enabled).
+RenderFunction = Callable[[Any, Any, np.ndarray, np.ndarray, Optional[np.ndarray]], None]
+
+
+class _SlotLayout:
+    """The layout of the images for one job within a shared memory slot."""
+
+    def __init__(self, max_views, width, height, channels, dtype, depth):
+        self.colour_shape = (max_views, height, width, channels)
+        self.dtype = np.dtype(dtype)
+        self.depth_shape = (max_views, height, width, 1) if depth else None
+        self.colour_bytes = int(np.prod(self.colour_shape)) * self.dtype.itemsize
+        depth_bytes = int(np.prod(self.depth_shape)) * 4 if depth else 0
+        self.size = self.colour_bytes + depth_bytes
+
+    def views(self, buffer, n_views) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        colour = np.ndarray(self.colour_shape, dtype=self.dtype, buffer=buffer)[:n_views]
+        depth = None
+        if self.depth_shape is not None:
+            depth = np.ndarray(self.depth_shape, dtype=np.float32, buffer=buffer,
+                               offset=self.colour_bytes)[:n_views]
+        return colour, depth
+
+
+def _worker_main(init, render, window_size, layout, tasks, results):
+    window = Window(*window_size, hidden=True)
+    slots = {}
+    try:
+        state = init() if init is not None else None
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            job_id, slot_name, scene, view_projections = task
+            if slot_name not in slots:
+                slots[slot_name] = shared_memory.SharedMemory(slot_name)
+            colour, depth = layout.views(slots[slot_name].buf, len(view_projections))
+            try:
+                render(state, scene, view_projections, colour, depth)
+                # Drop references to the slot so that it can be closed.
+                del colour, depth
+                results.send((job_id, None))
+            except Exception:
+                results.send((job_id, traceback.format_exc()))
+    finally:
+        for slot in slots.values():
+            slot.close()
+        window.destroy()
+
+
+class RenderResult:
+    """The images rendered for a job.
+
+    `colour` and `depth` are views into shared memory, which is reused once the result is
+    released. Call `release` (or use the result as a context manager) when finished with them.
+    """
+
+    def __init__(self, job_id: int, colour: Optional[np.ndarray], depth: Optional[np.ndarray],
+                 error: Optional[str], release: Callable[[], None]):
+        self.job_id = job_id
+        self.colour = colour
+        self.depth = depth
+        self.error = error
+        self._release = release
+
+    def release(self):
+        if self._release is not None:
+            self.colour = self.depth = None
+            self._release()
+            self._release = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class _Job:
+    def __init__(self, job_id, scene, view_projections):
+        self.job_id = job_id
+        self.scene = scene
+        self.view_projections = view_projections
+        self.slot: Optional[int] = None
+        self.attempts = 0
+
+
+class _Worker:
+    def __init__(self, process, tasks, results):
+        self.process = process
+        self.tasks = tasks
+        self.results = results
+        self.job: Optional[_Job] = None
+
+
+class RenderPool:
+    """A pool of worker processes which each render with their own hidden window.
+
+    Each worker calls `init` once when it starts (e.g. to load shaders and meshes), then renders
+    jobs with `render`. A job is a scene reference (any picklable value which the render function
+    understands) and an array of view-projection matrices. Images are written straight into
+    shared memory slots, so pixel data is never pickled.
+
+    Workers which die while rendering are restarted and their job is retried, up to
+    `max_attempts` times in total. `init` and `render` must be picklable, which usually means
+    defining them at the top level of a module.
+    """
+
+    def __init__(self, render: RenderFunction, width: int, height: int,
+                 init: Optional[Callable[[], Any]] = None, n_workers: Optional[int] = None,
+                 max_views: int = 16, channels: int = 4, dtype=np.uint8, depth: bool = False,
+                 n_slots: Optional[int] = None, max_attempts: int = 3):
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+        self.width = width
+        self.height = height
+        self.max_views = max_views
+        self.max_attempts = max_attempts
+        self._render = render
+        self._init = init
+        self._layout = _SlotLayout(max_views, width, height, channels, dtype, depth)
+        # Forking a process with GL state is unsafe, so workers are always spawned.
+        self._mp = multiprocessing.get_context('spawn')
+        n_slots = n_slots if n_slots is not None else 2 * n_workers
+        self._slots = [shared_memory.SharedMemory(create=True, size=self._layout.size)
+                       for _ in range(n_slots)]
+        self._free_slots: List[int] = list(range(n_slots))
+        self._pending: Deque[_Job] = collections.deque()
+        self._jobs: Dict[int, _Job] = {}
+        self._completed: Deque[RenderResult] = collections.deque()
+        # Jobs which are being rendered but whose results are no longer wanted.
+        self._discarded: Set[int] = set()
+        self._next_job_id = 0
+        self._workers = [self._start_worker() for _ in range(n_workers)]
+        self.n_restarts = 0
+
+    def _start_worker(self) -> _Worker:
+        tasks = self._mp.Queue()
+        # Each worker has its own result pipe. A shared queue would be guarded by a lock, which
+        # is never released if a worker dies while holding it.
+        results, worker_results = self._mp.Pipe(duplex=False)
+        process = self._mp.Process(
+            target=_worker_main,
+            args=(self._init, self._render, (self.width, self.height), self._layout, tasks,
+                  worker_results),
+            daemon=True,
+        )
+        process.start()
+        # Close this process's copy of the writing end, so that reading fails once the worker
+        # has exited.
+        worker_results.close()
+        return _Worker(process, tasks, results)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        """The number of jobs which have been submitted but not yet returned."""
+        return len(self._jobs) - len(self._discarded)
+
+    def submit(self, scene, view_projections: np.ndarray) -> int:
+        """Queue a job and return its ID."""
+        view_projections = np.asarray(view_projections)
+        if len(view_projections) > self.max_views:
+            raise ValueError(f'Jobs can have at most {self.max_views} views')
+        job = _Job(self._next_job_id, scene, view_projections)
+        self._next_job_id += 1
+        self._jobs[job.job_id] = job
+        self._pending.append(job)
+        self._dispatch()
+        return job.job_id
+
+    def _dispatch(self):
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if self._pending[0].slot is None and not self._free_slots:
+                return
+            if worker.job is None:
+                job = self._pending.popleft()
+                if job.slot is None:
+                    job.slot = self._free_slots.pop()
+                job.attempts += 1
+                worker.job = job
+                worker.tasks.put((job.job_id, self._slots[job.slot].name, job.scene,
+                                  job.view_projections))
+
+    def _release_slot(self, slot):
+        self._free_slots.append(slot)
+        self._dispatch()
+
+    def _finish_job(self, job: _Job, error: Optional[str]):
+        del self._jobs[job.job_id]
+        if job.job_id in self._discarded:
+            self._discarded.remove(job.job_id)
+            self._release_slot(job.slot)
+            return
+        if error is not None:
+            self._release_slot(job.slot)
+            self._completed.append(RenderResult(job.job_id, None, None, error, None))
+            return
+        colour, depth = self._layout.views(self._slots[job.slot].buf, len(job.view_projections))
+        self._completed.append(RenderResult(job.job_id, colour, depth, None,
+                                            lambda: self._release_slot(job.slot)))
+
+    def _discard_jobs(self, job_ids):
+        """Drop jobs whose results are no longer wanted, freeing their slots as soon as possible."""
+        job_ids = set(job_ids)
+        for result in [result for result in self._completed if result.job_id in job_ids]:
+            self._completed.remove(result)
+            result.release()
+        for job in [job for job in self._pending if job.job_id in job_ids]:
+            self._pending.remove(job)
+            del self._jobs[job.job_id]
+            if job.slot is not None:
+                self._release_slot(job.slot)
+        # Jobs which are being rendered are dropped when they finish.
+        self._discarded.update(job_id for job_id in job_ids if job_id in self._jobs)
+
+    def _check_workers(self):
+        """Restart dead workers, returning their jobs to the queue."""
+        for worker_id, worker in enumerate(self._workers):
+            if worker.process.is_alive():
+                continue
+            job = worker.job
+            worker.results.close()
+            self._workers[worker_id] = self._start_worker()
+            self.n_restarts += 1
+            if job is None:
+                continue
+            if job.attempts >= self.max_attempts:
+                error = (f'Worker exited with code {worker.process.exitcode} while rendering '
+                         f'job {job.job_id} ({job.attempts} attempts)')
+                self._finish_job(job, error)
+            else:
+                self._pending.appendleft(job)
+        self._dispatch()
+
+    def get_result(self, timeout: Optional[float] = None, poll_interval: float = 0.1
+                   ) -> RenderResult:
+        """Wait for the next job to finish, in any order.
+
+        Raises:
+            queue.Empty: If no result is available within `timeout` seconds.
+            ValueError: If there are no jobs which have not been returned.
+        """
+        waited = 0.0
+        while not self._completed:
+            if len(self._jobs) == len(self._discarded):
+                raise ValueError('No jobs have been submitted')
+            connections = [worker.results for worker in self._workers]
+            ready = multiprocessing.connection.wait(connections, timeout=poll_interval)
+            if not ready:
+                self._check_workers()
+                waited += poll_interval
+                if timeout is not None and waited >= timeout:
+                    raise queue.Empty
+                continue
+            for worker in list(self._workers):
+                if worker.results not in ready:
+                    continue
+                try:
+                    job_id, error = worker.results.recv()
+                except EOFError:
+                    # The worker has exited.
+                    self._check_workers()
+                    continue
+                if worker.job is not None and worker.job.job_id == job_id:
+                    worker.job = None
+                    self._finish_job(self._jobs[job_id], error)
+            self._dispatch()
+        return self._completed.popleft()
+
+    def render(self, scene, view_projections: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Render many views of a scene across the pool and gather the images.
+
+        Returns:
+            `(colour, depth)` arrays of shape (N, height, width, C), where depth is None unless
+            it was enabled.
+        """
+        view_projections = np.asarray(view_projections)
+        n_views = len(view_projections)
+        colour = np.empty((n_views,) + self._layout.colour_shape[1:], dtype=self._layout.dtype)
+        depth = None
+        if self._layout.depth_shape is not None:
+            depth = np.empty((n_views,) + self._layout.depth_shape[1:], dtype=np.float32)
+        starts = {}
+        for start in range(0, n_views, self.max_views):
+            job_id = self.submit(scene, view_projections[start:start + self.max_views])
+            starts[job_id] = start
+        # Results for jobs which were submitted separately are put back afterwards.
+        other_results = []
+        try:
+            while starts:
+                result = self.get_result()
+                start = starts.pop(result.job_id, None)
+                if start is None:
+                    other_results.append(result)
+                    continue
+                with result:
+                    if result.error is not None:
+                        raise RuntimeError(f'Rendering failed:\n{result.error}')
+                    colour[start:start + len(result.colour)] = result.colour
+                    if depth is not None:
+                        depth[start:start + len(result.depth)] = result.depth
+        except BaseException:
+            # Don't leave the remaining jobs' results holding slots.
+            self._discard_jobs(starts)
+            raise
+        finally:
+            self._completed.extendleft(reversed(other_results))
+        return colour, depth
+
+    def close(self):
+        """Stop the workers and free shared memory."""
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.tasks.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.results.close()
+        self._workers = []
+        self._completed.clear()
+        self._discarded.clear()
+        for slot in self._slots:
+            try:
+                slot.close()
+            except BufferError:
+                # Unreleased results still refer to the slot, which stays mapped until they are
+                # garbage collected.
+                pass
+            slot.unlink()
+        self._slots = []
@@ -0,0 +1,167 @@
+from typing import Dict, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from glip.gl.objects import PrimitiveType, ShaderProgram, TextureObject, VAO, bind_texture_units
+
+
+class DrawItem(NamedTuple):
+    program: ShaderProgram
+    vao: VAO
+    mode: PrimitiveType
+    textures: Sequence[TextureObject]
+    uniforms: Optional[Dict[str, object]]
+    first: int
+    count: Optional[int]
+    depth: float
+    pass_index: int
+
+
+class RenderQueueStats(NamedTuple):
+    draws: int
+    program_switches: int
+    vao_switches: int
+    texture_switches: int
+    # Number of state switches which would have been made if items were drawn in submission order.
+    unsorted_switches: int
+
+    @property
+    def switches(self):
+        return self.program_switches + self.vao_switches + self.texture_switches
+
+    @property
+    def switches_saved(self):
+        return self.unsorted_switches - self.switches
+
+
+# Bit widths of the fields of a sort key, from most significant to least significant.
+_PASS_BITS = 8
+_PROGRAM_BITS = 12
+_TEXTURE_BITS = 16
+_VAO_BITS = 12
+_DEPTH_BITS = 16
+
+
+def _count_changes(ids):
+    """Count how many binds are needed to use the objects with the given IDs in sequence.
+
+    Negative IDs mean that nothing needs to be bound, so the previously bound object is kept.
+    """
+    if len(ids) == 0:
+        return 0
+    positions = np.where(ids >= 0, np.arange(len(ids)), 0)
+    filled = ids[np.maximum.accumulate(positions)]
+    return int(np.count_nonzero(filled[1:] != filled[:-1])) + int(filled[0] >= 0)
+
+
+class RenderQueue:
+    """Collects draw calls and executes them in an order which minimises state changes.
+
+    Items are sorted by a packed integer key made up of (pass, program, textures, VAO, depth), so
+    draws sharing a shader program are grouped together, and within each group draws sharing
+    textures and VAOs are grouped together. Depth sorts front-to-back within each group; negate
+    depths for back-to-front drawing.
+    """
+
+    def __init__(self):
+        self._items = []
+        self.last_stats: Optional[RenderQueueStats] = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def submit(
+        self,
+        program: ShaderProgram,
+        vao: VAO,
+        mode: PrimitiveType = PrimitiveType.TRIANGLES,
+        *,
+        textures: Sequence[TextureObject] = (),
+        uniforms: Optional[Dict[str, object]] = None,
+        first: int = 0,
+        count: Optional[int] = None,
+        depth: float = 0.0,
+        pass_index: int = 0,
+    ):
+        """Add a draw call to the queue.
+
+        If `vao` has an EBO, `first` and `count` select a range of indices. Otherwise they select
+        a range of vertices, and `count` must be given. Texture `i` is bound to texture unit `i`.
+        """
+        assert 0 <= pass_index < 2 ** _PASS_BITS
+        if vao.ebo is None and count is None:
+            raise ValueError('count must be specified for a VAO without an EBO')
+        self._items.append(DrawItem(program, vao, mode, tuple(textures), uniforms, first, count,
+                                    depth, pass_index))
+
+    def clear(self):
+        self._items = []
+
+    def _compute_ids(self):
+        """Assign small integer IDs to the state objects used by each item."""
+        program_ids, vao_ids, texture_set_ids = {}, {}, {}
+        n = len(self._items)
+        n_units = max((len(item.textures) for item in self._items), default=0)
+        ids = np.empty((n, 3), dtype=np.int64)
+        unit_ids = np.full((n, n_units), -1, dtype=np.int64)
+        texture_ids = {}
+        for i, item in enumerate(self._items):
+            ids[i, 0] = program_ids.setdefault(item.program, len(program_ids))
+            ids[i, 1] = vao_ids.setdefault(item.vao, len(vao_ids))
+            ids[i, 2] = texture_set_ids.setdefault(item.textures, len(texture_set_ids))
+            for unit, texture in enumerate(item.textures):
+                unit_ids[i, unit] = texture_ids.setdefault(texture, len(texture_ids))
+        if (len(program_ids) >= 2 ** _PROGRAM_BITS or len(vao_ids) >= 2 ** _VAO_BITS
+                or len(texture_set_ids) >= 2 ** _TEXTURE_BITS):
+            raise RuntimeError('Too many distinct objects in render queue')
+        return ids, unit_ids
+
+    def _sort_keys(self, ids):
+        depths = np.asarray([item.depth for item in self._items], dtype=np.float64)
+        depth_range = depths.max() - depths.min()
+        if depth_range > 0:
+            depths = (depths - depths.min()) / depth_range
+        else:
+            depths = np.zeros_like(depths)
+        quantised_depths = (depths * (2 ** _DEPTH_BITS - 1)).astype(np.uint64)
+        passes = np.asarray([item.pass_index for item in self._items], dtype=np.uint64)
+        keys = passes
+        keys = (keys << np.uint64(_PROGRAM_BITS)) | ids[:, 0].astype(np.uint64)
+        keys = (keys << np.uint64(_TEXTURE_BITS)) | ids[:, 2].astype(np.uint64)
+        keys = (keys << np.uint64(_VAO_BITS)) | ids[:, 1].astype(np.uint64)
+        keys = (keys << np.uint64(_DEPTH_BITS)) | quantised_depths
+        return keys
+
+    @staticmethod
+    def _count_switches(ids, unit_ids):
+        return (_count_changes(ids[:, 0]), _count_changes(ids[:, 1]),
+                sum(_count_changes(unit_ids[:, unit]) for unit in range(unit_ids.shape[1])))
+
+    def flush(self) -> RenderQueueStats:
+        """Execute all queued draw calls and clear the queue."""
+        n = len(self._items)
+        if n == 0:
+            self.last_stats = RenderQueueStats(0, 0, 0, 0, 0)
+            return self.last_stats
+        ids, unit_ids = self._compute_ids()
+        order = np.argsort(self._sort_keys(ids), kind='stable')
+        unsorted_switches = sum(self._count_switches(ids, unit_ids))
+
+        program_switches = vao_switches = texture_switches = 0
+        for i in order.tolist():
+            item = self._items[i]
+            program_switches += item.program.bind()
+            vao_switches += item.vao.bind()
+            texture_switches += bind_texture_units(item.textures)
+            if item.uniforms is not None:
+                for name, value in item.uniforms.items():
+                    item.program.set_uniform(name, value)
+            if item.vao.ebo is not None:
+                item.vao.draw_elements(item.mode, item.count, item.first)
+            else:
+                item.vao.draw_arrays(item.mode, item.first, item.count)
+
+        self.clear()
+        self.last_stats = RenderQueueStats(n, program_switches, vao_switches, texture_switches,
+                                           unsorted_switches)
+        return self.last_stats
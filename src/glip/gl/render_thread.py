@@ -0,0 +1,224 @@
+"""A thread which owns a window's GL context and runs commands submitted from other threads.
+
+OpenGL calls can only be made on the thread where a context is current. `RenderThread` creates
+a window on its own thread, and other threads submit commands (functions which take the window)
+which are run in submission order. Each submission returns a `concurrent.futures.Future` for the
+command's result. Commands which arrive while a frame is being drawn are run together in a batch
+before the next frame:
+
+    renderer = RenderThread(lambda: Window(800, 600), draw=draw_scene)
+    renderer.start()
+    # On a worker thread:
+    vbo = renderer.upload(VBO, vertices).result()
+    image = renderer.read_pixels(0, 0, 800, 600).result()
+
+Arrays passed to commands must not be modified until the command has run. Some platforms (such
+as macOS) only allow windows to be created on the main thread, in which case `run` can be called
+from the main thread instead of using `start`.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.commands import Command
+from glip.gl.context import Window
+from glip.gl.objects import BufferObject, Framebuffer, PixelFormat
+
+
+class RenderThread:
+    """Owns a window and runs commands for it on a dedicated thread."""
+
+    def __init__(self, create_window: Callable[[], Window],
+                 draw: Optional[Callable[[Window], None]] = None, max_fps: float = 60.0,
+                 idle_poll_interval: float = 0.01):
+        """
+        Args:
+            create_window: Called on the render thread to create the window.
+            draw: If given, called on the render thread to draw each frame, which is then
+                presented with `Window.tick`. Frames are drawn at up to `max_fps`.
+            max_fps: Maximum frame rate when drawing frames.
+            idle_poll_interval: Time between polls for window events when there are no commands
+                and no frames to draw.
+        """
+        self._create_window = create_window
+        self.draw = draw
+        self.frame_interval = 1 / max_fps
+        self.idle_poll_interval = idle_poll_interval
+        self.window: Optional[Window] = None
+        self._commands: queue.Queue = queue.Queue()
+        self._frame_waiters: List[Future] = []
+        self._frame_waiters_lock = threading.Lock()
+        self._started = Future()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> Window:
+        """Start the render thread and wait for its window to be created."""
+        assert self._thread is None
+        self._thread = threading.Thread(target=self.run, name='RenderThread', daemon=True)
+        self._thread.start()
+        return self._started.result()
+
+    def is_render_thread(self) -> bool:
+        return self.window is not None and self.window.is_active()
+
+    def submit(self, function: Callable[..., Any], *args, **kwargs) -> Future:
+        """Run `function(window, *args, **kwargs)` on the render thread.
+
+        If called from the render thread itself, the command runs immediately.
+        """
+        future = Future()
+        if self.is_render_thread():
+            self._run_command(Command(function, args, kwargs, future))
+            return future
+        if self._stopping:
+            raise RuntimeError('The render thread has been stopped')
+        self._commands.put(Command(function, args, kwargs, future))
+        return future
+
+    def call(self, function: Callable[..., Any], *args, **kwargs):
+        """Run a command on the render thread and wait for its result."""
+        return self.submit(function, *args, **kwargs).result()
+
+    def upload(self, buffer_class: Callable[..., BufferObject], data: np.ndarray,
+               **kwargs) -> Future:
+        """Create a buffer object (e.g. a `VBO`) holding a copy of `data`."""
+        return self.submit(lambda window: buffer_class(data, **kwargs))
+
+    def read_pixels(self, x: int, y: int, width: int, height: int,
+                    attachment=gl.GL_COLOR_ATTACHMENT0, pixel_format: Optional[PixelFormat] = None,
+                    framebuffer: Optional[Framebuffer] = None) -> Future:
+        """Read pixels from a framebuffer, or the window's back buffer if not given."""
+        def read_pixels(window):
+            target = framebuffer if framebuffer is not None else Framebuffer.get_default()
+            with target.bound():
+                return target.read_pixels(x, y, width, height, attachment, pixel_format)
+        return self.submit(read_pixels)
+
+    def next_frame(self) -> Future:
+        """Get a future for the index of the next frame, which is set once it is presented.
+
+        Commands submitted before this call run before that frame is drawn. If there is no draw
+        function, the future is set once the commands submitted before it have run. The future is
+        cancelled if the thread stops before the frame is presented.
+        """
+        future = Future()
+        with self._frame_waiters_lock:
+            self._frame_waiters.append(future)
+        # Wake the render thread if it is idle.
+        self._commands.put(None)
+        return future
+
+    def _run_command(self, command: Command):
+        if not command.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = command.function(self.window, *command.args, **command.kwargs)
+        except BaseException as error:
+            command.future.set_exception(error)
+        else:
+            command.future.set_result(result)
+
+    def _take_commands(self, timeout: float) -> Tuple[List[Command], List[Future]]:
+        """Wait up to `timeout` seconds for a command, then take all queued commands.
+
+        Returns:
+            The commands, and the frame waiters whose earlier commands are among them.
+        """
+        commands = []
+        try:
+            commands.append(self._commands.get(timeout=max(timeout, 0)))
+        except queue.Empty:
+            pass
+        # Waiters are registered after the commands submitted before them are queued, so
+        # taking the waiters before draining the queue ensures those commands are taken too.
+        waiters = self._take_frame_waiters()
+        try:
+            while True:
+                commands.append(self._commands.get_nowait())
+        except queue.Empty:
+            pass
+        return [command for command in commands if command is not None], waiters
+
+    def _take_frame_waiters(self) -> List[Future]:
+        with self._frame_waiters_lock:
+            waiters, self._frame_waiters = self._frame_waiters, []
+        return waiters
+
+    def _finish_frame(self, waiters: List[Future]):
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(self.window.frame_index)
+
+    def run(self):
+        """Create the window and run commands and frames until `stop` is called."""
+        try:
+            self.window = self._create_window()
+        except BaseException as error:
+            self._started.set_exception(error)
+            raise
+        self._started.set_result(self.window)
+        next_frame_time = time.monotonic()
+        # Waiters for the next frame, which only includes commands which have already run.
+        waiters = []
+        try:
+            while not self._stopping:
+                if self.draw is not None:
+                    timeout = next_frame_time - time.monotonic()
+                else:
+                    timeout = self.idle_poll_interval
+                commands, new_waiters = self._take_commands(timeout)
+                for command in commands:
+                    self._run_command(command)
+                waiters.extend(new_waiters)
+                if self.draw is not None:
+                    if time.monotonic() < next_frame_time:
+                        continue
+                    self.window.activate()
+                    self.draw(self.window)
+                    self.window.tick()
+                    next_frame_time = max(next_frame_time + self.frame_interval,
+                                          time.monotonic())
+                else:
+                    self.window.poll_events()
+                self._finish_frame(waiters)
+                waiters = []
+            # Run the commands which were submitted before stopping.
+            commands, new_waiters = self._take_commands(0)
+            for command in commands:
+                self._run_command(command)
+            waiters.extend(new_waiters)
+            if self.draw is None:
+                self._finish_frame(waiters)
+                waiters = []
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+            self._cancel_commands()
+            self.window.destroy()
+
+    def _cancel_commands(self):
+        try:
+            while True:
+                command = self._commands.get_nowait()
+                if command is not None:
+                    command.future.cancel()
+        except queue.Empty:
+            pass
+        with self._frame_waiters_lock:
+            for waiter in self._frame_waiters:
+                waiter.cancel()
+            self._frame_waiters = []
+
+    def stop(self, timeout: Optional[float] = None):
+        """Run the commands which have already been submitted, then destroy the window."""
+        self._stopping = True
+        self._commands.put(None)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
@@ -0,0 +1,260 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import OpenGL.GL as gl
+import numpy as np
+
+
+# Component types of GLSL uniform types, keyed by type name prefix.
+_GLSL_COMPONENT_TYPES = {
+    '': np.float32,
+    'i': np.int32,
+    'u': np.uint32,
+    'b': np.uint32,
+    'd': np.float64,
+}
+_GLSL_SCALAR_NAMES = {
+    'float': '',
+    'int': 'i',
+    'uint': 'u',
+    'bool': 'b',
+    'double': 'd',
+}
+
+
+def _round_up(value, multiple):
+    return (value + multiple - 1) // multiple * multiple
+
+
+def parse_glsl_type(glsl_type: str) -> Tuple[np.dtype, int, int]:
+    """Parse a GLSL type name into its component data type, number of rows and number of columns.
+
+    Scalars have one row and one column, and vectors have one column.
+    """
+    if glsl_type in _GLSL_SCALAR_NAMES:
+        return np.dtype(_GLSL_COMPONENT_TYPES[_GLSL_SCALAR_NAMES[glsl_type]]), 1, 1
+    match = re.fullmatch(r'([iubd]?)vec([234])', glsl_type)
+    if match:
+        return np.dtype(_GLSL_COMPONENT_TYPES[match.group(1)]), int(match.group(2)), 1
+    match = re.fullmatch(r'(d?)mat([234])(?:x([234]))?', glsl_type)
+    if match:
+        cols = int(match.group(2))
+        rows = int(match.group(3) or cols)
+        return np.dtype(_GLSL_COMPONENT_TYPES[match.group(1)]), rows, cols
+    raise ValueError(f'Unsupported GLSL type: {glsl_type}')
+
+
+_NUMPY_TYPE_PREFIXES = {
+    np.float32: '',
+    np.int32: 'i',
+    np.uint32: 'u',
+    np.float64: 'd',
+}
+
+
+def _glsl_type_name(dtype, rows, cols):
+    if np.dtype(dtype).type not in _NUMPY_TYPE_PREFIXES:
+        raise ValueError(f'Unsupported uniform data type: {dtype}')
+    prefix = _NUMPY_TYPE_PREFIXES[np.dtype(dtype).type]
+    if cols > 1:
+        if prefix not in ('', 'd'):
+            raise ValueError('Matrices must have float32 or float64 components')
+        return f'{prefix}mat{cols}x{rows}'
+    if rows > 1:
+        return f'{prefix}vec{rows}'
+    return {v: k for k, v in _GLSL_SCALAR_NAMES.items()}[prefix]
+
+
+class Std140Field:
+    """The location of a single uniform block member within a host-side buffer."""
+
+    def __init__(self, name: str, dtype, shape: Tuple[int, ...], offset: int,
+                 strides: Tuple[int, ...]):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.offset = offset
+        self.strides = tuple(strides)
+
+    def __repr__(self):
+        return (f'Std140Field(name={self.name!r}, dtype={self.dtype}, shape={self.shape}, '
+                f'offset={self.offset}, strides={self.strides})')
+
+
+class Std140Layout:
+    """Memory layout of a uniform block following the std140 rules.
+
+    Fields are specified as (name, glsl_type) or (name, glsl_type, array_length) tuples, for
+    example `[('view', 'mat4'), ('light_positions', 'vec3', 8)]`. Matrices are exposed with shape
+    (rows, columns) and are laid out in column-major order, so row-major matrices from
+    `glip.math.mat4` can be assigned directly.
+    """
+
+    def __init__(self, fields: Sequence[tuple] = (), size: Optional[int] = None):
+        self.fields: List[Std140Field] = []
+        offset = 0
+        for field in fields:
+            name, glsl_type = field[:2]
+            array_length = field[2] if len(field) > 2 else None
+            dtype, rows, cols = parse_glsl_type(glsl_type)
+            component_size = dtype.itemsize
+            if cols == 1:
+                # Three-component vectors are aligned like four-component vectors.
+                align = component_size * (rows if rows != 3 else 4)
+                type_shape = (rows,) if rows > 1 else ()
+                type_strides = (component_size,) if rows > 1 else ()
+                type_size = component_size * rows
+            else:
+                # Matrices are stored like arrays of column vectors.
+                column_stride = _round_up(component_size * (rows if rows != 3 else 4), 16)
+                align = column_stride
+                type_shape = (rows, cols)
+                type_strides = (component_size, column_stride)
+                type_size = column_stride * cols
+            if array_length is not None:
+                align = _round_up(align, 16)
+                element_stride = _round_up(type_size, align)
+                type_shape = (array_length,) + type_shape
+                type_strides = (element_stride,) + type_strides
+                type_size = element_stride * array_length
+            offset = _round_up(offset, align)
+            self.fields.append(Std140Field(name, dtype, type_shape, offset, type_strides))
+            offset += type_size
+        if size is None:
+            size = _round_up(offset, 16)
+        self.size = size
+        self._fields_by_name = {field.name: field for field in self.fields}
+
+    def __getitem__(self, name) -> Std140Field:
+        return self._fields_by_name[name]
+
+    def __contains__(self, name):
+        return name in self._fields_by_name
+
+    @classmethod
+    def from_dtype(cls, dtype) -> 'Std140Layout':
+        """Create a layout from a NumPy structured data type.
+
+        The shape of each field determines its GLSL type: () is a scalar, (n,) is a vector
+        (or an array of scalars if n > 4), (rows, cols) is a matrix (or an array of vectors if
+        rows > 4), and (n, rows, cols) is an array of matrices. Arrays of up to four scalars or
+        vectors must be described using GLSL type names instead.
+        """
+        dtype = np.dtype(dtype)
+        fields = []
+        for name in dtype.names:
+            field_dtype = dtype.fields[name][0]
+            base, shape = field_dtype.base, field_dtype.shape
+            if len(shape) == 0:
+                fields.append((name, _glsl_type_name(base, 1, 1)))
+            elif len(shape) == 1 and shape[0] <= 4:
+                fields.append((name, _glsl_type_name(base, shape[0], 1)))
+            elif len(shape) == 1:
+                fields.append((name, _glsl_type_name(base, 1, 1), shape[0]))
+            elif len(shape) == 2 and shape[0] <= 4:
+                fields.append((name, _glsl_type_name(base, shape[0], shape[1])))
+            elif len(shape) == 2:
+                fields.append((name, _glsl_type_name(base, shape[1], 1), shape[0]))
+            elif len(shape) == 3:
+                fields.append((name, _glsl_type_name(base, shape[1], shape[2]), shape[0]))
+            else:
+                raise ValueError(f'Unsupported shape for field {name!r}: {shape}')
+        return cls(fields)
+
+    @classmethod
+    def from_program(cls, program, block_name: str) -> 'Std140Layout':
+        """Create a layout by querying an active uniform block of a linked shader program.
+
+        This reflects the offsets chosen by the driver, so it also works for blocks which are not
+        declared with `layout(std140)`.
+        """
+        handle = program.handle
+        block_index = program.get_uniform_block_index(block_name)
+        params = np.zeros(1, dtype=np.int32)
+        gl.glGetActiveUniformBlockiv(handle, block_index, gl.GL_UNIFORM_BLOCK_DATA_SIZE, params)
+        size = int(params[0])
+        gl.glGetActiveUniformBlockiv(handle, block_index, gl.GL_UNIFORM_BLOCK_ACTIVE_UNIFORMS,
+                                     params)
+        n_uniforms = int(params[0])
+        indices = np.zeros(n_uniforms, dtype=np.int32)
+        gl.glGetActiveUniformBlockiv(handle, block_index,
+                                     gl.GL_UNIFORM_BLOCK_ACTIVE_UNIFORM_INDICES, indices)
+        indices = indices.astype(np.uint32)
+
+        def get_uniforms_iv(pname):
+            values = np.zeros(n_uniforms, dtype=np.int32)
+            gl.glGetActiveUniformsiv(handle, n_uniforms, indices, pname, values)
+            return values.tolist()
+
+        offsets = get_uniforms_iv(gl.GL_UNIFORM_OFFSET)
+        array_strides = get_uniforms_iv(gl.GL_UNIFORM_ARRAY_STRIDE)
+        matrix_strides = get_uniforms_iv(gl.GL_UNIFORM_MATRIX_STRIDE)
+        row_major = get_uniforms_iv(gl.GL_UNIFORM_IS_ROW_MAJOR)
+
+        layout = cls(size=size)
+        for i, index in enumerate(indices.tolist()):
+            name, array_length, gl_type = gl.glGetActiveUniform(handle, index)
+            name = name.decode() if isinstance(name, bytes) else name
+            is_array = name.endswith('[0]')
+            name = name[:-len('[0]')] if is_array else name
+            if name.startswith(block_name + '.'):
+                name = name[len(block_name) + 1:]
+            dtype, rows, cols = _GL_TYPES[int(gl_type)]
+            component_size = dtype.itemsize
+            if cols > 1:
+                if row_major[i]:
+                    shape, strides = (rows, cols), (matrix_strides[i], component_size)
+                else:
+                    shape, strides = (rows, cols), (component_size, matrix_strides[i])
+            elif rows > 1:
+                shape, strides = (rows,), (component_size,)
+            else:
+                shape, strides = (), ()
+            if is_array:
+                shape = (array_length,) + shape
+                strides = (array_strides[i],) + strides
+            layout.fields.append(Std140Field(name, dtype, shape, offsets[i], strides))
+        layout.fields.sort(key=lambda field: field.offset)
+        layout._fields_by_name = {field.name: field for field in layout.fields}
+        return layout
+
+
+def _make_gl_types():
+    gl_types = {}
+    prefixes = {'': 'FLOAT', 'i': 'INT', 'u': 'UNSIGNED_INT', 'b': 'BOOL', 'd': 'DOUBLE'}
+    for prefix, gl_name in prefixes.items():
+        dtype = np.dtype(_GLSL_COMPONENT_TYPES[prefix])
+        gl_types[getattr(gl, f'GL_{gl_name}')] = (dtype, 1, 1)
+        for n in range(2, 5):
+            gl_types[getattr(gl, f'GL_{gl_name}_VEC{n}')] = (dtype, n, 1)
+        if prefix in ('', 'd'):
+            for cols in range(2, 5):
+                for rows in range(2, 5):
+                    suffix = f'{cols}' if rows == cols else f'{cols}x{rows}'
+                    gl_types[getattr(gl, f'GL_{gl_name}_MAT{suffix}')] = (dtype, rows, cols)
+    return gl_types
+
+
+_GL_TYPES = _make_gl_types()
+
+
+class UniformBlock:
+    """Host-side storage for the contents of a uniform block.
+
+    Fields can be read and written by name, which accesses strided views into `data`. The `data`
+    array holds the packed bytes and can be written straight into a `UBO`.
+    """
+
+    def __init__(self, layout: Std140Layout):
+        self.layout = layout
+        self.data = np.zeros(layout.size, dtype=np.uint8)
+        self._views = {}
+        for field in layout.fields:
+            self._views[field.name] = np.ndarray(field.shape, dtype=field.dtype, buffer=self.data,
+                                                 offset=field.offset, strides=field.strides)
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self._views[name]
+
+    def __setitem__(self, name, value):
+        self._views[name][...] = value
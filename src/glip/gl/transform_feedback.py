@@ -0,0 +1,135 @@
+"""Capturing vertex shader outputs into buffers with transform feedback.
+
+Transform feedback runs a vertex shader over a batch of vertices and writes selected outputs
+(declared with `ShaderProgram(feedback_varyings=...)`) into VBOs, which makes it possible to run
+simulations such as particle updates or mesh skinning on the GPU. For example:
+
+    program = ShaderProgram(vertex_shader=source, vertex_attribs=attribs,
+                            feedback_varyings=['out_position', 'out_velocity'])
+    feedback = TransformFeedback(program)
+    with vao.bound(), feedback.capture([output_vbo]):
+        vao.draw_arrays(PrimitiveType.POINTS, 0, n_particles)
+    particles = feedback.read(output_vbo)
+
+Output buffers can in turn be used as vertex inputs, so simulations can ping-pong between two
+buffers without reading data back. A buffer must not be read as a vertex input while it is being
+written to.
+"""
+
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple, Union
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.objects import PrimitiveType, Query, ShaderProgram, VBO
+
+# Primitive types which can be captured, and the number of vertices written for each primitive.
+_VERTICES_PER_PRIMITIVE = {
+    PrimitiveType.POINTS: 1,
+    PrimitiveType.LINES: 2,
+    PrimitiveType.TRIANGLES: 3,
+}
+
+# A whole buffer, or a (buffer, byte offset, byte size) range of a buffer.
+FeedbackTarget = Union[VBO, Tuple[VBO, int, int]]
+
+
+class TransformFeedback:
+    """Captures the feedback varyings of a shader program into buffers."""
+
+    def __init__(self, program: ShaderProgram, primitive_type: PrimitiveType = PrimitiveType.POINTS,
+                 discard_rasterizer: bool = True):
+        """
+        Args:
+            program: A linked program with feedback varyings.
+            primitive_type: The type of primitive to capture. Draw calls made while capturing
+                must use this type. Strips and fans are captured as separate lines or triangles.
+            discard_rasterizer: If True, primitives are discarded after the vertex shader, so
+                nothing is drawn while capturing.
+        """
+        if primitive_type not in _VERTICES_PER_PRIMITIVE:
+            raise ValueError(f'Cannot capture {primitive_type.name} primitives')
+        if not program.feedback_varyings:
+            raise ValueError('The program has no feedback varyings')
+        self.program = program
+        self.primitive_type = primitive_type
+        self.discard_rasterizer = discard_rasterizer
+        self.dtypes: List[np.dtype] = program.get_feedback_dtypes()
+        self._query = Query(gl.GL_TRANSFORM_FEEDBACK_PRIMITIVES_WRITTEN)
+        self._primitives_written: Optional[int] = None
+        self._is_capturing = False
+
+    @contextmanager
+    def capture(self, targets: Sequence[FeedbackTarget]):
+        """Bind the program and capture the outputs of draw calls made in this context.
+
+        Args:
+            targets: One buffer (or buffer range) for interleaved varyings, or one per varying
+                for separate varyings. Range offsets must be multiples of 4.
+        """
+        if len(targets) != len(self.dtypes):
+            raise ValueError(f'Expected {len(self.dtypes)} feedback buffers, got {len(targets)}')
+        assert not self._is_capturing
+        self.program.bind()
+        for index, target in enumerate(targets):
+            if isinstance(target, VBO):
+                gl.glBindBufferBase(gl.GL_TRANSFORM_FEEDBACK_BUFFER, index, target.handle)
+            else:
+                vbo, offset, size = target
+                gl.glBindBufferRange(gl.GL_TRANSFORM_FEEDBACK_BUFFER, index, vbo.handle, offset,
+                                     size)
+        if self.discard_rasterizer:
+            gl.glEnable(gl.GL_RASTERIZER_DISCARD)
+        self._primitives_written = None
+        self._is_capturing = True
+        self._query.begin()
+        gl.glBeginTransformFeedback(self.primitive_type.value)
+        try:
+            yield self
+        finally:
+            gl.glEndTransformFeedback()
+            self._query.end()
+            self._is_capturing = False
+            if self.discard_rasterizer:
+                gl.glDisable(gl.GL_RASTERIZER_DISCARD)
+            # Feedback bindings are not tracked, so leave them empty for other code.
+            for index in range(len(targets)):
+                gl.glBindBufferBase(gl.GL_TRANSFORM_FEEDBACK_BUFFER, index, 0)
+
+    @property
+    def primitives_written(self) -> int:
+        """The number of primitives written by the last capture, waiting for it if necessary.
+
+        Primitives which do not fit into the feedback buffers are not written.
+        """
+        assert not self._is_capturing
+        if self._primitives_written is None:
+            self._primitives_written = self._query.get_result()
+        return self._primitives_written
+
+    @property
+    def vertices_written(self) -> int:
+        """The number of records written to each buffer by the last capture."""
+        return self.primitives_written * _VERTICES_PER_PRIMITIVE[self.primitive_type]
+
+    def read(self, vbo: VBO, index: int = 0, offset: int = 0,
+             count: Optional[int] = None) -> np.ndarray:
+        """Map a feedback buffer and copy its records into a structured array.
+
+        Args:
+            vbo: The buffer which was bound as target `index`.
+            index: Which feedback buffer `vbo` was used as, which selects the record type.
+            offset: Byte offset of the first record in `vbo`.
+            count: Number of records to read. Defaults to `vertices_written`.
+        """
+        dtype = self.dtypes[index]
+        if count is None:
+            count = self.vertices_written
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        with vbo.bound(), vbo.mapped(offset, count * dtype.itemsize) as data:
+            return data.view(dtype).copy()
+
+    def destroy(self):
+        self._query.destroy()
@@ -0,0 +1,50 @@
+"""Helpers for building stacks of matrices from broadcastable arguments."""
+
+import numpy as np
+
+
+def broadcast_shapes(*shapes):
+    """Compute the shape that results from broadcasting arrays of the given shapes together."""
+    shapes = set(tuple(shape) for shape in shapes)
+    shapes.discard(())
+    if len(shapes) == 0:
+        return ()
+    if len(shapes) == 1:
+        return shapes.pop()
+    return np.broadcast(*[np.broadcast_to(np.empty(()), shape) for shape in shapes]).shape
+
+
+def prepare_out(out, shape, dtype):
+    """Return `out` if it is suitable for holding a result of the given shape, or allocate a new
+    array if `out` is None.
+    """
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != tuple(shape):
+        raise ValueError(f'output array has shape {out.shape}, expected {tuple(shape)}')
+    return out
+
+
+def batch_identity(n, batch_shape=(), dtype=np.float64, out=None):
+    """Create an array of shape `batch_shape + (n, n)` filled with identity matrices."""
+    out = prepare_out(out, tuple(batch_shape) + (n, n), dtype)
+    out[...] = 0
+    np.einsum('...ii->...i', out)[...] = 1
+    return out
+
+
+def from_elements(elements, dtype=np.float64, out=None):
+    """Build a matrix from a nested list of elements.
+
+    Each element may be a scalar or an array. Array elements are broadcast against each other,
+    and the result has shape `batch_shape + (rows, cols)`. When all elements are scalars the
+    result is a single matrix.
+    """
+    n_rows = len(elements)
+    n_cols = len(elements[0])
+    batch_shape = broadcast_shapes(*[np.shape(e) for row in elements for e in row])
+    out = prepare_out(out, batch_shape + (n_rows, n_cols), dtype)
+    for i, row in enumerate(elements):
+        for j, element in enumerate(row):
+            out[..., i, j] = element
+    return out
@@ -0,0 +1,157 @@
+"""Dimension-agnostic implementations of operations shared by mat3 and mat4."""
+
+import numpy as np
+
+
+def chain_product(matrices, out=None):
+    """Multiply a chain of transformation matrices such that the first is applied first.
+
+    `matrices` may be a sequence of matrices (or stacks of matrices), or an array of shape
+    (..., K, n, n) holding K-long chains which are reduced along the third-last axis.
+    """
+    if isinstance(matrices, np.ndarray):
+        if matrices.shape[-3] == 0:
+            raise ValueError('cannot concatenate an empty chain of matrices')
+        # Reduce adjacent pairs of matrices at each step so that the whole batch of chains is
+        # multiplied with O(log K) vectorised matrix products.
+        while matrices.shape[-3] > 1:
+            n_even = matrices.shape[-3] // 2 * 2
+            paired = np.matmul(matrices[..., 1:n_even:2, :, :], matrices[..., 0:n_even:2, :, :])
+            if n_even < matrices.shape[-3]:
+                paired = np.concatenate([paired, matrices[..., n_even:, :, :]], axis=-3)
+            matrices = paired
+        result = matrices[..., 0, :, :]
+        if out is None:
+            return result
+        out[...] = result
+        return out
+    if len(matrices) == 0:
+        raise ValueError('cannot concatenate an empty chain of matrices')
+    result = matrices[0]
+    for i, matrix in enumerate(matrices[1:], start=2):
+        result = np.matmul(matrix, result, out=out if i == len(matrices) else None)
+    if len(matrices) == 1 and out is not None:
+        out[...] = result
+        return out
+    return result
+
+
+def _apply_linear(matrix, vectors, out):
+    A = matrix[..., :-1, :-1]
+    if A.ndim == 2:
+        return np.matmul(vectors, A.T, out=out)
+    return np.einsum('...ij,...j->...i', A, vectors, out=out)
+
+
+def _has_projection(matrix):
+    last_row = matrix[..., -1, :]
+    return np.any(last_row[..., :-1] != 0) or np.any(last_row[..., -1] != 1)
+
+
+def _homogeneous_w(matrix, points):
+    row = matrix[..., -1, :-1]
+    if row.ndim == 1:
+        return points @ row + matrix[-1, -1]
+    return np.einsum('...j,...j->...', row, points) + matrix[..., -1, -1]
+
+
+def transform_vectors(matrix, vectors, out=None):
+    """Apply the linear part of a transformation matrix to direction vectors."""
+    return _apply_linear(np.asarray(matrix), np.asarray(vectors), out)
+
+
+def transform_points(matrix, points, out=None):
+    """Apply a transformation matrix to points, including the homogeneous divide."""
+    matrix = np.asarray(matrix)
+    points = np.asarray(points)
+    result = _apply_linear(matrix, points, out)
+    result += matrix[..., :-1, -1]
+    if _has_projection(matrix):
+        result /= _homogeneous_w(matrix, points)[..., None]
+    return result
+
+
+def _invert_linear(A):
+    """Invert the square matrices in A, using closed-form expressions for small sizes."""
+    A = A.astype(np.result_type(A, np.float32), copy=False)
+    n = A.shape[-1]
+    if n == 2:
+        det = A[..., 0, 0] * A[..., 1, 1] - A[..., 0, 1] * A[..., 1, 0]
+        inv = np.empty_like(A)
+        inv[..., 0, 0] = A[..., 1, 1]
+        inv[..., 0, 1] = -A[..., 0, 1]
+        inv[..., 1, 0] = -A[..., 1, 0]
+        inv[..., 1, 1] = A[..., 0, 0]
+        inv /= det[..., None, None]
+        return inv
+    if n == 3:
+        # The rows of the inverse are cross products of the columns of A, divided by the
+        # determinant.
+        c0, c1, c2 = A[..., :, 0], A[..., :, 1], A[..., :, 2]
+        inv = np.stack([np.cross(c1, c2), np.cross(c2, c0), np.cross(c0, c1)], axis=-2)
+        det = np.einsum('...j,...j->...', inv[..., 0, :], c0)
+        inv /= det[..., None, None]
+        return inv
+    return np.linalg.inv(A)
+
+
+def invert_rigid(matrix, out=None):
+    """Invert transformation matrices which are composed only of rotations and translations."""
+    matrix = np.asarray(matrix)
+    R_inv = np.swapaxes(matrix[..., :-1, :-1], -1, -2)
+    return _set_affine(R_inv, matrix[..., :-1, -1], out)
+
+
+def invert_affine(matrix, out=None):
+    """Invert affine transformation matrices."""
+    matrix = np.asarray(matrix)
+    return _set_affine(_invert_linear(matrix[..., :-1, :-1]), matrix[..., :-1, -1], out)
+
+
+def _set_affine(A_inv, t, out):
+    n = A_inv.shape[-1] + 1
+    if out is None:
+        out = np.empty(A_inv.shape[:-2] + (n, n), dtype=np.result_type(A_inv, np.float32))
+    out[..., :-1, :-1] = A_inv
+    out[..., :-1, -1] = -np.einsum('...ij,...j->...i', A_inv, t)
+    out[..., -1, :-1] = 0
+    out[..., -1, -1] = 1
+    return out
+
+
+def normal_matrix(matrix, out=None):
+    """Calculate the inverse-transpose of the linear part of transformation matrices."""
+    normal = np.swapaxes(_invert_linear(np.asarray(matrix)[..., :-1, :-1]), -1, -2)
+    if out is None:
+        return normal
+    out[...] = normal
+    return out
+
+
+def is_similarity(matrix, eps=None):
+    """Check whether matrices represent similarity transformations.
+
+    A similarity transformation has a last row of [0, ..., 0, 1] and a linear part A for which
+    A^T A is a multiple of the identity matrix. `eps` is the tolerance for the spread of A's
+    scale factors relative to their size, and defaults to a small multiple of the precision of
+    the matrix's data type.
+    """
+    matrix = np.asarray(matrix)
+    if eps is None:
+        eps = 16 * np.finfo(np.result_type(matrix.dtype, np.float32)).eps
+    n = matrix.shape[-1]
+    A = matrix[..., :-1, :-1]
+    gram = np.matmul(np.swapaxes(A, -1, -2), A)
+    diagonal = np.einsum('...ii->...i', gram)
+    mean_scale = np.mean(diagonal, axis=-1)
+    deviation = np.abs(gram - mean_scale[..., None, None] * np.eye(n - 1)).max(axis=(-2, -1))
+    identity_row = np.zeros(n, dtype=matrix.dtype)
+    identity_row[-1] = 1
+    last_row_ok = (np.abs(matrix[..., -1, :] - identity_row) <= eps).all(axis=-1)
+    # The Gram matrix holds squared scales, so a relative spread of eps in the scales shows up
+    # as about 2 * eps. The absolute floor accepts a zero linear part.
+    tolerance = 2 * eps * mean_scale + np.finfo(np.result_type(gram.dtype, np.float32)).tiny
+    result = (deviation <= tolerance) & last_row_ok
+    if result.ndim == 0:
+        return bool(result)
+    return result
@@ -0,0 +1,77 @@
+"""Vectorised view frustum culling.
+
+Frustum planes are stored in an array of shape (6, 4), with each row (a, b, c, d) describing the
+half-space a*x + b*y + c*z + d >= 0 which lies inside the frustum. The planes are ordered left,
+right, bottom, top, near, far.
+"""
+
+import numpy as np
+
+
+def frustum_planes(matrix, normalise=True):
+    """Extract frustum planes from a (projection @ view) matrix.
+
+    The planes are in the coordinate space that `matrix` transforms from, so passing a projection
+    matrix gives planes in camera space and passing a view-projection matrix gives planes in world
+    space. Planes must be normalised for sphere tests to give correct results.
+
+    Reference: Gribb and Hartmann, "Fast Extraction of Viewing Frustum Planes from the
+    World-View-Projection Matrix".
+    """
+    m = np.asarray(matrix, dtype=np.float64)
+    planes = np.stack([
+        m[3] + m[0],
+        m[3] - m[0],
+        m[3] + m[1],
+        m[3] - m[1],
+        m[3] + m[2],
+        m[3] - m[2],
+    ])
+    if normalise:
+        planes /= np.linalg.norm(planes[:, :3], axis=-1, keepdims=True)
+    return planes
+
+
+def spheres_in_frustum(planes, centres, radii):
+    """Test which bounding spheres intersect the frustum.
+
+    Args:
+        planes: Normalised frustum planes of shape (6, 4).
+        centres: Sphere centres of shape (N, 3).
+        radii: Sphere radii of shape (N,), or a scalar.
+
+    Returns:
+        A boolean mask of shape (N,).
+    """
+    planes = np.asarray(planes)
+    distances = np.asarray(centres) @ planes[:, :3].T + planes[:, 3]
+    return (distances >= -np.asarray(radii)[..., None]).all(axis=-1)
+
+
+def aabbs_in_frustum(planes, boxes):
+    """Test which axis-aligned bounding boxes intersect the frustum.
+
+    Boxes which lie outside the frustum but cross several planes near a corner may be reported as
+    visible, which is the usual conservative behaviour for this test.
+
+    Args:
+        planes: Frustum planes of shape (6, 4).
+        boxes: Box corners of shape (N, 2, 3), holding the minimum and maximum corners of each box.
+
+    Returns:
+        A boolean mask of shape (N,).
+    """
+    planes = np.asarray(planes)
+    boxes = np.asarray(boxes)
+    centres = (boxes[:, 0] + boxes[:, 1]) / 2
+    extents = (boxes[:, 1] - boxes[:, 0]) / 2
+    # Distance from each plane to the box corner which lies furthest along the plane normal.
+    distances = centres @ planes[:, :3].T + extents @ np.abs(planes[:, :3]).T + planes[:, 3]
+    return (distances >= 0).all(axis=-1)
+
+
+def visible_indices(mask, dtype=np.uint32):
+    """Convert a visibility mask into an array of indices, e.g. for uploading to an instance
+    buffer.
+    """
+    return np.flatnonzero(mask).astype(dtype, copy=False)
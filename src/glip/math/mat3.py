@@ -1,46 +1,110 @@
 import numpy as np
 
+from glip.math import _transform
+from glip.math._batch import batch_identity, broadcast_shapes, from_elements
 
-def identity():
-    return np.eye(3, dtype=np.float64)
 
+def identity(*, dtype=np.float64, out=None):
+    return batch_identity(3, dtype=dtype, out=out)
 
-def affine(A=None, t=None):
-    aff = identity()
+
+def affine(A=None, t=None, *, dtype=np.float64, out=None):
+    """Create an affine transformation matrix.
+
+    A may have shape (..., 2, 2) and t may have shape (..., 2), in which case a stack of matrices
+    is returned.
+    """
+    batch_shape = ()
+    if A is not None:
+        batch_shape = broadcast_shapes(batch_shape, np.shape(A)[:-2])
+    if t is not None:
+        batch_shape = broadcast_shapes(batch_shape, np.shape(t)[:-1])
+    aff = batch_identity(3, batch_shape, dtype=dtype, out=out)
     if A is not None:
-        aff[0:2, 0:2] = np.array(A, dtype=aff.dtype)
+        aff[..., 0:2, 0:2] = A
     if t is not None:
-        aff[0:2, 2] = np.array(t, dtype=aff.dtype)
+        aff[..., 0:2, 2] = t
     return aff
 
 
-def flip_x(x=0):
+def flip_x(x=0, *, dtype=np.float64, out=None):
     """Flip horizontally. x is the centre of reflection."""
-    return affine(A=[[-1, 0],
-                     [ 0, 1]],
-                  t=[2 * x, 0])
+    return from_elements([[-1, 0, 2 * x],
+                          [ 0, 1,     0],
+                          [ 0, 0,     1]], dtype=dtype, out=out)
 
 
-def rotate(theta):
+def rotate(theta, *, dtype=np.float64, out=None):
     """Rotate counter-clockwise."""
-    return affine(A=[[ np.cos(theta), np.sin(theta)],
-                     [-np.sin(theta), np.cos(theta)]])
+    return from_elements([[ np.cos(theta), np.sin(theta), 0],
+                          [-np.sin(theta), np.cos(theta), 0],
+                          [             0,             0, 1]], dtype=dtype, out=out)
 
 
-def scale(sx, sy=None):
+def scale(sx, sy=None, *, dtype=np.float64, out=None):
     """Scale."""
     if sy is None: sy = sx
-    return affine(A=[[sx,  0],
-                     [ 0, sy]])
+    return from_elements([[sx,  0, 0],
+                          [ 0, sy, 0],
+                          [ 0,  0, 1]], dtype=dtype, out=out)
 
 
-def translate(tx, ty):
+def translate(tx, ty, *, dtype=np.float64, out=None):
     """Translate."""
-    return affine(t=[tx, ty])
+    return from_elements([[1, 0, tx],
+                          [0, 1, ty],
+                          [0, 0,  1]], dtype=dtype, out=out)
+
+
+def concatenate(matrices, out=None):
+    """Combine a chain of transformations, with the first matrix being applied first.
+
+    `matrices` may also be an array of shape (..., K, 3, 3), in which case each chain of K
+    matrices is combined.
+    """
+    return _transform.chain_product(matrices, out=out)
+
+
+def transform_points(matrix, points, out=None):
+    """Transform points of shape (..., 2), including the homogeneous divide."""
+    return _transform.transform_points(matrix, points, out=out)
+
+
+def transform_vectors(matrix, vectors, out=None):
+    """Transform direction vectors of shape (..., 2), ignoring translation."""
+    return _transform.transform_vectors(matrix, vectors, out=out)
+
+
+def invert_rigid(matrix, out=None):
+    """Invert a rigid transformation (rotation and translation only).
+
+    This is much cheaper than a general inverse. `matrix` may be a stack of shape (..., 3, 3).
+    """
+    return _transform.invert_rigid(matrix, out=out)
+
+
+def invert_affine(matrix, out=None):
+    """Invert an affine transformation.
+
+    `matrix` may be a stack of shape (..., 3, 3).
+    """
+    return _transform.invert_affine(matrix, out=out)
+
+
+def normal_matrix(matrix, out=None):
+    """Calculate the matrix for transforming normals, which is the inverse-transpose of the
+    upper-left 2x2 part of `matrix`.
+
+    `matrix` may be a stack of shape (..., 3, 3).
+    """
+    return _transform.normal_matrix(matrix, out=out)
+
 
+def is_similarity(matrix, eps=None):
+    """Check whether the matrix represents a similarity transformation.
 
-def concatenate(matrices):
-    if len(matrices) == 1:
-        return matrices[0]
-    else:
-        return concatenate(matrices[1:]) @ matrices[0]
+    Under a similarity transformation, relative lengths and angles remain unchanged. When given a
+    stack of matrices, a boolean array is returned. `eps` is a relative tolerance, which defaults
+    to one suited to the matrix's data type.
+    """
+    return _transform.is_similarity(matrix, eps=eps)
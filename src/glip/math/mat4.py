@@ -1,67 +1,85 @@
 import numpy as np
 
+from glip.math import _transform
+from glip.math._batch import batch_identity, broadcast_shapes, from_elements
 
-def identity():
-    return np.eye(4, dtype=np.float64)
 
+def identity(*, dtype=np.float64, out=None):
+    return batch_identity(4, dtype=dtype, out=out)
 
-def affine(A=None, t=None):
-    aff = identity()
+
+def affine(A=None, t=None, *, dtype=np.float64, out=None):
+    """Create an affine transformation matrix.
+
+    A may have shape (..., 3, 3) and t may have shape (..., 3), in which case a stack of matrices
+    is returned.
+    """
+    batch_shape = ()
+    if A is not None:
+        batch_shape = broadcast_shapes(batch_shape, np.shape(A)[:-2])
+    if t is not None:
+        batch_shape = broadcast_shapes(batch_shape, np.shape(t)[:-1])
+    aff = batch_identity(4, batch_shape, dtype=dtype, out=out)
     if A is not None:
-        aff[0:3, 0:3] = np.array(A, dtype=aff.dtype)
+        aff[..., 0:3, 0:3] = A
     if t is not None:
-        aff[0:3, 3] = np.array(t, dtype=aff.dtype)
+        aff[..., 0:3, 3] = t
     return aff
 
 
-def flip_x(x=0):
+def flip_x(x=0, *, dtype=np.float64, out=None):
     """Flip horizontally. x is the centre of reflection."""
-    return affine(A=[[-1, 0, 0],
-                     [ 0, 1, 0],
-                     [ 0, 0, 1]],
-                  t=[2 * x, 0, 0])
+    return from_elements([[-1, 0, 0, 2 * x],
+                          [ 0, 1, 0,     0],
+                          [ 0, 0, 1,     0],
+                          [ 0, 0, 0,     1]], dtype=dtype, out=out)
 
 
-def translate(tx, ty, tz):
+def translate(tx, ty, tz, *, dtype=np.float64, out=None):
     """Translate."""
-    return affine(t=[tx, ty, tz])
+    return from_elements([[1, 0, 0, tx],
+                          [0, 1, 0, ty],
+                          [0, 0, 1, tz],
+                          [0, 0, 0,  1]], dtype=dtype, out=out)
 
 
-def rotate_quaternion(qr, qi, qj, qk):
+def rotate_quaternion(qr, qi, qj, qk, *, dtype=np.float64, out=None):
     """Convert a quaternion into a rotation matrix."""
-    return affine(A=[
-        [1 - 2 * (qj**2 + qk**2),   2 * (qi * qj - qk * qr),    2 * (qi * qk + qj * qr)],
-        [2 * (qi * qj + qk * qr),   1 - 2 * (qi**2 + qk**2),    2 * (qj * qk - qi * qr)],
-        [2 * (qi * qk - qj * qr),   2 * (qj * qk + qi * qr),    1 - 2 * (qi**2 + qj**2)],
-    ])
+    return from_elements([
+        [1 - 2 * (qj**2 + qk**2),   2 * (qi * qj - qk * qr),    2 * (qi * qk + qj * qr),    0],
+        [2 * (qi * qj + qk * qr),   1 - 2 * (qi**2 + qk**2),    2 * (qj * qk - qi * qr),    0],
+        [2 * (qi * qk - qj * qr),   2 * (qj * qk + qi * qr),    1 - 2 * (qi**2 + qj**2),    0],
+        [0,                         0,                          0,                          1],
+    ], dtype=dtype, out=out)
 
 
-def rotate_axis_angle(ux, uy, uz, theta):
+def rotate_axis_angle(ux, uy, uz, theta, *, dtype=np.float64, out=None):
     """Rotate around an arbitrary axis. ux, uy, and uz must be components of a unit vector."""
     s = np.sin(theta / 2)
-    return rotate_quaternion(np.cos(theta / 2), s * ux, s * uy, s * uz)
+    return rotate_quaternion(np.cos(theta / 2), s * ux, s * uy, s * uz, dtype=dtype, out=out)
 
 
-def scale(sx, sy=None, sz=None):
+def scale(sx, sy=None, sz=None, *, dtype=np.float64, out=None):
     """Scale."""
     if sy is None: sy = sx
     if sz is None: sz = sy
-    return affine(A=[[sx,  0,  0],
-                     [ 0, sy,  0],
-                     [ 0,  0, sz]])
+    return from_elements([[sx,  0,  0, 0],
+                          [ 0, sy,  0, 0],
+                          [ 0,  0, sz, 0],
+                          [ 0,  0,  0, 1]], dtype=dtype, out=out)
 
 
-def perspective(fov_y, aspect, near, far):
+def perspective(fov_y, aspect, near, far, *, dtype=np.float64, out=None):
     c = 1 / np.tan(fov_y / 2)
-    return np.asarray([
+    return from_elements([
         [c / aspect, 0, 0, 0],
         [0, -c, 0, 0],
         [0, 0, -(far + near) / (near - far), 2 * near * far / (near - far)],
         [0, 0, 1, 0],
-    ])
+    ], dtype=dtype, out=out)
 
 
-def perspective_from_intrinsics(fx, fy, cx, cy, near, far):
+def perspective_from_intrinsics(fx, fy, cx, cy, near, far, *, dtype=np.float64, out=None):
     """Calculate an OpenGL perspective matrix from camera intrinsics.
 
     Note that the intrinsic parameters are expected to be normalised already. That is:
@@ -70,51 +88,108 @@ def perspective_from_intrinsics(fx, fy, cx, cy, near, far):
 
     Reference: https://blog.noctua-software.com/opencv-opengl-projection-matrix.html
     """
-    return np.asarray([
+    return from_elements([
         [2.0 * fx, 0, -(1.0 - 2.0 * cx), 0],
         [0, -2.0 * fy, 1.0 - 2.0 * cy, 0],
         [0, 0, -(far + near) / (near - far), 2 * near * far / (near - far)],
         [0, 0, 1, 0],
-    ])
+    ], dtype=dtype, out=out)
 
 
-def orthographic(left, right, bottom, top, far=-1, near=1):
-    return np.asarray([
+def orthographic(left, right, bottom, top, far=-1, near=1, *, dtype=np.float64, out=None):
+    return from_elements([
         [2 / (right - left), 0, 0, -(right + left) / (right - left)],
         [0, 2 / (top - bottom), 0, -(top + bottom) / (top - bottom)],
         [0, 0, -2 / (far - near), -(far + near) / (far - near)],
         [0, 0, 0, 1],
-    ])
+    ], dtype=dtype, out=out)
+
 
+def look_at(eye, target, up, *, dtype=np.float64, out=None):
+    """Create a view matrix for a camera at `eye` looking towards `target`.
 
-def look_at(eye, target, up):
+    The arguments may have shape (..., 3), in which case a stack of matrices is returned.
+    """
+    eye = np.asarray(eye, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    up = np.asarray(up, dtype=np.float64)
     camera_dir = target - eye
-    camera_dir /= np.linalg.norm(camera_dir, 2)
+    camera_dir /= np.linalg.norm(camera_dir, 2, axis=-1, keepdims=True)
     camera_right = np.cross(up, camera_dir)
-    camera_right /= np.linalg.norm(camera_right)
+    camera_right /= np.linalg.norm(camera_right, 2, axis=-1, keepdims=True)
     camera_up = np.cross(camera_dir, camera_right)
-    view = np.eye(4)
-    view[0, :3] = camera_right
-    view[1, :3] = camera_up
-    view[2, :3] = camera_dir
-    view[:3, 3] = np.dot(view[:3, :3], -eye)
+    batch_shape = broadcast_shapes(eye.shape[:-1], camera_right.shape[:-1])
+    view = batch_identity(4, batch_shape, dtype=dtype, out=out)
+    for i, axis in enumerate([camera_right, camera_up, camera_dir]):
+        view[..., i, :3] = axis
+        view[..., i, 3] = -np.sum(axis * eye, axis=-1)
     return view
 
 
-def concatenate(matrices):
-    if len(matrices) == 1:
-        return matrices[0]
-    else:
-        return concatenate(matrices[1:]) @ matrices[0]
+def concatenate(matrices, out=None):
+    """Combine a chain of transformations, with the first matrix being applied first.
+
+    `matrices` may also be an array of shape (..., K, 4, 4), in which case each chain of K
+    matrices is combined.
+    """
+    return _transform.chain_product(matrices, out=out)
+
+
+def transform_points(matrix, points, out=None):
+    """Transform points of shape (..., 3), including the homogeneous divide."""
+    return _transform.transform_points(matrix, points, out=out)
+
+
+def transform_vectors(matrix, vectors, out=None):
+    """Transform direction vectors of shape (..., 3), ignoring translation."""
+    return _transform.transform_vectors(matrix, vectors, out=out)
+
+
+def project_points(matrix, points, viewport, out=None):
+    """Project points of shape (..., 3) into window coordinates, like gluProject.
+
+    `matrix` is usually the product of projection and view matrices, and `viewport` is
+    (x, y, width, height). The z coordinates of the result are depths in the range [0, 1].
+    """
+    x, y, width, height = viewport
+    result = _transform.transform_points(matrix, points, out=out)
+    result += 1
+    result *= [0.5 * width, 0.5 * height, 0.5]
+    result[..., 0] += x
+    result[..., 1] += y
+    return result
+
+
+def invert_rigid(matrix, out=None):
+    """Invert a rigid transformation (rotation and translation only).
+
+    This is much cheaper than a general inverse. `matrix` may be a stack of shape (..., 4, 4).
+    """
+    return _transform.invert_rigid(matrix, out=out)
+
+
+def invert_affine(matrix, out=None):
+    """Invert an affine transformation.
+
+    `matrix` may be a stack of shape (..., 4, 4).
+    """
+    return _transform.invert_affine(matrix, out=out)
+
+
+def normal_matrix(matrix, out=None):
+    """Calculate the matrix for transforming normals, which is the inverse-transpose of the
+    upper-left 3x3 part of `matrix`.
+
+    `matrix` may be a stack of shape (..., 4, 4).
+    """
+    return _transform.normal_matrix(matrix, out=out)
 
 
-def is_similarity(matrix, eps=1e-12):
+def is_similarity(matrix, eps=None):
     """Check whether the matrix represents a similarity transformation.
 
-    Under a similarity transformation, relative lengths and angles remain unchanged.
+    Under a similarity transformation, relative lengths and angles remain unchanged. When given a
+    stack of matrices, a boolean array is returned. `eps` is a relative tolerance, which defaults
+    to one suited to the matrix's data type.
     """
-    A = matrix[:-1, :-1]
-    v = matrix[-1]
-    _, s, _ = np.linalg.svd(A)
-    return np.max(s) - np.min(s) < eps \
-           and (np.abs(v - np.asarray([0, 0, 0, 1], v.dtype)) < eps).all()
+    return _transform.is_similarity(matrix, eps=eps)
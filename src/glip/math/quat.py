@@ -0,0 +1,132 @@
+"""Operations on quaternions stored in arrays of shape (..., 4).
+
+Quaternions are stored with the real part first, i.e. as (w, x, y, z), matching the argument order
+of `mat4.rotate_quaternion`. All functions broadcast over leading dimensions.
+"""
+
+import numpy as np
+
+from glip.math import mat4
+
+
+def identity(batch_shape=(), dtype=np.float64):
+    q = np.zeros(tuple(batch_shape) + (4,), dtype=dtype)
+    q[..., 0] = 1
+    return q
+
+
+def multiply(a, b, out=None):
+    """Calculate the Hamilton product a * b, which represents rotating by b and then by a."""
+    a = np.asarray(a)
+    b = np.asarray(b)
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    if out is None:
+        out = np.empty(np.broadcast(a, b).shape, dtype=np.result_type(a, b, np.float32))
+    out[..., 0] = aw * bw - ax * bx - ay * by - az * bz
+    out[..., 1] = aw * bx + ax * bw + ay * bz - az * by
+    out[..., 2] = aw * by - ax * bz + ay * bw + az * bx
+    out[..., 3] = aw * bz + ax * by - ay * bx + az * bw
+    return out
+
+
+def conjugate(q):
+    q = np.asarray(q)
+    q = np.array(q, dtype=np.result_type(q.dtype, np.float32))
+    q[..., 1:] *= -1
+    return q
+
+
+def inverse(q):
+    q = np.asarray(q)
+    return conjugate(q) / np.sum(q * q, axis=-1, keepdims=True)
+
+
+def normalise(q, out=None):
+    q = np.asarray(q)
+    return np.divide(q, np.linalg.norm(q, axis=-1, keepdims=True), out=out)
+
+
+def nlerp(a, b, t):
+    """Normalised linear interpolation between unit quaternions, taking the shortest path."""
+    a = np.asarray(a)
+    b = np.asarray(b)
+    t = np.asarray(t)[..., None]
+    b = np.where(np.sum(a * b, axis=-1, keepdims=True) < 0, -b, b)
+    return normalise(a + t * (b - a))
+
+
+def slerp(a, b, t, eps=1e-6):
+    """Spherical linear interpolation between unit quaternions, taking the shortest path."""
+    a = np.asarray(a)
+    b = np.asarray(b)
+    t = np.asarray(t)[..., None]
+    dot = np.sum(a * b, axis=-1, keepdims=True)
+    b = np.where(dot < 0, -b, b)
+    dot = np.minimum(np.abs(dot), 1)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    # Fall back to linear interpolation where the quaternions are nearly identical.
+    small = sin_theta < eps
+    safe_sin_theta = np.where(small, 1, sin_theta)
+    wa = np.where(small, 1 - t, np.sin((1 - t) * theta) / safe_sin_theta)
+    wb = np.where(small, t, np.sin(t * theta) / safe_sin_theta)
+    return normalise(wa * a + wb * b)
+
+
+def from_axis_angle(axis, angle):
+    """Create quaternions from unit rotation axes of shape (..., 3) and angles in radians."""
+    axis = np.asarray(axis)
+    half_angle = np.asarray(angle)[..., None] / 2
+    xyz = np.sin(half_angle) * axis
+    w = np.broadcast_to(np.cos(half_angle), xyz.shape[:-1] + (1,))
+    return np.concatenate([w, xyz], axis=-1)
+
+
+def to_axis_angle(q):
+    """Convert unit quaternions into unit rotation axes and angles in radians."""
+    q = np.asarray(q)
+    v = q[..., 1:]
+    norm = np.linalg.norm(v, axis=-1)
+    angle = 2 * np.arctan2(norm, q[..., 0])
+    # The axis is arbitrary for zero rotations, so use the x axis.
+    axis = np.where(norm[..., None] > 0, v / np.where(norm > 0, norm, 1)[..., None], [1, 0, 0])
+    return axis, angle
+
+
+def to_matrix(q, *, dtype=np.float64, out=None):
+    """Convert unit quaternions into 4x4 rotation matrices of shape (..., 4, 4)."""
+    return mat4.rotate_quaternion(*np.moveaxis(np.asarray(q), -1, 0), dtype=dtype, out=out)
+
+
+def from_matrix(matrix):
+    """Convert rotation matrices of shape (..., 3, 3) or (..., 4, 4) into unit quaternions."""
+    m = np.asarray(matrix)[..., :3, :3]
+    # Each element of P is equal to 4 * q_i * q_j.
+    P = np.empty(m.shape[:-2] + (4, 4), dtype=np.result_type(m, np.float32))
+    P[..., 0, 0] = 1 + m[..., 0, 0] + m[..., 1, 1] + m[..., 2, 2]
+    P[..., 1, 1] = 1 + m[..., 0, 0] - m[..., 1, 1] - m[..., 2, 2]
+    P[..., 2, 2] = 1 - m[..., 0, 0] + m[..., 1, 1] - m[..., 2, 2]
+    P[..., 3, 3] = 1 - m[..., 0, 0] - m[..., 1, 1] + m[..., 2, 2]
+    P[..., 0, 1] = P[..., 1, 0] = m[..., 2, 1] - m[..., 1, 2]
+    P[..., 0, 2] = P[..., 2, 0] = m[..., 0, 2] - m[..., 2, 0]
+    P[..., 0, 3] = P[..., 3, 0] = m[..., 1, 0] - m[..., 0, 1]
+    P[..., 1, 2] = P[..., 2, 1] = m[..., 0, 1] + m[..., 1, 0]
+    P[..., 1, 3] = P[..., 3, 1] = m[..., 0, 2] + m[..., 2, 0]
+    P[..., 2, 3] = P[..., 3, 2] = m[..., 1, 2] + m[..., 2, 1]
+    # For numerical stability, use the row corresponding to the largest component.
+    k = np.argmax(np.einsum('...ii->...i', P), axis=-1)
+    row = np.take_along_axis(P, k[..., None, None], axis=-2)[..., 0, :]
+    q = row / (2 * np.sqrt(np.take_along_axis(row, k[..., None], axis=-1)))
+    # Use the canonical form with a non-negative real part.
+    return np.where(q[..., :1] < 0, -q, q)
+
+
+def rotate_vectors(q, vectors):
+    """Rotate vectors of shape (..., 3) by unit quaternions."""
+    q = np.asarray(q)
+    vectors = np.asarray(vectors)
+    w = q[..., :1]
+    u = q[..., 1:]
+    uv = np.cross(u, vectors)
+    return vectors + 2 * (w * uv + np.cross(u, uv))
@@ -0,0 +1,247 @@
+"""A binary container format for meshes which are ready to upload.
+
+A mesh cache file consists of:
+
+* an 8 byte magic string (`GLIPMESH`), a uint32 format version and a uint32 header length,
+* a JSON header describing the data blocks and the vertex attribute layout,
+* raw vertex and index blocks, each starting at a multiple of the block alignment.
+
+Loading a file only parses the small header. Blocks are memory-mapped and passed straight to
+`glBufferData`, so vertex data is uploaded from the mapped pages without intermediate copies.
+"""
+
+import json
+import os
+import struct
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.objects import EBO, VAO, VBO, VertexAttrib, VertexAttribBinding, narrow_indices
+from glip.mesh import loaders
+
+MAGIC = b'GLIPMESH'
+VERSION = 1
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _round_up(value, multiple):
+    return (value + multiple - 1) // multiple * multiple
+
+
+class CachedAttrib(NamedTuple):
+    """A vertex attribute which reads from one of the vertex blocks of a mesh cache file."""
+    index: int
+    block: int
+    size: int
+    dtype: np.dtype
+    normalised: bool
+    stride: int
+    offset: int
+    divisor: int = 0
+    integer: bool = False
+    packed: bool = False
+
+    def to_json(self):
+        return dict(self._asdict(), dtype=np.dtype(self.dtype).str)
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(**dict(value, dtype=np.dtype(value['dtype'])))
+
+    @classmethod
+    def from_attrib(cls, attrib: VertexAttrib, block: int, stride: int, offset: int = 0,
+                    divisor: int = 0) -> 'CachedAttrib':
+        return cls(attrib.index, block, attrib.size, np.dtype(attrib.dtype), attrib.normalised,
+                   stride, offset, divisor, attrib.integer, attrib.packed)
+
+    @classmethod
+    def from_binding(cls, binding: VertexAttribBinding, block: int) -> 'CachedAttrib':
+        return cls(binding.index, block, binding.size, binding.dtype, binding.normalised,
+                   binding.stride, binding.offset, binding.divisor, binding.integer,
+                   binding.packed)
+
+    def to_binding(self, vbo: VBO) -> VertexAttribBinding:
+        return VertexAttribBinding(self.index, vbo, self.size, np.dtype(self.dtype),
+                                   self.normalised, self.stride, self.offset, self.divisor,
+                                   self.integer, self.packed)
+
+
+def write_mesh_cache(path, vertex_blocks: Sequence[np.ndarray], attribs: Sequence[CachedAttrib],
+                     indices: Optional[np.ndarray] = None, metadata: Optional[dict] = None,
+                     alignment: int = 4096):
+    """Write vertex data, index data and a vertex layout to a mesh cache file.
+
+    Args:
+        path: Output file path.
+        vertex_blocks: The contents of each vertex buffer.
+        attribs: Vertex attributes, which refer to vertex blocks by index.
+        indices: Optional element indices, which are stored with their current data type.
+        metadata: Optional JSON-serialisable data to store in the header.
+        alignment: Alignment of data blocks within the file in bytes. The default of one page
+            lets blocks be mapped without straddling more pages than necessary.
+    """
+    blocks = [np.ascontiguousarray(block) for block in vertex_blocks]
+    if indices is not None:
+        indices = np.ascontiguousarray(indices)
+        blocks.append(indices)
+    header = {
+        'vertex_blocks': [],
+        'index_block': None,
+        'attribs': [attrib.to_json() for attrib in attribs],
+        'metadata': metadata or {},
+    }
+    # Block offsets depend on the header length, so lay out blocks relative to the data start.
+    relative_offset = 0
+    block_entries = []
+    for block in blocks:
+        relative_offset = _round_up(relative_offset, alignment)
+        block_entries.append({'offset': relative_offset, 'size': block.nbytes})
+        relative_offset += block.nbytes
+    if indices is not None:
+        block_entries[-1]['dtype'] = indices.dtype.str
+        block_entries[-1]['count'] = int(indices.size)
+        header['index_block'] = block_entries.pop()
+    header['vertex_blocks'] = block_entries
+    header['data_offset'] = 0
+    # The data offset is recorded in the header, so grow it until it is consistent.
+    while True:
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_offset = _round_up(_PREAMBLE.size + len(header_bytes), alignment)
+        if header['data_offset'] == data_offset:
+            break
+        header['data_offset'] = data_offset
+
+    # Other processes may be mapping the file, so write a new file and atomically replace it.
+    path = os.fspath(path)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            entries = header['vertex_blocks'] + ([header['index_block']] if indices is not None
+                                                 else [])
+            for block, entry in zip(blocks, entries):
+                f.seek(data_offset + entry['offset'])
+                f.write(memoryview(block).cast('B'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def save_vao(path, vao: VAO, metadata: Optional[dict] = None, alignment: int = 4096):
+    """Read back the buffers used by a VAO and write them to a mesh cache file."""
+    vbos: List[VBO] = []
+    attribs = []
+    for binding in sorted(vao.attrib_bindings.values(), key=lambda b: b.index):
+        if binding.vbo not in vbos:
+            vbos.append(binding.vbo)
+        attribs.append(CachedAttrib.from_binding(binding, vbos.index(binding.vbo)))
+    vertex_blocks = [vbo.read() for vbo in vbos]
+    indices = None
+    if vao.ebo is not None:
+        indices = vao.ebo.read().view(vao.ebo.dtype)
+    write_mesh_cache(path, vertex_blocks, attribs, indices, metadata, alignment)
+
+
+class MeshCacheBuffers(NamedTuple):
+    """GPU buffers created from a mesh cache file."""
+    vbos: List[VBO]
+    ebo: Optional[EBO]
+    attrib_bindings: List[VertexAttribBinding]
+
+    def get_vao(self) -> VAO:
+        """Get a cached VAO for the stored vertex layout."""
+        return VAO.get_cached(self.attrib_bindings, self.ebo)
+
+    def destroy(self):
+        for vbo in self.vbos:
+            vbo.destroy()
+        if self.ebo is not None:
+            self.ebo.destroy()
+
+
+class MeshCache:
+    """A memory-mapped mesh cache file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            preamble = f.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size:
+                raise ValueError('Not a mesh cache file')
+            magic, version, header_length = _PREAMBLE.unpack(preamble)
+            if magic != MAGIC:
+                raise ValueError('Not a mesh cache file')
+            if version != VERSION:
+                raise ValueError(f'Unsupported mesh cache version: {version}')
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        try:
+            self._load_header(header)
+        except (KeyError, TypeError) as error:
+            raise ValueError('Malformed mesh cache header') from error
+
+    def _load_header(self, header: dict):
+        self.metadata: dict = header['metadata']
+        self.attribs = [CachedAttrib.from_json(attrib) for attrib in header['attribs']]
+        self._mmap = np.memmap(self.path, dtype=np.uint8, mode='r')
+        data_offset = header['data_offset']
+        self.vertex_blocks: List[np.ndarray] = [
+            self._map_block(data_offset + entry['offset'], entry['size'])
+            for entry in header['vertex_blocks']
+        ]
+        self.indices: Optional[np.ndarray] = None
+        entry = header['index_block']
+        if entry is not None:
+            dtype = np.dtype(entry['dtype'])
+            block = self._map_block(data_offset + entry['offset'], entry['count'] * dtype.itemsize)
+            self.indices = block.view(dtype)
+
+    def _map_block(self, offset: int, size: int) -> np.ndarray:
+        if size > 0 and offset + size > len(self._mmap):
+            raise ValueError('Truncated mesh cache')
+        return self._mmap[offset:offset + size]
+
+    def upload(self, usage=gl.GL_STATIC_DRAW) -> MeshCacheBuffers:
+        """Create buffers from the mapped blocks."""
+        vbos = [VBO(block, usage=usage) for block in self.vertex_blocks]
+        ebo = EBO(self.indices, usage=usage) if self.indices is not None else None
+        bindings = [attrib.to_binding(vbos[attrib.block]) for attrib in self.attribs]
+        return MeshCacheBuffers(vbos, ebo, bindings)
+
+
+def _source_metadata(source_path):
+    stat = os.stat(source_path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def load_cached_mesh(source_path, cache_path, locations: Dict[str, int],
+                     usage=gl.GL_STATIC_DRAW) -> MeshCacheBuffers:
+    """Upload a mesh from a cache file, converting the source mesh first if necessary.
+
+    The cache is rebuilt if it is missing, unreadable, or was converted from a different version
+    of the source file or with different attribute locations.
+    """
+    expected = dict(_source_metadata(source_path), locations=locations)
+    cache = None
+    if os.path.exists(cache_path):
+        try:
+            cache = MeshCache(cache_path)
+        except ValueError:
+            cache = None
+        if cache is not None and cache.metadata != expected:
+            cache = None
+    if cache is None:
+        vertices, triangles = loaders.load_mesh(source_path)
+        mesh_attribs = [CachedAttrib.from_attrib(attrib, 0, vertices.dtype.itemsize, offset)
+                        for attrib, offset in loaders.field_attribs(vertices.dtype, locations)]
+        write_mesh_cache(cache_path, [vertices], mesh_attribs,
+                         narrow_indices(triangles.ravel()), metadata=expected)
+        cache = MeshCache(cache_path)
+    return cache.upload(usage)
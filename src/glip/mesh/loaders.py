@@ -0,0 +1,415 @@
+"""Streaming mesh loaders.
+
+Meshes are read in fixed-size chunks, so peak host memory does not depend on the size of the
+mesh. Binary PLY payloads are memory-mapped, while OBJ files are parsed a block of lines at a
+time. Vertices are converted to a common interleaved format (see `vertex_dtype`) with `position`,
+and optionally `normal`, `colour` and `uv` fields.
+
+Only triangle meshes are supported for PLY files, while OBJ polygons are triangulated as fans.
+OBJ normals and texture coordinates are ignored, since they are indexed separately from
+positions.
+"""
+
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.objects import EBO, VAO, VBO, VertexAttrib, VertexAttribBinding, narrow_indices
+
+_VERTEX_FIELDS = {
+    'position': ('<f4', 3),
+    'normal': ('<f4', 3),
+    'colour': ('u1', 4),
+    'uv': ('<f4', 2),
+}
+
+
+def vertex_dtype(fields: Sequence[str]) -> np.dtype:
+    """Get the interleaved vertex format for the given fields, e.g. `['position', 'normal']`."""
+    return np.dtype([(name, *_VERTEX_FIELDS[name]) for name in _VERTEX_FIELDS if name in fields])
+
+
+class MeshChunk(NamedTuple):
+    """Part of a mesh, which is either vertices or triangle indices."""
+    # Either 'vertices' or 'triangles'.
+    kind: str
+    # Index of the first vertex or triangle in this chunk.
+    start: int
+    # Vertices with the reader's vertex_dtype, or triangle indices of shape (N, 3).
+    data: np.ndarray
+    # Fraction of the file which has been read, between 0 and 1.
+    progress: float
+
+
+class MeshReader(ABC):
+    """Reads a mesh in chunks.
+
+    The number of vertices and triangles are known before reading any chunks, so that buffers
+    can be allocated up front.
+    """
+
+    n_vertices: int
+    n_triangles: int
+    vertex_dtype: np.dtype
+
+    @abstractmethod
+    def chunks(self, chunk_size: int = 2 ** 20) -> Iterator[MeshChunk]:
+        """Read the mesh, with at most `chunk_size` vertices or triangles per chunk."""
+        pass
+
+
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+# Names of PLY vertex properties making up each vertex field.
+_PLY_VERTEX_PROPERTIES = {
+    'position': [('x', 'y', 'z')],
+    'normal': [('nx', 'ny', 'nz')],
+    'colour': [('red', 'green', 'blue', 'alpha'), ('red', 'green', 'blue')],
+    'uv': [('u', 'v'), ('s', 't'), ('texture_u', 'texture_v')],
+}
+
+
+class PlyElement(NamedTuple):
+    name: str
+    count: int
+    # (name, dtype) pairs for scalar properties, or (name, (count_dtype, item_dtype)) for lists.
+    properties: List[Tuple[str, object]]
+
+
+class PlyReader(MeshReader):
+    """Reads binary PLY files with a `vertex` element and a `face` element of triangles."""
+
+    def __init__(self, path):
+        self.path = path
+        self.elements, self.data_offset, byte_order = self._read_header(path)
+        elements = {element.name: element for element in self.elements}
+        if 'vertex' not in elements:
+            raise ValueError('PLY file has no vertex element')
+        self.n_vertices = elements['vertex'].count
+        self.n_triangles = elements['face'].count if 'face' in elements else 0
+        self._record_dtypes = {}
+        offset = self.data_offset
+        self._offsets = {}
+        for element in self.elements:
+            dtype = self._element_dtype(element, byte_order)
+            self._record_dtypes[element.name] = dtype
+            self._offsets[element.name] = offset
+            offset += dtype.itemsize * element.count
+
+        vertex_properties = {name for name, _ in elements['vertex'].properties}
+        self._vertex_properties = {}
+        for field, candidates in _PLY_VERTEX_PROPERTIES.items():
+            for names in candidates:
+                if vertex_properties.issuperset(names):
+                    self._vertex_properties[field] = names
+                    break
+        if 'position' not in self._vertex_properties:
+            raise ValueError('PLY vertices must have x, y and z properties')
+        if 'face' in elements:
+            list_names = [name for name, prop_type in elements['face'].properties
+                          if isinstance(prop_type, tuple)]
+            if len(list_names) != 1:
+                raise ValueError('PLY faces must have exactly one list property')
+            self._face_list_name = list_names[0]
+        self.vertex_dtype = vertex_dtype(self._vertex_properties)
+
+    @staticmethod
+    def _read_header(path):
+        elements = []
+        byte_order = None
+        with open(path, 'rb') as f:
+            if f.readline().strip() != b'ply':
+                raise ValueError('Not a PLY file')
+            while True:
+                line = f.readline()
+                if not line:
+                    raise ValueError('Unexpected end of PLY header')
+                tokens = line.decode('ascii').split()
+                if not tokens or tokens[0] in ('comment', 'obj_info'):
+                    continue
+                if tokens[0] == 'end_header':
+                    break
+                if tokens[0] == 'format':
+                    byte_order = {'binary_little_endian': '<', 'binary_big_endian': '>'}.get(
+                        tokens[1])
+                    if byte_order is None:
+                        raise ValueError(f'Unsupported PLY format: {tokens[1]}')
+                elif tokens[0] == 'element':
+                    elements.append(PlyElement(tokens[1], int(tokens[2]), []))
+                elif tokens[0] == 'property':
+                    if tokens[1] == 'list':
+                        prop_type = (_PLY_TYPES[tokens[2]], _PLY_TYPES[tokens[3]])
+                    else:
+                        prop_type = _PLY_TYPES[tokens[1]]
+                    elements[-1].properties.append((tokens[-1], prop_type))
+            data_offset = f.tell()
+        if byte_order is None:
+            raise ValueError('PLY header has no format line')
+        return elements, data_offset, byte_order
+
+    @staticmethod
+    def _element_dtype(element, byte_order):
+        fields = []
+        for name, prop_type in element.properties:
+            if isinstance(prop_type, tuple):
+                if element.name != 'face':
+                    raise ValueError(f'Unsupported list property in element {element.name!r}')
+                # Lists can only be memory-mapped if they all have the same length.
+                count_type, item_type = prop_type
+                fields.append((f'{name}_count', byte_order + count_type))
+                fields.append((name, byte_order + item_type, 3))
+            else:
+                fields.append((name, byte_order + prop_type))
+        return np.dtype(fields)
+
+    def _memmap(self, name):
+        element = next(element for element in self.elements if element.name == name)
+        if element.count == 0:
+            return np.empty(0, dtype=self._record_dtypes[name])
+        return np.memmap(self.path, dtype=self._record_dtypes[name], mode='r',
+                         offset=self._offsets[name], shape=(element.count,))
+
+    def _convert_vertices(self, records):
+        vertices = np.empty(len(records), dtype=self.vertex_dtype)
+        for field, names in self._vertex_properties.items():
+            dest = vertices[field]
+            for i, name in enumerate(names):
+                values = records[name]
+                if field == 'colour' and values.dtype.kind == 'f':
+                    values = np.clip(np.rint(values * 255), 0, 255)
+                dest[:, i] = values
+            if field == 'colour' and len(names) == 3:
+                dest[:, 3] = 255
+        return vertices
+
+    def chunks(self, chunk_size: int = 2 ** 20) -> Iterator[MeshChunk]:
+        total = self.n_vertices + self.n_triangles
+        vertex_records = self._memmap('vertex')
+        for start in range(0, self.n_vertices, chunk_size):
+            vertices = self._convert_vertices(vertex_records[start:start + chunk_size])
+            yield MeshChunk('vertices', start, vertices, (start + len(vertices)) / total)
+        del vertex_records
+        if self.n_triangles == 0:
+            return
+        face_records = self._memmap('face')
+        list_name = self._face_list_name
+        for start in range(0, self.n_triangles, chunk_size):
+            records = face_records[start:start + chunk_size]
+            if np.any(records[f'{list_name}_count'] != 3):
+                raise ValueError('Only triangle faces are supported in PLY files')
+            triangles = np.array(records[list_name], dtype=np.int64)
+            yield MeshChunk('triangles', start, triangles,
+                            (self.n_vertices + start + len(triangles)) / total)
+
+
+_OBJ_VERTEX_LINE = re.compile(rb'^v[ \t]+(.*?)[ \t\r]*$', re.MULTILINE)
+_OBJ_FACE_LINE = re.compile(rb'^f[ \t]+(.*?)[ \t\r]*$', re.MULTILINE)
+
+
+def _read_lines_in_blocks(path, block_size) -> Iterator[Tuple[bytes, int]]:
+    """Read a text file in blocks of whole lines, yielding each block and the bytes read so far."""
+    with open(path, 'rb') as f:
+        remainder = b''
+        position = 0
+        while True:
+            data = f.read(block_size)
+            position += len(data)
+            if not data:
+                if remainder:
+                    yield remainder, position
+                return
+            data = remainder + data
+            end = data.rfind(b'\n') + 1
+            remainder = data[end:]
+            if end > 0:
+                yield data[:end], position
+
+
+class ObjReader(MeshReader):
+    """Reads vertex positions (and colours, if present) and faces from OBJ files.
+
+    The file is read twice: once to count vertices and triangles, and once to parse them.
+    """
+
+    def __init__(self, path, block_size: int = 2 ** 24):
+        self.path = path
+        self.block_size = block_size
+        self._file_size = os.path.getsize(path)
+        n_vertices = n_triangles = 0
+        n_vertex_values = None
+        for block, _ in _read_lines_in_blocks(path, block_size):
+            vertex_lines = _OBJ_VERTEX_LINE.findall(block)
+            if n_vertex_values is None and vertex_lines:
+                n_vertex_values = len(vertex_lines[0].split())
+            n_vertices += len(vertex_lines)
+            for face in _OBJ_FACE_LINE.findall(block):
+                n_triangles += max(len(face.split()) - 2, 0)
+        self.n_vertices = n_vertices
+        self.n_triangles = n_triangles
+        # Vertex colours are a common extension, written as "v x y z r g b".
+        self._has_colours = n_vertex_values == 6
+        self.vertex_dtype = vertex_dtype(['position', 'colour'] if self._has_colours
+                                         else ['position'])
+
+    def _parse_vertices(self, lines):
+        values = np.fromstring(b' '.join(lines), dtype=np.float64, sep=' ')
+        n_values = 6 if self._has_colours else 3
+        if values.size != len(lines) * n_values:
+            # Some lines have extra (or missing) values, so fall back to parsing line by line.
+            values = np.asarray([[float(x) for x in line.split()[:n_values]] for line in lines])
+        values = values.reshape(-1, n_values)
+        vertices = np.empty(len(lines), dtype=self.vertex_dtype)
+        vertices['position'] = values[:, :3]
+        if self._has_colours:
+            vertices['colour'][:, :3] = np.clip(np.rint(values[:, 3:] * 255), 0, 255)
+            vertices['colour'][:, 3] = 255
+        return vertices
+
+    def chunks(self, chunk_size: int = 2 ** 20) -> Iterator[MeshChunk]:
+        vertex_lines = []
+        triangles = []
+        n_vertices = 0
+        n_triangles = 0
+
+        def progress(position):
+            return min(position / max(self._file_size, 1), 1.0)
+
+        for block, position in _read_lines_in_blocks(self.path, self.block_size):
+            for line in block.splitlines():
+                if line.startswith(b'v ') or line.startswith(b'v\t'):
+                    vertex_lines.append(line[2:])
+                elif line.startswith(b'f ') or line.startswith(b'f\t'):
+                    # Relative indices are counted back from the most recently defined vertex.
+                    n_defined = n_vertices + len(vertex_lines)
+                    face = [int(token.split(b'/')[0]) for token in line[2:].split()]
+                    face = [index - 1 if index > 0 else n_defined + index for index in face]
+                    for i in range(1, len(face) - 1):
+                        triangles.append((face[0], face[i], face[i + 1]))
+                if len(vertex_lines) >= chunk_size:
+                    yield MeshChunk('vertices', n_vertices, self._parse_vertices(vertex_lines),
+                                    progress(position))
+                    n_vertices += len(vertex_lines)
+                    vertex_lines = []
+                if len(triangles) >= chunk_size:
+                    yield MeshChunk('triangles', n_triangles,
+                                    np.asarray(triangles, dtype=np.int64), progress(position))
+                    n_triangles += len(triangles)
+                    triangles = []
+        if vertex_lines:
+            yield MeshChunk('vertices', n_vertices, self._parse_vertices(vertex_lines), 1.0)
+        if triangles:
+            yield MeshChunk('triangles', n_triangles, np.asarray(triangles, dtype=np.int64), 1.0)
+
+
+def open_mesh(path) -> MeshReader:
+    """Open a mesh file for reading, choosing the reader based on the file extension."""
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension == '.ply':
+        return PlyReader(path)
+    if extension == '.obj':
+        return ObjReader(path)
+    raise ValueError(f'Unsupported mesh file extension: {extension}')
+
+
+def load_mesh(path, chunk_size: int = 2 ** 20) -> Tuple[np.ndarray, np.ndarray]:
+    """Read a whole mesh into host memory.
+
+    Returns:
+        `(vertices, triangles)`, where `triangles` has shape (T, 3).
+    """
+    reader = open_mesh(path)
+    vertices = np.empty(reader.n_vertices, dtype=reader.vertex_dtype)
+    triangles = np.empty((reader.n_triangles, 3), dtype=np.int64)
+    for chunk in reader.chunks(chunk_size):
+        dest = vertices if chunk.kind == 'vertices' else triangles
+        dest[chunk.start:chunk.start + len(chunk.data)] = chunk.data
+    return vertices, triangles
+
+
+def field_attribs(dtype: np.dtype, locations: Dict[str, int]) -> List[Tuple[VertexAttrib, int]]:
+    """Get vertex attributes for reading fields of interleaved vertices at the given locations.
+
+    Returns:
+        A list of `(attrib, offset)` pairs. Colours are normalised, so they are read as floats
+        between 0 and 1.
+    """
+    result = []
+    for name, location in locations.items():
+        field_dtype, offset = dtype.fields[name][:2]
+        attrib = VertexAttrib(location, field_dtype.shape[0], field_dtype.base,
+                              normalised=field_dtype.base == np.uint8)
+        result.append((attrib, offset))
+    return result
+
+
+class UploadedMesh(NamedTuple):
+    """A mesh which has been uploaded into a VBO of interleaved vertices and an EBO."""
+    vbo: VBO
+    ebo: EBO
+    n_vertices: int
+    n_triangles: int
+    vertex_dtype: np.dtype
+
+    def attrib_bindings(self, locations: Dict[str, int]) -> List[VertexAttribBinding]:
+        """Describe how to read vertex fields into shader attributes at the given locations."""
+        return [VertexAttribBinding.create(attrib, self.vbo, self.vertex_dtype.itemsize, offset)
+                for attrib, offset in field_attribs(self.vertex_dtype, locations)]
+
+    def get_vao(self, locations: Dict[str, int]) -> VAO:
+        """Get a cached VAO which reads vertex fields into the given attribute locations."""
+        return VAO.get_cached(self.attrib_bindings(locations), self.ebo)
+
+    def destroy(self):
+        self.vbo.destroy()
+        self.ebo.destroy()
+
+
+def upload_mesh(path, chunk_size: int = 2 ** 20,
+                progress: Optional[Callable[[float], None]] = None,
+                usage=gl.GL_STATIC_DRAW) -> UploadedMesh:
+    """Stream a mesh file into newly allocated GPU buffers.
+
+    Buffers are allocated at their final size before reading, and each chunk is written with a
+    sub-range update once it has been parsed. Indices use the smallest type which can address all
+    vertices.
+
+    Args:
+        path: Path to a binary PLY file or an OBJ file.
+        chunk_size: Maximum number of vertices or triangles to hold in host memory at once.
+        progress: Called with the fraction of the file which has been read after each chunk.
+        usage: Usage hint for the buffers.
+    """
+    reader = open_mesh(path)
+    index_dtype = narrow_indices(np.asarray([max(reader.n_vertices - 1, 0)])).dtype
+    vbo = VBO(usage=usage)
+    ebo = EBO(usage=usage, dtype=index_dtype)
+    with vbo.bound():
+        vbo.allocate(reader.n_vertices * reader.vertex_dtype.itemsize)
+    with ebo.bound():
+        ebo.allocate(reader.n_triangles * 3 * index_dtype.itemsize)
+    for chunk in reader.chunks(chunk_size):
+        if chunk.kind == 'vertices':
+            with vbo.bound():
+                vbo.write(chunk.data, chunk.start * reader.vertex_dtype.itemsize)
+        else:
+            if chunk.data.size > 0 and (chunk.data.min() < 0
+                                        or chunk.data.max() >= reader.n_vertices):
+                raise ValueError('Triangle index out of range')
+            with ebo.bound():
+                ebo.write(chunk.data.astype(index_dtype), chunk.start * 3 * index_dtype.itemsize)
+        if progress is not None:
+            progress(chunk.progress)
+    return UploadedMesh(vbo, ebo, reader.n_vertices, reader.n_triangles, reader.vertex_dtype)
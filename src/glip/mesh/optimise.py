@@ -0,0 +1,179 @@
+"""Reordering of indexed triangle meshes for faster rendering.
+
+Triangles are reordered so that vertices are reused while they are still in the GPU's
+post-transform vertex cache, which reduces the number of vertex shader invocations. Vertices are
+then reordered into the order in which they are first referenced, which improves memory locality
+when they are fetched.
+
+Typical usage:
+
+    indices = optimise_vertex_cache(indices, n_vertices)
+    indices, order = optimise_vertex_fetch(indices, n_vertices)
+    positions, normals = positions[order], normals[order]
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+# Scoring parameters from Tom Forsyth, "Linear-Speed Vertex Cache Optimisation".
+_CACHE_DECAY_POWER = 1.5
+_LAST_TRIANGLE_SCORE = 0.75
+_VALENCE_BOOST_SCALE = 2.0
+_VALENCE_BOOST_POWER = 0.5
+
+
+def _check_triangles(indices, n_vertices):
+    triangles = np.asarray(indices).reshape(-1, 3)
+    if triangles.size > 0 and (triangles.min() < 0 or triangles.max() >= n_vertices):
+        raise ValueError('Index out of range')
+    return triangles
+
+
+def _vertex_triangles(triangles, n_vertices):
+    """Build a compressed list of the triangles which use each vertex.
+
+    Returns:
+        `(offsets, adjacent)`, where the triangles using vertex `v` are
+        `adjacent[offsets[v]:offsets[v + 1]]`.
+    """
+    flat = triangles.ravel()
+    adjacent = np.argsort(flat, kind='stable') // 3
+    counts = np.bincount(flat, minlength=n_vertices)
+    offsets = np.zeros(n_vertices + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, adjacent
+
+
+def optimise_vertex_cache(indices: np.ndarray, n_vertices: int, cache_size: int = 32
+                          ) -> np.ndarray:
+    """Reorder triangles for post-transform vertex cache efficiency.
+
+    This is a greedy algorithm which repeatedly emits the triangle with the highest score, where
+    vertex scores favour vertices which were used recently and vertices with few remaining
+    triangles. Only the scores of triangles near the simulated cache are updated after each step,
+    so the running time is linear in the number of triangles.
+
+    Args:
+        indices: Triangle list indices of shape (3 * T,) or (T, 3).
+        n_vertices: The number of vertices.
+        cache_size: Size of the simulated LRU cache.
+
+    Returns:
+        The reordered indices, with the same shape and data type as `indices`.
+    """
+    indices = np.asarray(indices)
+    triangles = _check_triangles(indices, n_vertices)
+    n_triangles = len(triangles)
+    if n_triangles == 0:
+        return indices.copy()
+    offsets, adjacent = _vertex_triangles(triangles, n_vertices)
+
+    # Precompute score components as lists, since the main loop works on a few elements at a time.
+    positions = np.arange(cache_size)
+    cache_scores = np.where(
+        positions < 3,
+        _LAST_TRIANGLE_SCORE,
+        (1 - (positions - 3) / max(cache_size - 3, 1)) ** _CACHE_DECAY_POWER,
+    ).tolist()
+    remaining = np.diff(offsets)
+    max_valence = int(remaining.max())
+    valence_scores = [0.0] + (_VALENCE_BOOST_SCALE * np.arange(1, max_valence + 1,
+                                                               dtype=np.float64)
+                              ** -_VALENCE_BOOST_POWER).tolist()
+
+    vertex_scores = np.asarray(valence_scores)[remaining]
+    triangle_scores = vertex_scores[triangles].sum(axis=-1)
+    vertex_scores = vertex_scores.tolist()
+    remaining = remaining.tolist()
+    offsets = offsets.tolist()
+    adjacent = adjacent.tolist()
+    triangle_list = triangles.tolist()
+    emitted = [False] * n_triangles
+    cache = []
+    output = np.empty(n_triangles, dtype=np.int64)
+    # Next triangle to check when no triangle in the cache is available.
+    next_unemitted = 0
+
+    best = int(np.argmax(triangle_scores))
+    for i in range(n_triangles):
+        if best < 0:
+            while emitted[next_unemitted]:
+                next_unemitted += 1
+            best = next_unemitted
+        output[i] = best
+        emitted[best] = True
+        triangle = triangle_list[best]
+        for v in triangle:
+            remaining[v] -= 1
+
+        # Move the triangle's vertices to the front of the cache.
+        new_cache = triangle + [v for v in cache if v not in triangle]
+        evicted = new_cache[cache_size:]
+        cache = new_cache[:cache_size]
+
+        for v in evicted:
+            vertex_scores[v] = valence_scores[remaining[v]]
+        for position, v in enumerate(cache):
+            vertex_scores[v] = (cache_scores[position] + valence_scores[remaining[v]]
+                                if remaining[v] > 0 else 0.0)
+
+        # Rescore the triangles around the cache and pick the best one.
+        best = -1
+        best_score = -1.0
+        for v in cache + evicted:
+            for t in adjacent[offsets[v]:offsets[v + 1]]:
+                if emitted[t]:
+                    continue
+                a, b, c = triangle_list[t]
+                score = vertex_scores[a] + vertex_scores[b] + vertex_scores[c]
+                if score > best_score:
+                    best = t
+                    best_score = score
+
+    return triangles[output].reshape(indices.shape).astype(indices.dtype, copy=False)
+
+
+def optimise_vertex_fetch(indices: np.ndarray, n_vertices: int
+                          ) -> Tuple[np.ndarray, np.ndarray]:
+    """Reorder vertices into the order in which they are first referenced.
+
+    Vertices which are not referenced by any index are moved to the end.
+
+    Returns:
+        `(indices, order)`, where `indices` refers to the reordered vertices and `order` maps new
+        vertex positions to old ones, so vertex arrays can be remapped with `vertices[order]`.
+    """
+    indices = np.asarray(indices)
+    flat = indices.ravel()
+    if flat.size > 0 and (flat.min() < 0 or flat.max() >= n_vertices):
+        raise ValueError('Index out of range')
+    first_use = np.full(n_vertices, flat.size, dtype=np.int64)
+    used, first_index = np.unique(flat, return_index=True)
+    first_use[used] = first_index
+    order = np.argsort(first_use, kind='stable')
+    remap = np.empty(n_vertices, dtype=np.int64)
+    remap[order] = np.arange(n_vertices)
+    return remap[indices].astype(indices.dtype, copy=False), order
+
+
+def average_cache_miss_ratio(indices: np.ndarray, cache_size: int = 32) -> float:
+    """Simulate a FIFO vertex cache and return the average number of misses per triangle.
+
+    The result is between 0.5 (for large regular grids) and 3 (no vertex reuse).
+    """
+    flat = np.asarray(indices).ravel().tolist()
+    if len(flat) == 0:
+        return 0.0
+    cache = []
+    cached = set()
+    misses = 0
+    for v in flat:
+        if v in cached:
+            continue
+        misses += 1
+        cache.append(v)
+        cached.add(v)
+        if len(cache) > cache_size:
+            cached.discard(cache.pop(0))
+    return misses / (len(flat) // 3)
@@ -0,0 +1,139 @@
+from typing import Optional
+
+import numpy as np
+
+from glip.math import mat4
+
+
+class SceneGraph:
+    """A hierarchy of transforms stored in contiguous arrays.
+
+    Each node has a local transform relative to its parent. World transforms are only recalculated
+    for nodes which have been marked dirty and their descendants, one tree level at a time with
+    batched matrix products. Nodes must be added after their parents, which keeps node indices in
+    topological order.
+    """
+
+    def __init__(self, capacity: int = 1024, dtype=np.float32):
+        self.dtype = dtype
+        self._size = 0
+        self._local = np.empty((capacity, 4, 4), dtype=dtype)
+        self._world = np.empty((capacity, 4, 4), dtype=dtype)
+        self._parents = np.empty(capacity, dtype=np.int64)
+        self._depths = np.empty(capacity, dtype=np.int64)
+        self._dirty = np.zeros(capacity, dtype=bool)
+        # Nodes grouped by depth, which is recalculated when nodes are added.
+        self._levels = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._parents)
+
+    @property
+    def parents(self) -> np.ndarray:
+        """Parent index of each node, or -1 for root nodes."""
+        return self._parents[:self._size]
+
+    @property
+    def local_matrices(self) -> np.ndarray:
+        """Local transforms of shape (N, 4, 4).
+
+        Nodes must be marked dirty after their local transforms are modified in place.
+        """
+        return self._local[:self._size]
+
+    @property
+    def world_matrices(self) -> np.ndarray:
+        """World transforms of shape (N, 4, 4), as of the last call to `update`.
+
+        The array is contiguous, and so can be uploaded directly into an instance buffer.
+        """
+        return self._world[:self._size]
+
+    def _reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for name in ['_local', '_world', '_parents', '_depths', '_dirty']:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add_node(self, parent: int = -1, local: Optional[np.ndarray] = None) -> int:
+        """Add a node and return its index."""
+        return int(self.add_nodes(np.asarray([parent]),
+                                  None if local is None else np.asarray(local)[None])[0])
+
+    def add_nodes(self, parents: np.ndarray, local: Optional[np.ndarray] = None) -> np.ndarray:
+        """Add multiple nodes and return their indices.
+
+        Each parent must either be -1 or refer to a node with a lower index, which may be one of
+        the nodes being added.
+        """
+        parents = np.asarray(parents, dtype=np.int64)
+        start = self._size
+        indices = np.arange(start, start + len(parents))
+        if np.any(parents >= indices):
+            raise ValueError('nodes must be added after their parents')
+        self._reserve(start + len(parents))
+        self._parents[indices] = parents
+        self._local[indices] = mat4.identity(dtype=self.dtype) if local is None else local
+        # Depths are filled in one generation at a time, since parents may be among the new nodes.
+        self._depths[indices] = -1
+        pending = indices
+        while len(pending) > 0:
+            pending_parents = self._parents[pending]
+            parent_depths = np.where(pending_parents < 0, -1, self._depths[pending_parents])
+            ready = (pending_parents < 0) | (parent_depths >= 0)
+            self._depths[pending[ready]] = parent_depths[ready] + 1
+            pending = pending[~ready]
+        self._dirty[indices] = True
+        self._size += len(parents)
+        self._levels = None
+        return indices
+
+    def set_local(self, indices, local: np.ndarray):
+        """Set the local transforms of nodes and mark them dirty."""
+        self._local[:self._size][indices] = local
+        self.mark_dirty(indices)
+
+    def mark_dirty(self, indices):
+        self._dirty[:self._size][indices] = True
+
+    def _get_levels(self):
+        if self._levels is None:
+            depths = self._depths[:self._size]
+            order = np.argsort(depths, kind='stable')
+            bounds = np.cumsum(np.bincount(depths))
+            self._levels = np.split(order, bounds[:-1])
+        return self._levels
+
+    def update(self) -> np.ndarray:
+        """Recalculate world transforms of dirty nodes and their descendants.
+
+        Returns:
+            Indices of the nodes whose world transforms changed.
+        """
+        n = self._size
+        if not self._dirty[:n].any():
+            return np.empty(0, dtype=np.int64)
+        changed = self._dirty[:n].copy()
+        parents = self._parents[:n]
+        for level, nodes in enumerate(self._get_levels()):
+            if level == 0:
+                selected = nodes[changed[nodes]]
+                self._world[selected] = self._local[selected]
+                continue
+            node_parents = parents[nodes]
+            level_changed = changed[nodes] | changed[node_parents]
+            changed[nodes] = level_changed
+            selected = nodes[level_changed]
+            if len(selected) > 0:
+                self._world[selected] = np.matmul(self._world[parents[selected]],
+                                                  self._local[selected])
+        self._dirty[:n] = False
+        return np.flatnonzero(changed)
@@ -0,0 +1,62 @@
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.allocator import BufferAllocator
+
+
+def read_buffer(buffer, offset, size):
+    with buffer.bound():
+        data = gl.glGetBufferSubData(buffer._target, offset, size)
+    return np.frombuffer(bytes(data), dtype=np.uint8)
+
+
+def test_allocate_and_free(window):
+    allocator = BufferAllocator(page_size=256, alignment=16)
+    a = allocator.allocate(100)
+    b = allocator.allocate(100)
+    assert (a.offset, b.offset) == (0, 112)
+    assert a.buffer is b.buffer
+    # Doesn't fit in the first page, so a new page is added.
+    c = allocator.allocate(100)
+    assert c.buffer is not a.buffer
+    assert allocator.capacity == 512
+    assert allocator.used == 300
+    # Freed space is merged with neighbouring free blocks and reused.
+    a.free()
+    b.free()
+    assert allocator._pages[0].free_blocks == [(0, 256)]
+    d = allocator.allocate(200)
+    assert d.buffer is allocator.buffers[0] and d.offset == 0
+    allocator.destroy()
+
+
+def test_alignment_and_element_offset(window):
+    allocator = BufferAllocator(page_size=1024)
+    allocator.allocate(5, alignment=1)
+    vertices = np.arange(36, dtype=np.float32).reshape(3, 3, 4)
+    allocation = allocator.allocate_and_write(vertices)
+    assert allocation.offset == 48
+    assert allocation.element_offset(48) == 1
+    np.testing.assert_array_equal(read_buffer(allocation.buffer, allocation.offset, 144),
+                                  vertices.view(np.uint8).ravel())
+    allocator.destroy()
+
+
+def test_compact(window):
+    allocator = BufferAllocator(page_size=64, alignment=4)
+    allocations = [allocator.allocate_and_write(np.full(12, i, dtype=np.uint8))
+                   for i in range(10)]
+    for allocation in allocations[::2]:
+        allocation.free()
+    old_buffers = allocator.buffers
+    assert allocator.compact()
+    assert len(allocator.buffers) == 1
+    assert all(buffer.is_destroyed() for buffer in old_buffers)
+    for i, allocation in enumerate(allocations):
+        if i % 2 == 0:
+            assert allocation.is_freed
+            continue
+        assert allocation.buffer is allocator.buffers[0]
+        np.testing.assert_array_equal(read_buffer(allocation.buffer, allocation.offset, 12), i)
+    assert not allocator.compact()
+    allocator.destroy()
@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+
+from glip.gl.async_loop import AsyncRenderLoop, read_pixels_async, wait_for_gpu
+from glip.gl.context import Window
+from glip.gl.objects import VBO, Framebuffer
+from glip.gl.render_thread import RenderThread
+
+
+def test_async_render_loop(window):
+    frames = []
+
+    def draw(window):
+        window.clear((len(frames) / 255, 0.0, 0.0, 1.0))
+        frames.append(window.frame_index)
+
+    async def main():
+        loop = AsyncRenderLoop(window, draw, max_fps=1000)
+        task = asyncio.create_task(loop.run())
+        first = await window.next_frame()
+        second = await window.next_frame()
+        assert second == first + 1
+        pixels = await read_pixels_async(Framebuffer.get_default(), 0, 0, 2, 2)
+        assert pixels.shape == (2, 2, 4) and pixels.dtype == np.uint8
+        vbo = VBO(np.arange(4, dtype=np.float32))
+        await wait_for_gpu()
+        vbo.destroy()
+
+        # Frames are only drawn on request when not in continuous mode.
+        loop.continuous = False
+        await asyncio.sleep(0.01)
+        n_frames = len(frames)
+        await asyncio.sleep(0.05)
+        assert len(frames) == n_frames
+        loop.request_redraw()
+        assert await window.next_frame() == n_frames + 1
+        loop.stop()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(main())
+    assert frames == list(range(len(frames)))
+
+
+def test_next_frame_ticked_on_another_thread():
+    renderer = RenderThread(lambda: Window(8, 6, hidden=True), draw=lambda window: None,
+                            max_fps=1000)
+    window = renderer.start()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        first = await asyncio.wait_for(window.next_frame(), 1)
+        second = await asyncio.wait_for(window.next_frame(), 1)
+        assert second > first
+        # The event loop is woken as soon as frames are presented.
+        assert loop.time() - start_time < 0.5
+
+    try:
+        asyncio.run(main())
+    finally:
+        renderer.stop()
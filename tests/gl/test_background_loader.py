@@ -0,0 +1,78 @@
+import threading
+
+import OpenGL.GL as gl
+import numpy as np
+import pytest
+
+from glip.gl.background_loader import BackgroundLoader
+from glip.gl.context import Window
+from glip.gl.objects import EBO, VBO, Framebuffer, Texture2D
+
+
+def test_background_loader(window):
+    loader = BackgroundLoader(window)
+    assert Window.get_active() is window
+    threads = []
+    vertices = np.arange(12, dtype=np.float32)
+    image = np.arange(4 * 8 * 4, dtype=np.uint8).reshape(4, 8, 4)
+    vbo_future = loader.load_buffer(VBO, vertices)
+    ebo_future = loader.load_buffer(EBO, np.arange(6, dtype=np.uint32))
+    texture_future = loader.load_texture(image)
+    thread_future = loader.submit(lambda: threads.append(threading.current_thread()))
+    error_future = loader.submit(lambda: 1 / 0)
+    assert loader.flush(timeout=5)
+    assert all(future.done() for future in [vbo_future, ebo_future, texture_future])
+    assert threads[0] is not threading.current_thread() and thread_future.result() is None
+    with pytest.raises(ZeroDivisionError):
+        error_future.result()
+
+    # Loaded objects can be used by the main window.
+    vbo = vbo_future.result()
+    np.testing.assert_array_equal(vbo.read().view(np.float32), vertices)
+    texture = texture_future.result()
+    assert (texture.width, texture.height, texture.internal_format) == (8, 4, gl.GL_RGBA8)
+    framebuffer = Framebuffer()
+    with framebuffer.bound():
+        framebuffer.attach_texture(gl.GL_COLOR_ATTACHMENT0, texture)
+        np.testing.assert_array_equal(framebuffer.read_pixels(0, 0, 8, 4), image)
+    framebuffer.destroy()
+
+    # Futures are only set by polling on the main thread.
+    future = loader.load_buffer(VBO, vertices)
+    loader._thread.join(0.05)
+    assert not future.done()
+    loader.close()
+    assert future.done()
+    with pytest.raises(RuntimeError):
+        loader.submit(lambda: None)
+    assert Window.get_active() is window
+    for gl_object in [vbo, ebo_future.result(), texture, future.result()]:
+        gl_object.destroy()
+
+
+def test_destroy_during_load(window):
+    loader = BackgroundLoader(window)
+    texture = loader.load_texture(np.zeros((2, 2, 4), dtype=np.uint8))
+    loader.flush(timeout=5)
+    texture = texture.result()
+    bound = threading.Event()
+    destroyed = threading.Event()
+
+    def load():
+        # Leave the texture bound on the loader's window while it is destroyed.
+        texture.bind()
+        bound.set()
+        assert destroyed.wait(5)
+        return VBO(np.arange(4, dtype=np.float32))
+
+    future = loader.submit(load)
+    assert bound.wait(5)
+    texture.destroy()
+    # The loader's window is left to the loader thread, which forgets the texture later.
+    assert loader._window._objects_to_forget == [texture]
+    destroyed.set()
+    bound_future = loader.submit(Texture2D.get_bound)
+    assert loader.flush(timeout=5)
+    assert bound_future.result() is None
+    future.result().destroy()
+    loader.close()
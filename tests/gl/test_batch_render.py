@@ -0,0 +1,121 @@
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.batch_render import BatchRenderer
+from glip.gl.objects import VAO, VBO, PrimitiveType, ShaderProgram, VertexAttrib
+from glip.math import mat4
+
+vertex_shader_source = r"""
+#version 330 core
+in vec3 pos;
+uniform mat4 view_projection;
+
+void main() {
+    gl_Position = view_projection * vec4(pos, 1.0);
+}
+"""
+
+fragment_shader_source = r"""
+#version 330 core
+uniform float brightness;
+out vec4 FragColor;
+
+void main() {
+    FragColor = vec4(brightness, 0.0, 0.0, 1.0);
+}
+"""
+
+
+def test_batch_render(window):
+    program = ShaderProgram(vertex_shader=vertex_shader_source,
+                            fragment_shader=fragment_shader_source)
+    # A quad covering the top half of the view.
+    positions = np.asarray([[-1, 0, 0], [1, 0, 0], [1, 1, 0], [-1, 1, 0]], dtype=np.float32)
+    vbo = VBO(positions)
+    vao = VAO()
+    with vao.bound(), vbo.bound():
+        vao.connect_vertex_attrib_array(VertexAttrib(0, 3, np.float32), vbo, 12)
+    # Views move the quad away from the camera, increasing the depth.
+    view_projections = mat4.translate(np.zeros(7), 0, np.linspace(0, 0.6, 7))
+
+    def draw(view_projection, index):
+        program.bind()
+        program.set_uniform('view_projection', view_projection)
+        program.set_uniform('brightness', index / 10)
+        with vao.bound():
+            vao.draw_arrays(PrimitiveType.TRIANGLE_FAN, 0, 4)
+
+    renderer = BatchRenderer(8, 6, batch_size=3)
+    gl.glEnable(gl.GL_DEPTH_TEST)
+    result = renderer.render(view_projections, draw)
+    gl.glDisable(gl.GL_DEPTH_TEST)
+    assert result.colour.shape == (7, 6, 8, 4)
+    assert result.depth.shape == (7, 6, 8, 1)
+    np.testing.assert_array_equal(result.colour[:, 3:], 0)
+    np.testing.assert_allclose(result.colour[:, :3, :, 0] / 255,
+                               np.broadcast_to(np.arange(7)[:, None, None] / 10, (7, 3, 8)),
+                               atol=1 / 255)
+    np.testing.assert_allclose(result.depth[:, :3, :, 0],
+                               np.broadcast_to((np.linspace(0, 0.6, 7)[:, None, None] + 1) / 2,
+                                               (7, 3, 8)), atol=1e-6)
+    np.testing.assert_array_equal(result.depth[:, 3:], 1)
+
+    batches = list(renderer.iter_batches(view_projections[:4], draw))
+    assert [batch.start for batch in batches] == [0, 3]
+    np.testing.assert_array_equal(batches[1].colour[0], result.colour[3])
+
+    renderer.destroy()
+    vao.destroy()
+    vbo.destroy()
+    program.destroy()
+
+
+def test_batch_render_keeps_views_in_tiles(window, monkeypatch):
+    program = ShaderProgram(vertex_shader=vertex_shader_source,
+                            fragment_shader=fragment_shader_source)
+    # A point on the right edge of the view, which overlaps the next tile.
+    vbo = VBO(np.asarray([[0.99, 0, 0]], dtype=np.float32))
+    vao = VAO()
+    with vao.bound(), vbo.bound():
+        vao.connect_vertex_attrib_array(VertexAttrib(0, 3, np.float32), vbo, 12)
+    view_projections = np.tile(np.eye(4), (3, 1, 1))
+
+    def draw(view_projection, index):
+        # Clears only affect the view's own tile.
+        window.clear((0.0, index / 10, 0.0, 1.0))
+        if index == 0:
+            program.bind()
+            program.set_uniform('view_projection', view_projection)
+            program.set_uniform('brightness', 1.0)
+            with vao.bound():
+                vao.draw_arrays(PrimitiveType.POINTS, 0, 1)
+
+    renderer = BatchRenderer(8, 6, batch_size=3, depth=False)
+    window.set_viewport(1, 2, 3, 4)
+    gl.glClearColor(0.5, 0.5, 0.5, 1.0)
+    gl.glPointSize(8)
+    colour = renderer.render(view_projections, draw).colour
+    gl.glPointSize(1)
+    np.testing.assert_allclose(colour[:, 0, 0, 1] / 255, [0, 0.1, 0.2], atol=1 / 255)
+    assert (colour[0, :, -1, 0] == 255).any()
+    np.testing.assert_array_equal(colour[1:, ..., 0], 0)
+    # The caller's viewport, scissor test and clear colour are restored.
+    np.testing.assert_array_equal(gl.glGetIntegerv(gl.GL_VIEWPORT), [1, 2, 3, 4])
+    assert not gl.glIsEnabled(gl.GL_SCISSOR_TEST)
+    np.testing.assert_allclose(gl.glGetFloatv(gl.GL_COLOR_CLEAR_VALUE), [0.5, 0.5, 0.5, 1.0])
+
+    # Fences are deleted when iteration stops early.
+    deleted = []
+    delete_sync = gl.glDeleteSync
+    monkeypatch.setattr(gl, 'glDeleteSync', lambda sync: (deleted.append(sync),
+                                                          delete_sync(sync)))
+    batches = renderer.iter_batches(np.tile(np.eye(4), (9, 1, 1)), draw)
+    next(batches)
+    batches.close()
+    # The first batch was read back, and the second was still pending.
+    assert len(deleted) == 2
+
+    renderer.destroy()
+    vao.destroy()
+    vbo.destroy()
+    program.destroy()
@@ -0,0 +1,58 @@
+import io
+import threading
+
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.capture import OverflowPolicy, ScreenCapture
+from glip.gl.context import Window
+
+
+class _SlowOutput(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def write(self, data):
+        self.unblocked.wait()
+        return super().write(data)
+
+
+def _draw_frames(window, n_frames):
+    for i in range(n_frames):
+        window.clear((i / 255, 0.0, 1.0, 1.0))
+        window.tick()
+
+
+def test_screen_capture(tmp_path):
+    window = Window(8, 6, hidden=True)
+    path = tmp_path / 'capture.rgba'
+    with ScreenCapture(window, path, policy=OverflowPolicy.BLOCK) as capture:
+        _draw_frames(window, 5)
+    assert capture.stats == (5, 5, 0)
+    frames = np.fromfile(path, dtype=np.uint8).reshape(5, 6, 8, 4)
+    np.testing.assert_array_equal(frames[:, 0, 0, 0], np.arange(5))
+    np.testing.assert_array_equal(frames[:, :, :, 2], 255)
+
+    output = _SlowOutput()
+    capture = ScreenCapture(window, output, max_queued=1)
+    _draw_frames(window, 6)
+    assert capture.stats.captured + capture.stats.dropped == 6
+    assert capture.stats.dropped > 0
+    output.unblocked.set()
+    capture.stop()
+    assert capture.stats.written == capture.stats.captured
+    assert len(output.getvalue()) == capture.stats.written * 8 * 6 * 4
+
+    # Frames are written top row first.
+    output = io.BytesIO()
+    with ScreenCapture(window, output, policy=OverflowPolicy.BLOCK):
+        window.clear((0.0, 0.0, 0.0, 1.0))
+        gl.glEnable(gl.GL_SCISSOR_TEST)
+        gl.glScissor(0, 0, 8, 2)
+        window.clear((1.0, 0.0, 0.0, 1.0))
+        gl.glDisable(gl.GL_SCISSOR_TEST)
+        window.tick()
+    frame = np.frombuffer(output.getvalue(), dtype=np.uint8).reshape(6, 8, 4)
+    np.testing.assert_array_equal(frame[:, 0, 0], [0, 0, 0, 0, 255, 255])
+    window.destroy()
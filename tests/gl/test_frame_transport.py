@@ -0,0 +1,56 @@
+import OpenGL.GL as gl
+import numpy as np
+import pytest
+
+from glip.gl.frame_transport import FramePublisher, FrameReader
+from glip.gl.objects import Framebuffer, Texture2D
+
+
+def test_publish_framebuffer(window):
+    texture = Texture2D()
+    pixels = np.random.randint(0, 256, (4, 5, 4), dtype=np.uint8)
+    with texture.bound():
+        texture.allocate(5, 4)
+        texture.write(pixels)
+    framebuffer = Framebuffer()
+    with FramePublisher(5, 4, n_slots=2) as publisher, FrameReader(publisher.name) as reader:
+        assert reader.latest() is None
+        with framebuffer.bound():
+            framebuffer.attach_texture(gl.GL_COLOR_ATTACHMENT0, texture)
+            assert publisher.publish(0, 0, 5, 4, timestamp=1.5) == 0
+            assert publisher.publish(1, 1, 2, 3) == 1
+        frame = reader.read(0)
+        assert frame.timestamp == 1.5
+        np.testing.assert_array_equal(frame.data, pixels)
+        np.testing.assert_array_equal(frame.image, pixels[::-1])
+        assert not frame.data.flags.writeable
+        latest = reader.latest()
+        assert latest.index == 1 and latest.data.shape == (3, 2, 4)
+        np.testing.assert_array_equal(latest.copy(), pixels[1:4, 1:3])
+
+        # Publishing a third frame reuses the first frame's slot.
+        publisher.publish_array(np.zeros((2, 2, 1), dtype=np.float32))
+        assert not frame.is_valid()
+        with pytest.raises(RuntimeError):
+            frame.copy()
+        with pytest.raises(KeyError):
+            reader.read(0)
+        with pytest.raises(KeyError):
+            reader.read(3)
+        assert reader.wait(2, timeout=1).data.dtype == np.float32
+        with pytest.raises(ValueError):
+            publisher.publish_array(np.zeros((10, 10, 4), dtype=np.uint8))
+        del frame, latest
+    framebuffer.destroy()
+    texture.destroy()
+
+
+def test_publish_default_framebuffer(window):
+    window.set_viewport(0, 0, 8, 6)
+    window.clear((1.0, 0.0, 0.0, 1.0))
+    with FramePublisher(8, 6) as publisher, FrameReader(publisher.name) as reader:
+        publisher.publish()
+        frame = reader.latest()
+        assert frame.data.shape == (6, 8, 4)
+        assert (frame.copy()[..., :2] == [255, 0]).all()
+        del frame
@@ -0,0 +1,72 @@
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.image_passes import ImagePass, PassPipeline
+
+blur_source = r"""
+#version 330 core
+in vec2 uv;
+uniform sampler2D image;
+uniform vec2 texel_size;
+out vec4 colour;
+
+void main() {
+    colour = (texture(image, uv - vec2(texel_size.x, 0.0)) + texture(image, uv)
+              + texture(image, uv + vec2(texel_size.x, 0.0))) / 3.0;
+}
+"""
+
+scale_source = r"""
+#version 330 core
+in vec2 uv;
+uniform sampler2D image;
+uniform float scale;
+out float value;
+
+void main() {
+    value = texture(image, uv).r * scale;
+}
+"""
+
+count_source = r"""
+#version 330 core
+in vec2 uv;
+uniform sampler2D image;
+out uvec4 count;
+
+void main() {
+    count = uvec4(round(texture(image, uv) * 10.0));
+}
+"""
+
+
+def test_pass_pipeline(window):
+    image = np.zeros((3, 5, 4), dtype=np.float32)
+    image[:, 2, 0] = 3.0
+    image[1, :, 1] = 0.5
+    blur = ImagePass(blur_source)
+    scale = ImagePass(scale_source, uniforms={'scale': 2.0}, internal_format=gl.GL_R32F)
+    pipeline = PassPipeline([blur, blur, scale])
+    result = pipeline.run(image)
+    assert result.shape == (3, 5, 1) and result.dtype == np.float32
+    # Two blurs spread the column over 5 pixels with weights (1, 2, 3, 2, 1) / 9.
+    np.testing.assert_allclose(result[:, :, 0], np.tile([2, 4, 6, 4, 2], (3, 1)) / 3, rtol=1e-5)
+
+    # Intermediate textures are reused between runs.
+    output = pipeline.run(image, read_back=False)
+    scale.uniforms['scale'] = 1.0
+    assert pipeline.run(image, read_back=False) is output
+    assert len(pipeline._targets) == 2
+
+    # Passes can run on textures and produce unsigned integers.
+    count = ImagePass(count_source, internal_format=gl.GL_RGBA32UI)
+    counter = PassPipeline([count])
+    counts = counter.run(output)
+    assert counts.dtype == np.uint32
+    np.testing.assert_array_equal(counts[:, :, 0], np.tile([3, 7, 10, 7, 3], (3, 1)))
+    np.testing.assert_array_equal(counter.run(np.full((2, 2), 51, dtype=np.uint8))[..., 0], 2)
+
+    for image_pass in [blur, scale, count]:
+        image_pass.destroy()
+    pipeline.destroy()
+    counter.destroy()
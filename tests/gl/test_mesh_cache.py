@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from glip.gl.objects import EBO, VAO, VBO, VertexAttrib
+from glip.mesh import cache
+
+
+def test_save_and_load_vao(window, tmp_path):
+    positions = np.random.randn(20, 3).astype(np.float32)
+    colours = np.random.randint(0, 256, (20, 4)).astype(np.uint8)
+    indices = np.random.randint(0, 20, 30).astype(np.uint16)
+    position_vbo = VBO(positions)
+    colour_vbo = VBO(colours)
+    ebo = EBO(indices)
+    vao = VAO(ebo)
+    with vao.bound():
+        with position_vbo.bound():
+            vao.connect_vertex_attrib_array(VertexAttrib(0, 3, np.float32), position_vbo, 12)
+        with colour_vbo.bound():
+            vao.connect_vertex_attrib_array(VertexAttrib(1, 4, np.uint8, normalised=True),
+                                            colour_vbo, 4)
+    path = tmp_path / 'mesh.glipmesh'
+    cache.save_vao(path, vao, metadata={'name': 'test'})
+
+    mesh_cache = cache.MeshCache(path)
+    assert mesh_cache.metadata == {'name': 'test'}
+    assert all(isinstance(block.base, np.memmap) or isinstance(block, np.memmap)
+               for block in mesh_cache.vertex_blocks)
+    np.testing.assert_array_equal(mesh_cache.vertex_blocks[0].view(np.float32).reshape(-1, 3),
+                                  positions)
+    np.testing.assert_array_equal(mesh_cache.indices, indices)
+    buffers = mesh_cache.upload()
+    assert buffers.ebo.dtype == np.uint16
+    loaded_vao = buffers.get_vao()
+    assert [b.normalised for b in buffers.attrib_bindings] == [False, True]
+    assert loaded_vao.attrib_bindings[1].vbo is buffers.vbos[1]
+    buffers.destroy()
+    for obj in [vao, position_vbo, colour_vbo, ebo]:
+        obj.destroy()
+
+
+def test_load_cached_mesh(window, tmp_path):
+    source_path = tmp_path / 'mesh.obj'
+    source_path.write_text('v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n')
+    cache_path = tmp_path / 'mesh.glipmesh'
+    buffers = cache.load_cached_mesh(source_path, cache_path, {'position': 0})
+    assert buffers.ebo.dtype == np.uint8 and buffers.ebo.size == 3
+    buffers.destroy()
+    mtime = cache_path.stat().st_mtime_ns
+    buffers = cache.load_cached_mesh(source_path, cache_path, {'position': 0})
+    assert cache_path.stat().st_mtime_ns == mtime
+    buffers.destroy()
+    # Changing the requested layout invalidates the cache.
+    buffers = cache.load_cached_mesh(source_path, cache_path, {'position': 2})
+    assert buffers.attrib_bindings[0].index == 2
+    buffers.destroy()
+
+
+def test_truncated_cache_is_rebuilt(window, tmp_path):
+    source_path = tmp_path / 'mesh.obj'
+    source_path.write_text('v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n')
+    cache_path = tmp_path / 'mesh.glipmesh'
+    cache.load_cached_mesh(source_path, cache_path, {'position': 0}).destroy()
+    # No temporary files are left behind.
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['mesh.glipmesh', 'mesh.obj']
+    data = cache_path.read_bytes()
+    cache_path.write_bytes(data[:-2])
+    with pytest.raises(ValueError, match='Truncated'):
+        cache.MeshCache(cache_path)
+    buffers = cache.load_cached_mesh(source_path, cache_path, {'position': 0})
+    assert buffers.ebo.size == 3
+    buffers.destroy()
+    assert cache_path.read_bytes() == data
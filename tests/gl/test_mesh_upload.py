@@ -0,0 +1,27 @@
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.mesh import loaders
+
+
+def test_upload_mesh(window, tmp_path):
+    path = tmp_path / 'mesh.obj'
+    positions = np.random.randn(300, 3)
+    triangles = np.random.randint(0, 300, (200, 3))
+    lines = [f'v {x} {y} {z}' for x, y, z in positions]
+    lines += [f'f {a + 1} {b + 1} {c + 1}' for a, b, c in triangles]
+    path.write_text('\n'.join(lines))
+    progress = []
+    mesh = loaders.upload_mesh(path, chunk_size=64, progress=progress.append)
+    assert progress == sorted(progress) and progress[-1] == 1.0
+    assert mesh.ebo.dtype == np.uint16
+    with mesh.ebo.bound():
+        indices = gl.glGetBufferSubData(gl.GL_ELEMENT_ARRAY_BUFFER, 0, mesh.ebo.size)
+    np.testing.assert_array_equal(np.frombuffer(bytes(indices), np.uint16), triangles.ravel())
+    with mesh.vbo.bound():
+        data = gl.glGetBufferSubData(gl.GL_ARRAY_BUFFER, 0, mesh.vbo.size)
+    vertices = np.frombuffer(bytes(data), mesh.vertex_dtype)
+    np.testing.assert_allclose(vertices['position'], positions, rtol=1e-6)
+    vao = mesh.get_vao({'position': 0})
+    assert vao.ebo is mesh.ebo
+    mesh.destroy()
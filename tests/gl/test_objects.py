@@ -1,5 +1,6 @@
-from glip.gl.objects import VAO, EBO
+from glip.gl.objects import VAO, EBO, VBO, VertexAttrib, VertexAttribBinding, narrow_indices
 import numpy as np
+import pytest
 
 
 def test_ebo(window):
@@ -22,3 +23,39 @@ def test_ebo(window):
     vao2.destroy()
     ebo1.destroy()
     ebo2.destroy()
+
+
+def test_ebo_narrow(window):
+    ebo = EBO(np.arange(300, dtype=np.uint32), narrow=True)
+    assert ebo.dtype == np.uint16
+    ebo.destroy()
+    ebo = EBO(np.arange(255, dtype=np.int64), narrow=True)
+    assert ebo.dtype == np.uint8
+    ebo.destroy()
+
+    with pytest.raises(ValueError, match='negative'):
+        narrow_indices(np.asarray([3, -1]))
+    with pytest.raises(ValueError, match='integers'):
+        narrow_indices(np.asarray([0.0, 1.5]))
+    with pytest.raises(ValueError, match='primitive restart'):
+        narrow_indices(np.asarray([0, 2 ** 32 - 1], dtype=np.uint32))
+
+
+def test_vao_cache(window):
+    attrib = VertexAttrib(0, size=3, dtype=np.float32)
+    vbo1 = VBO(np.zeros((3, 3), dtype=np.float32))
+    vbo2 = VBO(np.zeros((3, 3), dtype=np.float32))
+    ebo = EBO(np.arange(3, dtype=np.uint32))
+    bindings1 = [VertexAttribBinding.create(attrib, vbo1, 12)]
+    bindings2 = [VertexAttribBinding.create(attrib, vbo2, 12)]
+    vao1 = VAO.get_cached(bindings1, ebo)
+    assert VAO.get_cached(bindings1, ebo) is vao1
+    vao2 = VAO.get_cached(bindings2, ebo)
+    assert vao2 is not vao1
+    assert vao1.attrib_bindings[0].vbo is vbo1
+    assert vao1.diff(vao2) == [f'attrib 0: {bindings1[0]} != {bindings2[0]}']
+    vbo1.destroy()
+    assert VAO.get_cached(bindings2, ebo) is vao2
+    assert vao1.is_destroyed()
+    vbo2.destroy()
+    ebo.destroy()
@@ -0,0 +1,82 @@
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl import packing
+from glip.gl.objects import VAO, VBO, VertexAttrib
+
+
+def test_quantise_round_trip():
+    positions = np.random.uniform(-3, 5, (100, 3)).astype(np.float32)
+    packed = packing.pack_positions(positions)
+    assert packed.data.dtype == np.int16
+    assert packed.stride == 6
+    np.testing.assert_allclose(packed.unpack(), positions, atol=8 / 32767)
+
+    colours = np.random.uniform(0, 1, (100, 4))
+    packed = packing.pack_colours(colours)
+    np.testing.assert_array_equal(packed.scale, 1)
+    np.testing.assert_allclose(packed.unpack(), colours, atol=0.5 / 255)
+
+
+def test_pack_int_2_10_10_10():
+    normals = np.random.randn(100, 3)
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+    packed = packing.pack_normals(normals, gl_version=(4, 2))
+    assert packed.data.dtype == np.int32 and packed.stride == 4
+    unpacked = packed.unpack()
+    np.testing.assert_allclose(unpacked[:, :3], normals, atol=0.5 / 511)
+    np.testing.assert_array_equal(unpacked[:, 3], 0)
+    assert packing.pack_int_2_10_10_10([[-1, 1, 0, -1]], gl_version=(4, 2)).view(
+        np.uint32)[0] == 0x201 | (0x1ff << 10) | (0b11 << 30)
+
+
+def test_pack_signed_for_gl_3_3():
+    def decode(components, bits):
+        # The conversion used by OpenGL 3.3 contexts.
+        return (2 * components.astype(np.float64) + 1) / (2 ** bits - 1)
+
+    normals = np.random.randn(100, 3)
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+    normals[0] = [-1, 1, 0]
+    packed = packing.pack_normals(normals)
+    data = packed.data.view(np.uint32)[:, None] >> np.uint32([0, 10, 20])
+    components = (data & 0x3ff).astype(np.int64)
+    components = np.where(components >= 512, components - 1024, components)
+    np.testing.assert_array_equal(components[0, :2], [-512, 511])
+    np.testing.assert_allclose(decode(components, 10), normals, atol=1 / 1023 + 1e-7)
+    np.testing.assert_allclose(packed.unpack()[:, :3], decode(components, 10), atol=1e-6)
+    assert packing.pack_int_2_10_10_10([[0, 0, 0, -1]]).view(np.uint32)[0] >> 30 == 0b10
+
+    values = np.random.uniform(-1, 1, (100, 2))
+    packed = packing.quantise(values, np.int16, *packing._identity_transform(2))
+    np.testing.assert_allclose(decode(packed.data, 16), values, atol=1 / 65535 + 1e-7)
+    np.testing.assert_allclose(packed.unpack(), decode(packed.data, 16), atol=1e-6)
+
+
+def test_vertex_attrib_formats(window):
+    positions = packing.pack_positions(np.random.randn(10, 3))
+    normals = packing.pack_normals(np.eye(3)[np.arange(10) % 3])
+    ids = np.arange(10, dtype=np.uint32)
+    vao = VAO()
+    with vao.bound():
+        for index, data in [(0, positions), (1, normals)]:
+            vbo = VBO(data.data)
+            with vbo.bound():
+                vao.connect_vertex_attrib_array(data.vertex_attrib(index), vbo, data.stride)
+        vbo = VBO(ids)
+        with vbo.bound():
+            vao.connect_vertex_attrib_array(VertexAttrib(2, 1, np.uint32, integer=True), vbo, 4)
+
+        def get_attrib(index, pname):
+            params = np.zeros(4, dtype=np.int32)
+            gl.glGetVertexAttribiv(index, pname, params)
+            return int(params[0])
+
+        assert get_attrib(0, gl.GL_VERTEX_ATTRIB_ARRAY_NORMALIZED) == 1
+        assert get_attrib(0, gl.GL_VERTEX_ATTRIB_ARRAY_TYPE) == gl.GL_SHORT
+        assert get_attrib(1, gl.GL_VERTEX_ATTRIB_ARRAY_TYPE) == gl.GL_INT_2_10_10_10_REV
+        assert get_attrib(2, gl.GL_VERTEX_ATTRIB_ARRAY_INTEGER) == 1
+    assert vao.attrib_bindings[2].integer
+    for binding in vao.attrib_bindings.values():
+        binding.vbo.destroy()
+    vao.destroy()
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pytest
+
+from glip.gl.render_pool import RenderPool
+
+
+def init():
+    from glip.gl.batch_render import BatchRenderer
+    return {'renderer': BatchRenderer(4, 3, batch_size=2, depth=False)}
+
+
+def render(state, scene, view_projections, colour_out, depth_out):
+    """Render views cleared to a colour given by the scene and the view matrix."""
+    crash_marker, red = scene
+    if red is None:
+        # Only the job with the first view fails.
+        if view_projections[0, 0, 3] == 0:
+            raise ValueError('No colour')
+        red = 0
+    if crash_marker is not None and not os.path.exists(crash_marker):
+        open(crash_marker, 'w').close()
+        os._exit(1)
+    renderer = state['renderer']
+
+    def draw(view_projection, index):
+        pass
+
+    for batch in renderer.iter_batches(view_projections, draw, colour_out):
+        pass
+    colour_out[..., 0] = red
+    colour_out[..., 1] = view_projections[:, 0, 3, None, None]
+
+
+def test_render_pool(tmp_path):
+    view_projections = np.tile(np.eye(4), (11, 1, 1))
+    view_projections[:, 0, 3] = np.arange(11)
+    with RenderPool(render, 4, 3, init=init, n_workers=2, max_views=3) as pool:
+        colour, depth = pool.render((None, 7), view_projections)
+        assert colour.shape == (11, 3, 4, 4) and depth is None
+        np.testing.assert_array_equal(colour[..., 0], 7)
+        np.testing.assert_array_equal(colour[:, 0, 0, 1], np.arange(11))
+
+        # The first attempt at this job kills its worker, which is restarted.
+        job_id = pool.submit((str(tmp_path / 'crashed'), 9), view_projections[:2])
+        with pool.get_result(timeout=60) as result:
+            assert result.job_id == job_id and result.error is None
+            np.testing.assert_array_equal(result.colour[..., 0], 9)
+        assert pool.n_restarts == 1
+
+        # When one job of a render fails, the results of the others don't keep holding slots.
+        for _ in range(3):
+            with pytest.raises(RuntimeError, match='No colour'):
+                pool.render((None, None), view_projections)
+        colour, _ = pool.render((None, 5), view_projections)
+        np.testing.assert_array_equal(colour[..., 0], 5)
+        assert len(pool) == 0
+        # Slots are only held by discarded jobs which are still being rendered.
+        assert len(pool._free_slots) + len(pool._jobs) == len(pool._slots)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from glip.gl.objects import ShaderProgram, VAO, VBO, VertexAttrib
+from glip.gl.render_queue import RenderQueue
+
+vertex_shader_source = r"""
+#version 330 core
+in vec3 pos;
+uniform mat4 model;
+
+void main() {
+    gl_Position = model * vec4(pos, 1.0);
+}
+"""
+
+fragment_shader_source = r"""
+#version 330 core
+out vec4 FragColor;
+uniform vec4 colour;
+
+void main() {
+    FragColor = colour;
+}
+"""
+
+
+def test_render_queue(window):
+    attrib = VertexAttrib(0, size=3, dtype=np.float32)
+    programs = [
+        ShaderProgram(vertex_shader=vertex_shader_source,
+                      fragment_shader=fragment_shader_source,
+                      vertex_attribs={'pos': attrib})
+        for _ in range(2)
+    ]
+    vertices = np.zeros((3, 3), dtype=np.float32)
+    vbo = VBO(vertices)
+    vaos = [VAO() for _ in range(3)]
+    for vao in vaos:
+        with vao.bound(), vbo.bound():
+            vao.connect_vertex_attrib_array(attrib, vbo, vertices.strides[0])
+
+    queue = RenderQueue()
+    for i in range(12):
+        queue.submit(programs[i % 2], vaos[i % 3], count=3, depth=float(i),
+                     uniforms={'model': np.eye(4), 'colour': [1.0, 0.0, 0.0, 1.0]})
+    stats = queue.flush()
+    assert len(queue) == 0
+    assert stats.draws == 12
+    assert stats.program_switches == 2
+    assert stats.unsorted_switches == 24
+    assert stats.switches_saved > 0
+
+    for vao in vaos:
+        vao.destroy()
+    vbo.destroy()
+    for program in programs:
+        program.destroy()
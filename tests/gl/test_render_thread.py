@@ -0,0 +1,79 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from glip.gl.context import Window
+from glip.gl.objects import VBO
+from glip.gl.render_thread import RenderThread
+
+
+def test_render_thread():
+    frames = []
+
+    def draw(window):
+        window.clear((1.0, 0.0, 0.0, 1.0))
+        frames.append(window.frame_index)
+
+    renderer = RenderThread(lambda: Window(8, 6, hidden=True), draw=draw, max_fps=1000)
+    window = renderer.start()
+    try:
+        # The window is only active on the render thread.
+        assert Window.get_active() is None
+        assert renderer.call(lambda window: Window.get_active()) is window
+        assert not renderer.is_render_thread()
+        with pytest.raises(RuntimeError):
+            window.activate()
+
+        vbo = renderer.upload(VBO, np.arange(4, dtype=np.float32)).result()
+        assert renderer.call(lambda window: vbo.size) == 16
+        renderer.call(lambda window: vbo.destroy())
+
+        index = renderer.next_frame().result(timeout=5)
+        assert renderer.next_frame().result(timeout=5) > index
+        pixels = renderer.read_pixels(0, 0, 8, 6).result()
+        assert pixels.shape == (6, 8, 4) and (pixels[..., 0] == 255).all()
+
+        # Commands submitted from the render thread run immediately.
+        nested = renderer.call(lambda window: renderer.submit(lambda window: 42).result())
+        assert nested == 42
+
+        with pytest.raises(ZeroDivisionError):
+            renderer.call(lambda window: 1 / 0)
+    finally:
+        renderer.stop()
+    assert frames == list(range(len(frames)))
+    with pytest.raises(RuntimeError):
+        renderer.submit(lambda window: None)
+
+
+def test_render_thread_next_frame_follows_commands():
+    def draw(window):
+        # Commands are submitted while frames are being drawn.
+        time.sleep(0.005)
+
+    renderer = RenderThread(lambda: Window(8, 6, hidden=True), draw=draw, max_fps=1000)
+    renderer.start()
+    try:
+        for _ in range(20):
+            command = renderer.submit(lambda window: window.frame_index)
+            frame = renderer.next_frame()
+            assert frame.result(timeout=5) > command.result()
+    finally:
+        renderer.stop()
+
+
+def test_render_thread_without_draw():
+    renderer = RenderThread(lambda: Window(8, 6, hidden=True))
+    renderer.start()
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(renderer.call(lambda w: i)))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == list(range(8))
+    assert renderer.next_frame().result(timeout=5) == 0
+    renderer.stop()
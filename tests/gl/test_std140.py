@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from glip.gl.std140 import Std140Layout, UniformBlock
+
+
+def test_layout_offsets():
+    layout = Std140Layout([
+        ('a', 'float'),
+        ('b', 'vec3'),
+        ('c', 'float'),
+        ('d', 'mat4'),
+        ('e', 'vec3', 2),
+        ('f', 'mat3'),
+        ('g', 'vec2'),
+        ('h', 'float', 3),
+    ])
+    assert [field.offset for field in layout.fields] == [0, 16, 28, 32, 96, 128, 176, 192]
+    assert layout['e'].strides == (16, 4)
+    assert layout['f'].strides == (4, 16)
+    assert layout.size == 240
+
+
+def test_layout_from_dtype():
+    dtype = np.dtype([
+        ('view', np.float32, (4, 4)),
+        ('position', np.float32, 3),
+        ('count', np.int32),
+        ('lights', np.float32, (8, 4)),
+    ])
+    layout = Std140Layout.from_dtype(dtype)
+    assert [field.offset for field in layout.fields] == [0, 64, 76, 80]
+    assert layout['lights'].shape == (8, 4)
+    assert layout.size == 208
+
+
+def test_unsupported_type():
+    with pytest.raises(ValueError):
+        Std140Layout([('a', 'vec5')])
+
+
+def test_uniform_block_stores_matrices_column_major():
+    block = UniformBlock(Std140Layout([('scale', 'float'), ('m', 'mat3')]))
+    matrix = np.arange(9, dtype=np.float32).reshape(3, 3)
+    block['m'] = matrix
+    block['scale'] = 2
+    floats = block.data.view(np.float32)
+    assert floats[0] == 2
+    np.testing.assert_array_equal(floats[4:16].reshape(3, 4)[:, :3], matrix.T)
+    np.testing.assert_array_equal(block['m'], matrix)
@@ -0,0 +1,56 @@
+import OpenGL.GL as gl
+import numpy as np
+
+from glip.gl.objects import (Framebuffer, PixelPackBuffer, Sampler, Texture2D, TextureFilter,
+                             bind_texture_units)
+
+
+def test_per_unit_bind_tracking(window):
+    texture1 = Texture2D()
+    texture2 = Texture2D()
+    assert texture1.bind_to_unit(0)
+    assert texture2.bind_to_unit(3)
+    assert window.active_texture_unit == 3
+    assert texture2.is_bound()
+    assert not texture1.is_bound()
+    assert Texture2D.get_bound(0) is texture1
+    assert not texture2.bind_to_unit(3)
+    texture1.destroy()
+    assert Texture2D.get_bound(0) is None
+    texture2.destroy()
+
+
+def test_bind_texture_units(window):
+    textures = [Texture2D() for _ in range(4)]
+    sampler = Sampler(min_filter=TextureFilter.NEAREST, mag_filter=TextureFilter.NEAREST)
+    assert bind_texture_units(textures, [sampler]) == 5
+    assert bind_texture_units(textures, [sampler]) == 0
+    assert bind_texture_units({1: textures[0], 2: textures[2]}) == 1
+    assert Texture2D.get_bound(1) is textures[0]
+    assert Sampler.get_bound(0) is sampler
+    sampler.destroy()
+    assert Sampler.get_bound(0) is None
+    for texture in textures:
+        texture.destroy()
+
+
+def test_texture_write_and_framebuffer_read(window):
+    texture = Texture2D()
+    pixels = np.random.randint(0, 256, (4, 5, 4), dtype=np.uint8)
+    with texture.bound():
+        texture.allocate(5, 4)
+        texture.write(pixels)
+    framebuffer = Framebuffer()
+    with framebuffer.bound():
+        framebuffer.attach_texture(gl.GL_COLOR_ATTACHMENT0, texture)
+        framebuffer.check_status()
+        np.testing.assert_array_equal(framebuffer.read_pixels(0, 0, 5, 4), pixels)
+        pbo = PixelPackBuffer(pixels.nbytes)
+        with pbo.bound():
+            framebuffer.read_pixels(1, 1, 2, 2, offset=0)
+            with pbo.mapped(0, 16) as data:
+                np.testing.assert_array_equal(data.reshape(2, 2, 4), pixels[1:3, 1:3])
+    assert Framebuffer.get_bound() is Framebuffer.get_default()
+    pbo.destroy()
+    framebuffer.destroy()
+    texture.destroy()
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from glip.gl.objects import VAO, VBO, PrimitiveType, ShaderProgram, VertexAttrib
+from glip.gl.transform_feedback import TransformFeedback
+
+vertex_shader_source = r"""
+#version 330 core
+in vec3 position;
+in vec3 velocity;
+out vec3 out_position;
+out vec3 out_velocity;
+flat out int out_id;
+
+void main() {
+    out_position = position + velocity;
+    out_velocity = velocity * 0.5;
+    out_id = gl_VertexID;
+}
+"""
+
+
+def _make_program(interleaved):
+    return ShaderProgram(
+        vertex_shader=vertex_shader_source,
+        vertex_attribs={'position': VertexAttrib(0, 3, np.float32),
+                        'velocity': VertexAttrib(1, 3, np.float32)},
+        feedback_varyings=['out_position', 'out_velocity', 'out_id'],
+        interleaved_feedback=interleaved,
+    )
+
+
+def test_transform_feedback_interleaved(window):
+    program = _make_program(interleaved=True)
+    feedback = TransformFeedback(program)
+    particle = feedback.dtypes[0]
+    assert particle.names == ('out_position', 'out_velocity', 'out_id')
+    assert particle['out_position'].shape == (3,) and particle['out_id'] == np.int32
+    assert particle.itemsize == 28
+
+    particles = np.zeros(5, dtype=particle)
+    particles['out_position'] = np.arange(15).reshape(5, 3)
+    particles['out_velocity'] = 2.0
+    buffers = [VBO(particles), VBO(np.zeros_like(particles))]
+    vaos = []
+    for vbo in buffers:
+        vao = VAO()
+        with vao.bound(), vbo.bound():
+            vao.connect_vertex_attrib_array(VertexAttrib(0, 3, np.float32), vbo, particle.itemsize,
+                                            particle.fields['out_position'][1])
+            vao.connect_vertex_attrib_array(VertexAttrib(1, 3, np.float32), vbo, particle.itemsize,
+                                            particle.fields['out_velocity'][1])
+        vaos.append(vao)
+
+    # Step the simulation twice, ping-ponging between the buffers.
+    for step in range(2):
+        source, target = step % 2, (step + 1) % 2
+        with vaos[source].bound(), feedback.capture([buffers[target]]):
+            vaos[source].draw_arrays(PrimitiveType.POINTS, 0, len(particles))
+        assert feedback.primitives_written == 5
+    result = feedback.read(buffers[0])
+    np.testing.assert_allclose(result['out_position'], particles['out_position'] + 3)
+    np.testing.assert_allclose(result['out_velocity'], 0.5)
+    np.testing.assert_array_equal(result['out_id'], np.arange(5))
+
+    # Only records which fit into a buffer range are written.
+    with vaos[0].bound(), feedback.capture([(buffers[1], 0, 2 * particle.itemsize)]):
+        vaos[0].draw_arrays(PrimitiveType.POINTS, 0, len(particles))
+    assert feedback.primitives_written == 2
+
+    with pytest.raises(ValueError):
+        TransformFeedback(program, PrimitiveType.TRIANGLE_STRIP)
+    feedback.destroy()
+    for vao, vbo in zip(vaos, buffers):
+        vao.destroy()
+        vbo.destroy()
+    program.destroy()
+
+
+def test_transform_feedback_separate(window):
+    program = _make_program(interleaved=False)
+    feedback = TransformFeedback(program, PrimitiveType.TRIANGLES)
+    assert [dtype.names for dtype in feedback.dtypes] == [('out_position',), ('out_velocity',),
+                                                          ('out_id',)]
+    vbo = VBO(np.ones((6, 3), dtype=np.float32))
+    vao = VAO()
+    with vao.bound(), vbo.bound():
+        vao.connect_vertex_attrib_array(VertexAttrib(0, 3, np.float32), vbo, 12)
+        vao.connect_vertex_attrib_array(VertexAttrib(1, 3, np.float32), vbo, 12)
+    outputs = [VBO(np.zeros(6, dtype)) for dtype in feedback.dtypes]
+    with vao.bound(), feedback.capture(outputs):
+        vao.draw_arrays(PrimitiveType.TRIANGLES, 0, 6)
+    assert feedback.primitives_written == 2 and feedback.vertices_written == 6
+    np.testing.assert_allclose(feedback.read(outputs[0])['out_position'], 2.0)
+    np.testing.assert_allclose(feedback.read(outputs[1], 1)['out_velocity'], 0.5)
+    np.testing.assert_array_equal(feedback.read(outputs[2], 2, offset=12, count=3)['out_id'],
+                                  [3, 4, 5])
+    feedback.destroy()
+    for output in outputs:
+        output.destroy()
+    vao.destroy()
+    vbo.destroy()
+    program.destroy()
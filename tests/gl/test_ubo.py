@@ -0,0 +1,51 @@
+import numpy as np
+
+from glip.gl.objects import ShaderProgram, UBO
+from glip.gl.std140 import UniformBlock
+
+vertex_shader_source = r"""
+#version 330 core
+in vec3 pos;
+
+layout(std140) uniform Camera {
+    mat4 view_projection;
+    vec3 eye;
+    float exposure;
+};
+
+void main() {
+    gl_Position = exposure * view_projection * vec4(pos - eye, 1.0);
+}
+"""
+
+fragment_shader_source = r"""
+#version 330 core
+out vec4 FragColor;
+
+void main() {
+    FragColor = vec4(1.0f, 0.5f, 0.2f, 1.0f);
+}
+"""
+
+
+def test_ubo(window):
+    program = ShaderProgram(
+        vertex_shader=vertex_shader_source,
+        fragment_shader=fragment_shader_source,
+        uniform_block_bindings={'Camera': 2},
+    )
+    layout = program.get_uniform_block_layout('Camera')
+    assert [field.name for field in layout.fields] == ['view_projection', 'eye', 'exposure']
+    assert [field.offset for field in layout.fields] == [0, 64, 76]
+    block = UniformBlock(layout)
+    block['view_projection'] = np.eye(4)
+    block['exposure'] = 1.5
+    ubo = UBO(block)
+    assert ubo.bind_base(2)
+    assert not ubo.bind_base(2)
+    assert UBO.get_indexed_bound(2) is ubo
+    with ubo.bound():
+        ubo.write(block)
+    ubo.destroy()
+    assert UBO.get_indexed_bound(2) is None
+    program.destroy()
@@ -0,0 +1,43 @@
+import numpy as np
+from glip.math import frustum, mat4
+
+
+def make_view_projection():
+    view = mat4.look_at(np.asarray([0.0, 0.0, -5.0]), np.zeros(3), np.asarray([0.0, 1.0, 0.0]))
+    return mat4.perspective(np.pi / 2, 1.0, 0.1, 100.0) @ view
+
+
+def test_spheres_in_frustum():
+    planes = frustum.frustum_planes(make_view_projection())
+    centres = np.asarray([
+        [0.0, 0.0, 0.0],    # In front of the camera.
+        [0.0, 0.0, -10.0],  # Behind the camera.
+        [8.0, 0.0, 0.0],    # Outside the right edge.
+        [5.5, 0.0, 0.0],    # Outside the right edge, but overlapping.
+        [0.0, 0.0, 200.0],  # Beyond the far plane.
+    ])
+    mask = frustum.spheres_in_frustum(planes, centres, 1.0)
+    assert mask.tolist() == [True, False, False, True, False]
+    assert frustum.visible_indices(mask).tolist() == [0, 3]
+
+
+def test_aabbs_in_frustum():
+    planes = frustum.frustum_planes(make_view_projection())
+    boxes = np.asarray([
+        [[-1.0, -1.0, -1.0], [1.0, 1.0, 1.0]],
+        [[-1.0, -1.0, -12.0], [1.0, 1.0, -10.0]],
+        [[4.0, -1.0, -1.0], [6.0, 1.0, 1.0]],
+        [[7.0, -1.0, -1.0], [9.0, 1.0, 1.0]],
+    ])
+    assert frustum.aabbs_in_frustum(planes, boxes).tolist() == [True, False, True, False]
+
+
+def test_frustum_planes_agree_with_clip_space():
+    view_projection = make_view_projection()
+    planes = frustum.frustum_planes(view_projection, normalise=False)
+    points = np.random.randn(1000, 3) * 20
+    inside_planes = (points @ planes[:, :3].T + planes[:, 3] >= 0).all(axis=-1)
+    ndc = mat4.transform_points(view_projection, points)
+    w = points @ view_projection[3, :3] + view_projection[3, 3]
+    inside_clip = (np.abs(ndc) <= 1).all(axis=-1) & (w > 0)
+    assert (inside_planes == inside_clip).all()
@@ -0,0 +1,20 @@
+import numpy as np
+from glip.math import mat3
+
+
+def test_rotate_out():
+    out = np.empty((3, 3), dtype=np.float32)
+    assert mat3.rotate(0.5, out=out) is out
+    c, s = np.cos(0.5), np.sin(0.5)
+    np.testing.assert_allclose(out, [[c, s, 0], [-s, c, 0], [0, 0, 1]], rtol=1e-6)
+
+
+def test_batched_translate():
+    tx = np.arange(4.0)
+    expected = np.stack([mat3.translate(x, 2.0) for x in tx])
+    np.testing.assert_allclose(mat3.translate(tx, 2.0), expected)
+
+
+def test_invert_affine():
+    matrix = mat3.affine(A=np.random.randn(2, 2), t=np.random.randn(2))
+    np.testing.assert_allclose(mat3.invert_affine(matrix), np.linalg.inv(matrix), atol=1e-8)
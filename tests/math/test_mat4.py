@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 from glip.math import mat4
 
 
@@ -9,3 +10,118 @@ def test_is_similarity():
 
     assert not mat4.is_similarity(mat4.scale(2, 1, 1))
     assert not mat4.is_similarity(mat4.affine(A=np.random.randn(3, 3)))
+    # The tolerance is relative to the scale.
+    assert mat4.is_similarity(mat4.scale(1e-7))
+    assert not mat4.is_similarity(mat4.scale(1e-7, 3e-7, 1e-7))
+    # The default tolerance suits the data type.
+    axis = np.asarray([1.0, 2.0, 3.0]) / np.sqrt(14)
+    assert mat4.is_similarity(mat4.rotate_axis_angle(*axis, 1.1, dtype=np.float32))
+    assert not mat4.is_similarity(mat4.scale(1, 1.001, 1, dtype=np.float32))
+
+
+def test_batched_translate():
+    t = np.random.randn(5, 3)
+    expected = np.stack([mat4.translate(*row) for row in t])
+    np.testing.assert_allclose(mat4.translate(t[:, 0], t[:, 1], t[:, 2]), expected)
+
+
+def test_batched_rotate_axis_angle_broadcasts_scalars():
+    theta = np.linspace(0, np.pi, 7)
+    expected = np.stack([mat4.rotate_axis_angle(0, 0, 1, a) for a in theta])
+    actual = mat4.rotate_axis_angle(0, 0, 1, theta)
+    assert actual.shape == (7, 4, 4)
+    np.testing.assert_allclose(actual, expected)
+
+
+def test_batched_perspective():
+    fov_y = np.asarray([0.5, 1.0, 1.5])
+    expected = np.stack([mat4.perspective(f, 4 / 3, 0.1, 100.0) for f in fov_y])
+    np.testing.assert_allclose(mat4.perspective(fov_y, 4 / 3, 0.1, 100.0), expected)
+
+
+def test_batched_look_at():
+    eye = np.random.randn(6, 3)
+    target = np.zeros(3)
+    up = np.asarray([0.0, 1.0, 0.0])
+    expected = np.stack([mat4.look_at(e, target, up) for e in eye])
+    np.testing.assert_allclose(mat4.look_at(eye, target, up), expected)
+
+
+def test_out_float32():
+    out = np.empty((4, 4), dtype=np.float32)
+    result = mat4.perspective(1.0, 4 / 3, 0.1, 100.0, out=out)
+    assert result is out
+    np.testing.assert_allclose(out, mat4.perspective(1.0, 4 / 3, 0.1, 100.0), rtol=1e-6)
+
+
+def test_dtype():
+    assert mat4.translate(1, 2, 3, dtype=np.float32).dtype == np.float32
+    assert mat4.identity(dtype=np.float32).dtype == np.float32
+
+
+def test_out_wrong_shape():
+    with pytest.raises(ValueError):
+        mat4.translate(1, 2, 3, out=np.empty((3, 3)))
+
+
+def test_concatenate_out():
+    matrices = [mat4.translate(1, 2, 3), mat4.rotate_axis_angle(0, 1, 0, 0.3), mat4.scale(2)]
+    out = np.empty((4, 4), dtype=np.float32)
+    assert mat4.concatenate(matrices, out=out) is out
+    np.testing.assert_allclose(out, matrices[2] @ matrices[1] @ matrices[0], rtol=1e-6)
+
+
+def test_concatenate_long_chain():
+    matrices = [mat4.rotate_axis_angle(0, 0, 1, 0.001)] * 5000
+    np.testing.assert_allclose(mat4.concatenate(matrices), mat4.rotate_axis_angle(0, 0, 1, 5.0),
+                               atol=1e-9)
+
+
+def test_concatenate_batched_chains():
+    chains = np.stack([
+        np.stack([mat4.affine(A=np.random.randn(3, 3), t=np.random.randn(3)) for _ in range(5)])
+        for _ in range(4)
+    ])
+    expected = np.stack([mat4.concatenate(list(chain)) for chain in chains])
+    np.testing.assert_allclose(mat4.concatenate(chains), expected)
+
+
+def test_transform_points():
+    matrix = mat4.perspective(1.0, 1.5, 0.1, 10.0) @ mat4.translate(0.5, -0.2, 3.0)
+    points = np.random.randn(10, 3)
+    homogeneous = np.concatenate([points, np.ones((10, 1))], axis=-1) @ matrix.T
+    expected = homogeneous[:, :3] / homogeneous[:, 3:]
+    np.testing.assert_allclose(mat4.transform_points(matrix, points), expected)
+
+
+def test_transform_vectors_ignores_translation():
+    vectors = np.random.randn(10, 3)
+    np.testing.assert_allclose(mat4.transform_vectors(mat4.translate(1, 2, 3), vectors), vectors)
+
+
+def test_project_points():
+    proj = mat4.orthographic(-1, 1, -1, 1)
+    window = mat4.project_points(proj, np.asarray([[0.0, 0.0, 0.0], [1.0, -1.0, 0.0]]),
+                                 (0, 0, 640, 480))
+    np.testing.assert_allclose(window[:, :2], [[320, 240], [640, 0]])
+
+
+def test_invert_rigid():
+    view = mat4.look_at(np.asarray([1.0, 2.0, 3.0]), np.zeros(3), np.asarray([0.0, 1.0, 0.0]))
+    np.testing.assert_allclose(mat4.invert_rigid(view), np.linalg.inv(view), atol=1e-12)
+
+
+def test_invert_affine_batched():
+    matrices = mat4.affine(A=np.random.randn(8, 3, 3), t=np.random.randn(8, 3))
+    np.testing.assert_allclose(mat4.invert_affine(matrices), np.linalg.inv(matrices), atol=1e-8)
+
+
+def test_normal_matrix():
+    model = mat4.affine(A=np.random.randn(3, 3), t=np.random.randn(3))
+    np.testing.assert_allclose(mat4.normal_matrix(model), np.linalg.inv(model[:3, :3]).T,
+                               atol=1e-8)
+
+
+def test_is_similarity_batched():
+    matrices = np.stack([mat4.scale(3), mat4.scale(1, 2, 1)])
+    assert mat4.is_similarity(matrices).tolist() == [True, False]
@@ -0,0 +1,62 @@
+import numpy as np
+from glip.math import mat4, quat
+
+
+def random_unit_quaternions(n):
+    return quat.normalise(np.random.randn(n, 4))
+
+
+def test_to_matrix_batched():
+    q = random_unit_quaternions(10)
+    expected = np.stack([mat4.rotate_quaternion(*row) for row in q])
+    out = np.empty((10, 4, 4), dtype=np.float32)
+    assert quat.to_matrix(q, out=out) is out
+    np.testing.assert_allclose(out, expected, atol=1e-6)
+
+
+def test_from_matrix_round_trip():
+    q = random_unit_quaternions(100)
+    q = np.where(q[:, :1] < 0, -q, q)
+    np.testing.assert_allclose(quat.from_matrix(quat.to_matrix(q)), q, atol=1e-10)
+
+
+def test_multiply_composes_rotations():
+    a = random_unit_quaternions(5)
+    b = random_unit_quaternions(5)
+    expected = quat.to_matrix(a) @ quat.to_matrix(b)
+    np.testing.assert_allclose(quat.to_matrix(quat.multiply(a, b)), expected, atol=1e-10)
+    np.testing.assert_allclose(quat.multiply(a, quat.inverse(a)), quat.identity((5,)),
+                               atol=1e-10)
+
+
+def test_axis_angle_round_trip():
+    axis = np.asarray([[0.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
+    angle = np.asarray([0.3, 2.0])
+    q = quat.from_axis_angle(axis, angle)
+    np.testing.assert_allclose(quat.to_matrix(q[0]), mat4.rotate_axis_angle(0, 0, 1, 0.3))
+    actual_axis, actual_angle = quat.to_axis_angle(q)
+    np.testing.assert_allclose(actual_axis, axis)
+    np.testing.assert_allclose(actual_angle, angle)
+
+
+def test_slerp():
+    a = quat.from_axis_angle([0.0, 0.0, 1.0], 0.0)
+    b = quat.from_axis_angle([0.0, 0.0, 1.0], np.asarray([1.0, 2.0, 1e-9]))
+    t = np.asarray([0.25, 0.5, 0.5])
+    expected = quat.from_axis_angle([0.0, 0.0, 1.0], np.asarray([0.25, 1.0, 0.5e-9]))
+    np.testing.assert_allclose(quat.slerp(a, b, t), expected, atol=1e-12)
+    np.testing.assert_allclose(quat.nlerp(a, b, 0.5)[1], expected[1], atol=1e-12)
+
+
+def test_rotate_vectors():
+    q = random_unit_quaternions(8)
+    v = np.random.randn(8, 3)
+    expected = mat4.transform_vectors(quat.to_matrix(q), v)
+    np.testing.assert_allclose(quat.rotate_vectors(q, v), expected, atol=1e-10)
+
+
+def test_conjugate_and_inverse_of_lists():
+    np.testing.assert_array_equal(quat.conjugate([1.0, 2, 3, 4]), [1, -2, -3, -4])
+    assert quat.conjugate((1, 0, 0, 0)).dtype == np.float64
+    np.testing.assert_allclose(quat.multiply([0.0, 1, 0, 0], quat.inverse([0.0, 1, 0, 0])),
+                               [1, 0, 0, 0])
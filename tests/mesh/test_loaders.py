@@ -0,0 +1,59 @@
+import numpy as np
+
+from glip.mesh import loaders
+
+
+def write_ply(path, positions, colours, triangles, byte_order='<'):
+    fmt = 'binary_little_endian' if byte_order == '<' else 'binary_big_endian'
+    header = (
+        f'ply\nformat {fmt} 1.0\ncomment test\nelement vertex {len(positions)}\n'
+        'property float x\nproperty float y\nproperty float z\n'
+        'property uchar red\nproperty uchar green\nproperty uchar blue\n'
+        f'element face {len(triangles)}\nproperty list uchar int vertex_indices\nend_header\n'
+    )
+    vertices = np.empty(len(positions), dtype=[('p', byte_order + 'f4', 3), ('c', 'u1', 3)])
+    vertices['p'] = positions
+    vertices['c'] = colours
+    faces = np.empty(len(triangles), dtype=[('n', 'u1'), ('i', byte_order + 'i4', 3)])
+    faces['n'] = 3
+    faces['i'] = triangles
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        f.write(vertices.tobytes())
+        f.write(faces.tobytes())
+
+
+def test_load_ply(tmp_path):
+    positions = np.random.randn(50, 3).astype(np.float32)
+    colours = np.random.randint(0, 256, (50, 3))
+    triangles = np.random.randint(0, 50, (70, 3))
+    for byte_order in '<>':
+        path = tmp_path / 'mesh.ply'
+        write_ply(path, positions, colours, triangles, byte_order)
+        reader = loaders.open_mesh(path)
+        assert (reader.n_vertices, reader.n_triangles) == (50, 70)
+        chunks = list(reader.chunks(chunk_size=16))
+        assert [chunk.kind for chunk in chunks] == ['vertices'] * 4 + ['triangles'] * 5
+        assert chunks[-1].progress == 1.0
+        vertices, loaded_triangles = loaders.load_mesh(path, chunk_size=16)
+        np.testing.assert_array_equal(vertices['position'], positions)
+        np.testing.assert_array_equal(vertices['colour'][:, :3], colours)
+        np.testing.assert_array_equal(vertices['colour'][:, 3], 255)
+        np.testing.assert_array_equal(loaded_triangles, triangles)
+
+
+def test_load_obj(tmp_path):
+    path = tmp_path / 'mesh.obj'
+    path.write_text(
+        '# square and triangle\n'
+        'v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\n'
+        'vn 0 0 1\n'
+        'f 1//1 2//1 3//1 4//1\n'
+        'v 2 2 2\n'
+        'f -3 -2 -1\n'
+    )
+    reader = loaders.open_mesh(path)
+    assert (reader.n_vertices, reader.n_triangles) == (5, 3)
+    vertices, triangles = loaders.load_mesh(path, chunk_size=2)
+    np.testing.assert_array_equal(vertices['position'][4], [2, 2, 2])
+    assert triangles.tolist() == [[0, 1, 2], [0, 2, 3], [2, 3, 4]]
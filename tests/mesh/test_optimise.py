@@ -0,0 +1,40 @@
+import numpy as np
+
+from glip.mesh import optimise
+
+
+def make_grid(n):
+    """Make indices for an n x n grid of quads, with triangles in shuffled order."""
+    rows, cols = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    corners = (rows * (n + 1) + cols).ravel()
+    quads = np.stack([corners, corners + 1, corners + n + 2, corners + n + 1], axis=-1)
+    triangles = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+    return triangles[np.random.RandomState(0).permutation(len(triangles))], (n + 1) ** 2
+
+
+def sorted_triangles(triangles):
+    triangles = np.asarray(triangles).reshape(-1, 3)
+    # Rotate each triangle so its smallest index comes first, preserving winding.
+    shift = np.argmin(triangles, axis=-1)
+    rotated = np.take_along_axis(triangles, (shift[:, None] + np.arange(3)) % 3, axis=-1)
+    return rotated[np.lexsort(rotated.T[::-1])]
+
+
+def test_optimise_vertex_cache():
+    triangles, n_vertices = make_grid(30)
+    before = optimise.average_cache_miss_ratio(triangles, cache_size=16)
+    optimised = optimise.optimise_vertex_cache(triangles.astype(np.uint32), n_vertices)
+    after = optimise.average_cache_miss_ratio(optimised, cache_size=16)
+    assert optimised.dtype == np.uint32 and optimised.shape == triangles.shape
+    np.testing.assert_array_equal(sorted_triangles(optimised), sorted_triangles(triangles))
+    assert before > 2.5
+    assert after < 0.8
+
+
+def test_optimise_vertex_fetch():
+    indices = np.asarray([4, 2, 0, 2, 4, 3])
+    vertices = np.arange(6) * 10
+    new_indices, order = optimise.optimise_vertex_fetch(indices, len(vertices))
+    assert new_indices.tolist() == [0, 1, 2, 1, 0, 3]
+    assert order.tolist() == [4, 2, 0, 3, 1, 5]
+    np.testing.assert_array_equal(vertices[order][new_indices], vertices[indices])
@@ -0,0 +1,35 @@
+import numpy as np
+
+from glip.math import mat4
+from glip.scene.graph import SceneGraph
+
+
+def brute_force_world(graph):
+    local = graph.local_matrices.astype(np.float64)
+    world = np.empty_like(local)
+    for i, parent in enumerate(graph.parents):
+        world[i] = local[i] if parent < 0 else world[parent] @ local[i]
+    return world
+
+
+def test_update():
+    graph = SceneGraph(capacity=2)
+    root = graph.add_node(local=mat4.translate(1, 0, 0))
+    child = graph.add_node(root, mat4.rotate_axis_angle(0, 0, 1, 0.5))
+    grandchildren = graph.add_nodes([child, child, -1], mat4.translate(np.arange(3.0), 2, 0))
+    assert len(graph) == 5
+    assert graph.update().tolist() == [0, 1, 2, 3, 4]
+    np.testing.assert_allclose(graph.world_matrices, brute_force_world(graph), atol=1e-6)
+
+    graph.set_local(child, mat4.scale(2))
+    assert graph.update().tolist() == [child, grandchildren[0], grandchildren[1]]
+    np.testing.assert_allclose(graph.world_matrices, brute_force_world(graph), atol=1e-6)
+    assert len(graph.update()) == 0
+
+
+def test_add_nodes_with_new_parents():
+    graph = SceneGraph()
+    parents = np.asarray([-1, 0, 1, 1, 2, 0])
+    graph.add_nodes(parents, mat4.translate(np.arange(6.0), 1, 0))
+    graph.update()
+    np.testing.assert_allclose(graph.world_matrices, brute_force_world(graph), atol=1e-5)